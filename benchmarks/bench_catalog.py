@@ -0,0 +1,66 @@
+"""Catalog startup time and memory at several catalog sizes.
+
+Each measurement runs in a fresh interpreter that loads a synthetic catalog
+through catalog.load_catalog, first from JSON (which also writes the binary
+snapshot) and then from that snapshot:
+
+    python benchmarks/bench_catalog.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_catalog import generate_tools
+
+MEASURE = """
+import sys, time
+sys.path.insert(0, {repo!r})
+started = time.perf_counter()
+from catalog import load_catalog
+snapshot = load_catalog({json_path!r}, {snapshot_path!r})
+elapsed = time.perf_counter() - started
+status = dict(line.split(':', 1) for line in open('/proc/self/status'))
+print(elapsed, int(status['VmRSS'].split()[0]), int(status['VmHWM'].split()[0]), len(snapshot.tools))
+"""
+
+
+def measure(json_path, snapshot_path):
+    """Return (seconds, RSS KiB, peak RSS KiB) for one cold catalog load"""
+    code = MEASURE.format(repo=REPO_DIR, json_path=json_path, snapshot_path=snapshot_path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    seconds, rss, peak, _ = output.split()
+    return float(seconds), int(rss), int(peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # A catalog needs at least one valid tool, so the baseline loads a single one
+        baseline_path = os.path.join(directory, 'one_tool.json')
+        with open(baseline_path, 'w', encoding='utf-8') as file:
+            json.dump([{'name': 'Baseline', 'purpose': 'Baseline', 'link': 'https://example.com'}], file)
+        print(f"interpreter + imports: {measure(baseline_path, '')[1] / 1024:.0f} MB RSS")
+        print(f"{'tools':>8} {'source':>9} {'startup':>9} {'RSS':>8} {'peak RSS':>9} {'snapshot':>9}")
+        for size in args.sizes:
+            json_path = os.path.join(directory, f'tools_{size}.json')
+            snapshot_path = os.path.join(directory, f'tools_{size}.snapshot')
+            with open(json_path, 'w', encoding='utf-8') as file:
+                json.dump(generate_tools(size), file)
+            for source in ('json', 'snapshot'):
+                seconds, rss, peak = measure(json_path, snapshot_path)
+                print(f"{size:>8} {source:>9} {seconds:>8.2f}s {rss / 1024:>6.0f}MB {peak / 1024:>7.0f}MB "
+                      f"{os.path.getsize(snapshot_path) / 1e6:>7.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Catalog ingestion: streaming parse, validation, and applying changes without a full rebuild.
+
+For a synthetic catalog the script:
+
+- loads it from a JSON array and from JSON Lines, comparing time and peak
+  traced memory with json.load of the whole array;
+- loads a copy with broken and duplicate records mixed in, which must
+  be skipped rather than fail the load;
+- writes files that are not a usable catalog (empty, truncated, a lone
+  object, garbage, mostly invalid records) over a watched catalog, which
+  reload_catalog must refuse, keeping the current tools;
+- edits a few tools, removes some and adds some, then times update_catalog
+  against a full rebuild. The updated snapshot must list the same tools per
+  category and give the same substring results as a full rebuild; ranked
+  results are compared as top-10 overlap, as ranking statistics drift
+  slightly until the next rebuild.
+
+    python benchmarks/bench_ingest.py --tools 100000 --changes 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from bot_enhanced import AIToolsBotEnhanced
+from catalog import CatalogSnapshot, build_tools, update_catalog
+from ingest import read_tools
+from session_store import InMemorySessionStore
+from synthetic_catalog import generate_tools
+
+SUBSTRING_QUERIES = ['a', 'ai', 'wri', 'video', 'tion', 'https://', 'zz', 'new things']
+RANKED_QUERIES = ['video editing', 'writing assistant', 'chat', 'design logo', 'music', 'ai', 'brand new', 'codng helper']
+
+
+def measure(function, memory=True):
+    """Return (result, seconds, peak traced MiB); tracing runs separately so it does not skew the timing"""
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    if not memory:
+        return result, elapsed, float('nan')
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def write_array(path, tools):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(tools, file, ensure_ascii=False)
+
+
+def write_lines(path, tools):
+    with open(path, 'w', encoding='utf-8') as file:
+        for tool in tools:
+            file.write(json.dumps(tool, ensure_ascii=False) + '\n')
+
+
+def bad_files(tools):
+    """Files that must not replace a catalog, by label"""
+    array = json.dumps(tools)
+    lines = ''.join(json.dumps(tool) + '\n' for tool in tools)
+    return {
+        'empty file': '',
+        'blank lines': '\n\n',
+        'pretty-printed object': '{\n  "name": "x"\n}\n',
+        'garbage': 'garbage\n',
+        'empty array': '[]',
+        'truncated array': array[:len(array) // 2],
+        'mostly invalid records': lines + (json.dumps({'name': 'No purpose'}) + '\n') * (len(tools) + 1),
+    }
+
+
+def check_bad_files(directory, tools):
+    """Write each bad file over a watched catalog; return the labels of those reload_catalog swapped in"""
+    path = os.path.join(directory, 'watched.json')
+    write_array(path, tools)
+    bot = AIToolsBotEnhanced(path, user_states=InMemorySessionStore(), snapshot_path='')
+    accepted = []
+    # Every refused file is logged as an error
+    logging.disable(logging.ERROR)
+    try:
+        for label, content in bad_files(tools).items():
+            current = bot.catalog
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            if asyncio.run(bot.reload_catalog()) or bot.catalog is not current:
+                accepted.append(label)
+    finally:
+        logging.disable(logging.NOTSET)
+    return accepted
+
+
+def key(tool):
+    return tool.name, tool.purpose, tool.link
+
+
+def change(tools, count, rng):
+    """Remove, edit and add about `count` tools in total"""
+    removed = set(rng.sample(range(len(tools)), count // 3))
+    changed = [dict(tool) for index, tool in enumerate(tools) if index not in removed]
+    for index in rng.sample(range(len(changed)), count // 3):
+        changed[index]['purpose'] = '🆕 Brand New Things'
+    for tool in generate_tools(count - 2 * (count // 3), seed=rng.randrange(1 << 30)):
+        tool['name'] += ' Next'
+        changed.append(tool)
+    return changed
+
+
+def check(updated, rebuilt):
+    """Return a list of differences between an updated snapshot and a full rebuild of the same tools"""
+    problems = []
+    if updated.stats != rebuilt.stats:
+        problems.append("stats differ")
+    groups = {purpose: [key(tool) for tool in group] for purpose, group in updated.tools_by_purpose.items()}
+    if groups != {purpose: [key(tool) for tool in group] for purpose, group in rebuilt.tools_by_purpose.items()}:
+        problems.append("categories differ")
+    for query in SUBSTRING_QUERIES:
+        for method in ('substring_ids', 'purpose_word_ids'):
+            got = [key(updated.tools_by_id[tool_id]) for tool_id in getattr(updated.search_index, method)(query)]
+            expected = [key(rebuilt.tools_by_id[tool_id]) for tool_id in getattr(rebuilt.search_index, method)(query)]
+            if got != expected:
+                problems.append(f"{method}({query!r}) differs")
+    return problems
+
+
+def ranked_overlap(updated, rebuilt):
+    overlaps = []
+    for query in RANKED_QUERIES:
+        got = {key(updated.tools_by_id[tool_id]) for tool_id in updated.ranked_search.search(query, 10)}
+        expected = {key(rebuilt.tools_by_id[tool_id]) for tool_id in rebuilt.ranked_search.search(query, 10)}
+        overlaps.append(len(got & expected) / len(expected) if expected else float(not got))
+    return sum(overlaps) / len(overlaps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=100000)
+    parser.add_argument('--changes', type=int, default=200, help='tools removed, edited or added per update')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    args = parser.parse_args()
+    memory = not args.no_memory
+    rng = random.Random(args.seed)
+    tools = generate_tools(args.tools, seed=args.seed)
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        array_path = os.path.join(directory, 'tools.json')
+        lines_path = os.path.join(directory, 'tools.jsonl')
+        write_array(array_path, tools)
+        write_lines(lines_path, tools)
+
+        print(f"{args.tools} tools (build_tools over the records, peak traced memory)")
+        _, elapsed, peak = measure(lambda: json.load(open(array_path, encoding='utf-8')), memory)
+        print(f"  json.load            {elapsed:7.2f}s  peak {peak:7.1f} MiB")
+        for label, path in (('stream JSON array', array_path), ('stream JSON Lines', lines_path)):
+            parsed, elapsed, peak = measure(lambda: build_tools(read_tools(path)), memory)
+            print(f"  {label:<20} {elapsed:7.2f}s  peak {peak:7.1f} MiB")
+            if len(parsed) != args.tools:
+                failures.append(f"{label} read {len(parsed)} tools")
+
+        broken_path = os.path.join(directory, 'broken.json')
+        broken = tools[:1000] + [{'name': 'No purpose', 'link': 'https://x.example'}, {'name': 1, 'purpose': 'P', 'link': 'l'},
+                                 'not an object', {'name': ' ', 'purpose': 'P', 'link': 'https://y.example'}] + tools[:10]
+        write_array(broken_path, broken)
+        loaded = CatalogSnapshot.from_file(broken_path)
+        print(f"  broken records       {len(broken)} read, {len(loaded.tools)} loaded")
+        if len(loaded.tools) != 1000:
+            failures.append(f"expected 1000 tools from the file with broken records, got {len(loaded.tools)}")
+
+        accepted = check_bad_files(directory, tools[:1000])
+        print(f"  bad files            {len(bad_files([])) - len(accepted)} of {len(bad_files([]))} refused on reload")
+        failures.extend(f"reload swapped in a bad file ({label})" for label in accepted)
+
+        snapshot = CatalogSnapshot.from_file(array_path)
+        current = tools
+        print(f"\n{args.changes} changes per update")
+        for round_number in range(1, 4):
+            current = change(current, args.changes, rng)
+            write_array(array_path, current)
+            updated, update_seconds, update_peak = measure(lambda: update_catalog(snapshot, array_path), memory)
+            if not updated.changes:
+                failures.append("update_catalog rebuilt the catalog instead of applying the changes")
+            # Index work alone, without reading the file
+            removed_ids = [tool.id for tool in snapshot.tools[:args.changes // 2]]
+            _, apply_seconds, _ = measure(lambda: snapshot.with_changes(removed_ids, current[-args.changes // 2:], 0), False)
+            rebuilt, rebuild_seconds, rebuild_peak = measure(lambda: CatalogSnapshot.from_file(array_path), memory)
+            print(f"  round {round_number}: update {update_seconds:6.2f}s (peak {update_peak:6.1f} MiB, "
+                  f"index changes alone {apply_seconds * 1000:6.1f}ms)   full rebuild {rebuild_seconds:6.2f}s "
+                  f"(peak {rebuild_peak:6.1f} MiB)")
+
+            # Rebuild the same tools in the updated snapshot's order to compare the indexes
+            same_order = CatalogSnapshot(build_tools(
+                {'name': tool.name, 'purpose': tool.purpose, 'link': tool.link} for tool in updated.tools
+            ))
+            failures.extend(f"round {round_number}: {problem}" for problem in check(updated, same_order))
+            if sorted(map(key, updated.tools)) != sorted(map(key, rebuilt.tools)):
+                failures.append(f"round {round_number}: updated catalog has different tools than the file")
+            print(f"           top-10 ranked overlap with a full rebuild: {ranked_overlap(updated, rebuilt):.2f}")
+            snapshot = updated
+
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Inline mode: per-keystroke latency, debouncing and the answer cache.
+
+Users type queries one character at a time, and every keystroke is an inline
+query, as Telegram sends them. The script reports:
+
+- handler latency per keystroke with debouncing off, for a cold cache, a
+  warm one, and the next page of results;
+- how many keystrokes were searched, served from the cache or skipped while
+  users type concurrently with debouncing on; each user's final query must
+  be answered with the same tools a direct search returns;
+- one inline query through the real Application against the fake Bot API.
+
+    python benchmarks/bench_inline.py --tools 20000 --users 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+from telegram import Update
+
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from config import INLINE_PAGE_SIZE, SEARCH_TOP_K
+from fake_telegram import FakeTelegramRequest
+from flood_control import SendScheduler
+from inline_mode import normalize_inline_query
+from session_store import InMemorySessionStore
+from synthetic_catalog import generate_tools
+
+TEMPLATES = ['{}', '{} tools', 'ai {}', '{} assistant', 'best {} app']
+
+
+class InlineRecorder:
+    """Collects the answers given to stubbed inline queries"""
+
+    def __init__(self):
+        self.answers = {}  # query id -> (article titles, next_offset)
+
+    def make_update(self, query_id, user_id, text, offset=''):
+        async def answer(results, **kwargs):
+            self.answers[query_id] = ([article.title for article in results], kwargs.get('next_offset'))
+            return True
+
+        inline_query = SimpleNamespace(id=query_id, query=text, offset=offset, from_user=SimpleNamespace(id=user_id),
+                                       answer=answer)
+        return SimpleNamespace(inline_query=inline_query, effective_user=inline_query.from_user)
+
+
+def make_queries(bot, count, seed):
+    rng = random.Random(seed)
+    words = sorted({word for purpose in bot.purposes for word in purpose.lower().split() if word.isalpha() and len(word) > 3})
+    words += sorted({tool.name.split()[0].lower() for tool in bot.tools_data[:500]})
+    return [rng.choice(TEMPLATES).format(rng.choice(words)) for _ in range(count)]
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label, seconds):
+    seconds = sorted(seconds)
+    print(f"  {label:<22} {len(seconds):>7} queries  p50 {percentile(seconds, 0.5) * 1e6:8.1f} us  "
+          f"p99 {percentile(seconds, 0.99) * 1e6:8.1f} us")
+
+
+async def measure_keystrokes(bot, queries):
+    """Type each query with debouncing off; return per-keystroke latencies for cold, warm and next-page requests"""
+    recorder = InlineRecorder()
+    context = SimpleNamespace(args=[])
+    bot.inline_debounce = 0
+    timings = {'cold': [], 'warm': [], 'next page': []}
+    query_ids = iter(range(1, 10 ** 9))
+    for label in ('cold', 'warm'):
+        for text in queries:
+            for end in range(1, len(text) + 1):
+                update = recorder.make_update(str(next(query_ids)), 1, text[:end])
+                started = time.perf_counter()
+                await bot.inline_query(update, context)
+                timings[label].append(time.perf_counter() - started)
+    for text in queries:
+        update = recorder.make_update(str(next(query_ids)), 1, text, offset=str(INLINE_PAGE_SIZE))
+        started = time.perf_counter()
+        await bot.inline_query(update, context)
+        timings['next page'].append(time.perf_counter() - started)
+    return timings
+
+
+async def simulate_typing(bot, queries, users, debounce, interval, seed):
+    """Users type concurrently with debouncing on; return (stats, failures)"""
+    rng = random.Random(seed)
+    recorder = InlineRecorder()
+    context = SimpleNamespace(args=[])
+    bot.inline_debounce = debounce
+    bot.inline_cache = type(bot.inline_cache)(bot.inline_cache.max_entries)
+    query_ids = iter(range(1, 10 ** 9))
+    final = {}  # user id -> (query id, text) of their last keystroke
+    tasks = []
+
+    async def type_query(user_id, text):
+        for end in range(1, len(text) + 1):
+            query_id = str(next(query_ids))
+            final[user_id] = (query_id, text[:end])
+            tasks.append(asyncio.create_task(bot.inline_query(recorder.make_update(query_id, user_id, text[:end]), context)))
+            # Typing speed varies, and some pauses are long enough to trigger a search mid-word
+            await asyncio.sleep(rng.uniform(0.3, 1.7) * interval if rng.random() > 0.1 else debounce * 1.5)
+
+    await asyncio.gather(*(type_query(user_id, rng.choice(queries)) for user_id in range(1, users + 1)))
+    await asyncio.gather(*tasks)
+
+    failures = []
+    for user_id, (query_id, text) in final.items():
+        answer = recorder.answers.get(query_id)
+        expected = [tool.name for tool in bot.search_tools_by_query(normalize_inline_query(text))[:INLINE_PAGE_SIZE]]
+        if answer is None:
+            failures.append(f"user {user_id}: final query {text!r} was not answered")
+        elif answer[0] != expected:
+            failures.append(f"user {user_id}: final query {text!r} answered with different tools than a search")
+    # An answered query was either found in the cache, before or after its debounce, or searched
+    hits = bot.inline_cache.stats()['hits']
+    return {
+        'keystrokes': len(tasks),
+        'skipped while typing': len(tasks) - len(recorder.answers),
+        'answered from the cache': hits,
+        'searched': len(recorder.answers) - hits,
+    }, failures
+
+
+async def run_application(json_path):
+    """Send one inline query through the real Application and check the Bot API call it makes"""
+    bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='')
+    bot.inline_debounce = 0
+    request = FakeTelegramRequest()
+    answers = []
+    respond = request.respond
+
+    def record(method, params):
+        if method == 'answerInlineQuery':
+            answers.append(params)
+        return respond(method, params)
+
+    request.respond = record
+    application = build_application(bot, token='123456:INLINE', request=request, metrics_port=0)
+    await application.initialize()
+    await application.start()
+    data = {'update_id': 1, 'inline_query': {
+        'id': '42', 'from': {'id': 7, 'is_bot': False, 'first_name': 'user7'}, 'query': 'video', 'offset': '',
+    }}
+    await application.update_queue.put(Update.de_json(data, application.bot))
+    # The inline handler does not block, so wait for its answer rather than for the queue
+    for _ in range(500):
+        if answers:
+            break
+        await asyncio.sleep(0.01)
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+    if not answers:
+        return ["the Application made no answerInlineQuery call"]
+    results = json.loads(answers[0]['results']) if isinstance(answers[0]['results'], str) else answers[0]['results']
+    expected = len(bot.search_tools_by_query('video')[:INLINE_PAGE_SIZE])
+    if len(results) != expected or answers[0].get('is_personal') not in (False, 'false'):
+        return [f"unexpected answerInlineQuery parameters: {len(results)} results, expected {expected}"]
+    return []
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'tools.json')
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(generate_tools(args.tools, seed=args.seed), file)
+        bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='',
+                                 sender=SendScheduler(chat_rate=0, global_rate=0))
+        queries = make_queries(bot, args.queries, args.seed)
+
+        print(f"{len(bot.tools_data)} tools, {len(queries)} queries typed one keystroke at a time "
+              f"(top {SEARCH_TOP_K}, {INLINE_PAGE_SIZE} per page)")
+        timings = await measure_keystrokes(bot, queries)
+        for label, seconds in timings.items():
+            report(label, seconds)
+
+        stats, failures = await simulate_typing(bot, queries, args.users, args.debounce, args.interval, args.seed)
+        print(f"\n{args.users} users typing, {args.interval * 1000:.0f}ms between keystrokes on average, "
+              f"{args.debounce * 1000:.0f}ms debounce")
+        print('  ' + ', '.join(f"{count} {label}" for label, count in stats.items()))
+
+        failures += await run_application(json_path)
+
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures[:10]))
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--users', type=int, default=50, help='users typing at the same time')
+    parser.add_argument('--interval', type=float, default=0.15, help='average seconds between keystrokes')
+    parser.add_argument('--debounce', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
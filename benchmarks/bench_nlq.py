@@ -0,0 +1,103 @@
+"""Regression check and throughput benchmark for detect_natural_language_query.
+
+Compares the bot's detector against the original per-message regex
+implementation on benchmarks/nlq_corpus.txt plus generated variants, fails
+on any difference, and reports messages per second for both:
+
+    python benchmarks/bench_nlq.py
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from bot_enhanced import AIToolsBotEnhanced, MAX_NATURAL_QUERY_LENGTH
+
+
+def reference_detect(text):
+    """The original implementation, kept verbatim as the regression oracle"""
+    patterns = [
+        r'tools?\s+for\s+(.+)',
+        r'(.+)\s+tools?',
+        r'find\s+(.+)\s+tools?',
+        r'show\s+(.+)\s+tools?',
+        r'(.+)\s+ai\s+tools?',
+        r'ai\s+tools?\s+for\s+(.+)',
+        r'best\s+(.+)\s+tools?',
+        r'(.+)\s+software',
+        r'(.+)\s+applications?',
+        r'(.+)\s+platforms?'
+    ]
+
+    text_lower = text.lower().strip()
+
+    for pattern in patterns:
+        match = re.search(pattern, text_lower)
+        if match:
+            search_term = match.group(1).strip()
+            search_term = re.sub(r'\b(the|a|an|for|with|using|best|top|good)\b', '', search_term).strip()
+            if search_term:
+                return search_term
+
+    return None
+
+
+def load_corpus(size, seed):
+    """Corpus lines plus random recombinations of their words"""
+    with open(os.path.join(BENCH_DIR, 'nlq_corpus.txt'), encoding='utf-8') as file:
+        corpus = [line.rstrip('\n') for line in file if line.strip()]
+    # Messages with embedded newlines exercise the '.' vs '\s' edge cases
+    corpus.append('multi\nline tools')
+    corpus.append('find\nvideo tools')
+
+    rng = random.Random(seed)
+    words = [word for line in corpus for word in line.split()] + ['tools', 'for', 'ai', 'software', 'best', 'the']
+    while len(corpus) < size:
+        corpus.append(' '.join(rng.choice(words) for _ in range(rng.randint(1, 8))))
+    return corpus
+
+
+def throughput(detect, messages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            detect(message)
+    elapsed = time.perf_counter() - started
+    return len(messages) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=5000, help='number of corpus messages')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    bot = AIToolsBotEnhanced(os.path.join(BENCH_DIR, '..', 'tools.json'))
+    messages = load_corpus(args.size, args.seed)
+
+    mismatches = [(message, reference_detect(message), bot.detect_natural_language_query(message))
+                  for message in messages if reference_detect(message) != bot.detect_natural_language_query(message)]
+    for message, expected, actual in mismatches[:10]:
+        print(f"MISMATCH {message!r}: expected {expected!r}, got {actual!r}")
+    if mismatches:
+        sys.exit(f"{len(mismatches)} of {len(messages)} messages differ")
+    print(f"{len(messages)} messages: output identical to the reference")
+
+    for label, sample in (('corpus', messages),
+                          ('numeric', [str(i) for i in range(1, 40)]),
+                          ('long (5k chars)', ['video ' * 800 + 'tool'])):
+        repeat = args.repeat if label != 'long (5k chars)' else 1
+        old = throughput(reference_detect, sample, repeat)
+        new = throughput(bot.detect_natural_language_query, sample, repeat)
+        print(f"{label:<16} reference {old:12,.0f} msg/s   current {new:12,.0f} msg/s   x{new / old:.1f}")
+    print(f"(messages longer than {MAX_NATURAL_QUERY_LENGTH} characters are not treated as queries)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark: CPU time per update for the static-screen handlers.
+
+Runs the real handlers against a stubbed Update and reports microseconds of
+process CPU per update. Run it on two commits to compare, e.g.:
+
+    python benchmarks/bench_render.py --iterations 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from bot_enhanced import AIToolsBotEnhanced
+from flood_control import SendScheduler
+
+
+async def _reply_text(text, **kwargs):
+    return None
+
+
+def make_update(text, user_id=1):
+    """Build a minimal stand-in for telegram.Update"""
+    message = SimpleNamespace(text=text, chat_id=user_id, reply_text=_reply_text)
+    return SimpleNamespace(message=message, effective_message=message, effective_user=SimpleNamespace(id=user_id))
+
+
+async def run(iterations, json_file_path):
+    # Unlimited send rates: the replies go through the scheduler but never wait
+    bot = AIToolsBotEnhanced(json_file_path, sender=SendScheduler(chat_rate=0, global_rate=0))
+    context = SimpleNamespace(args=[])
+    largest = max(range(len(bot.purposes)), key=lambda i: len(bot.get_tools_by_purpose(bot.purposes[i]))) + 1
+    cases = [
+        ('/start', bot.start_command, '/start'),
+        ('/stats', bot.stats_command, '/stats'),
+        ('/help', bot.help_command, '/help'),
+        (f'category {largest}', bot.handle_message, str(largest)),
+        ('invalid selection', bot.handle_message, '9999'),
+    ]
+
+    print(f"{len(bot.tools_data)} tools, {iterations} iterations per case")
+    for label, handler, text in cases:
+        update = make_update(text)
+        await handler(update, context)  # warm up
+        await bot.sender.drain()
+        started = time.process_time()
+        for _ in range(iterations):
+            await handler(update, context)
+            await bot.sender.drain()
+        elapsed = time.process_time() - started
+        print(f"{label:<20} {elapsed / iterations * 1e6:8.2f} us/update")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--json', default=os.path.join(BENCH_DIR, '..', 'tools.json'),
+                        help="catalog file to load (default: the repository's tools.json)")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations, args.json))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Latency and result-quality benchmark for tool search.
+
+Quality: a fixed set of queries (including misspellings) over tools.json,
+scored by hit@1 and precision@5 against a relevance rule per query, for both
+the ranked engine and the literal substring matching it replaced.
+
+Latency: the same queries plus typos of them against a synthetic catalog
+(50k tools by default), reporting p50/p99/max per query.
+
+Exits non-zero if quality or latency falls below the thresholds:
+
+    python benchmarks/bench_search.py --tools 50000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from catalog import build_tools
+from ranking import RankedSearch
+from synthetic_catalog import generate_tools
+from tool_index import ToolSearchIndex
+
+TOP_K = 50
+
+# (query, text that a relevant tool's name or category contains)
+QUALITY_QUERIES = [
+    ('video editing', 'video'),
+    ('vidoe editng', 'video'),
+    ('notion', 'notion'),
+    ('marketing', 'marketing'),
+    ('markting', 'marketing'),
+    ('music', 'music'),
+    ('muisc', 'music'),
+    ('resume', 'resume'),
+    ('resmue', 'resume'),
+    ('legal', 'legal'),
+    ('leagl', 'legal'),
+    ('crypto', 'crypto'),
+    ('game development', 'gam'),
+    ('healthcare', 'health'),
+    ('helthcare', 'health'),
+    ('ui ux design', 'ui/ux'),
+    ('copy.ai', 'copy.ai'),
+    ('figma', 'figma'),
+    ('cybersecurity', 'cybersecurity'),
+    ('cybersecurty', 'cybersecurity'),
+    ('travel', 'travel'),
+    ('agriculture', 'agriculture'),
+    ('language learning', 'language'),
+    ('customer support', 'customer support'),
+    ('automation', 'automation'),
+]
+
+MIN_HIT_AT_1 = 0.9
+MIN_PRECISION_AT_5 = 0.8
+MAX_P50_MS = 1.0
+
+
+def legacy_search(index, query):
+    """The file-order substring search with purpose-word fallback that ranking replaced"""
+    return index.substring_ids(query) or index.purpose_word_ids(query)
+
+
+def evaluate(tools, search):
+    hits = []
+    precisions = []
+    for query, needle in QUALITY_QUERIES:
+        ids = search(query)[:5]
+        relevant = [needle in tools[i].name.lower() or needle in tools[i].purpose.lower() for i in ids]
+        hits.append(1.0 if relevant and relevant[0] else 0.0)
+        precisions.append(sum(relevant) / 5 if relevant else 0.0)
+    return statistics.mean(hits), statistics.mean(precisions), hits
+
+
+def typo(rng, word):
+    """Swap two adjacent letters of a longer word"""
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=50000, help='synthetic catalog size for latency')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCH_DIR, '..', 'tools.json'), encoding='utf-8') as file:
+        tools = build_tools(json.load(file))
+    ranked = RankedSearch(tools)
+    index = ToolSearchIndex(tools)
+
+    new_hit, new_precision, new_hits = evaluate(tools, lambda query: ranked.search(query, TOP_K))
+    old_hit, old_precision, _ = evaluate(tools, lambda query: legacy_search(index, query))
+    print(f"quality on tools.json ({len(tools)} tools, {len(QUALITY_QUERIES)} queries)")
+    print(f"  ranked   hit@1 {new_hit:.2f}  precision@5 {new_precision:.2f}")
+    print(f"  literal  hit@1 {old_hit:.2f}  precision@5 {old_precision:.2f}")
+    for (query, _), hit in zip(QUALITY_QUERIES, new_hits):
+        if not hit:
+            print(f"  miss: {query!r}")
+
+    synthetic = build_tools(generate_tools(args.tools))
+    started = time.perf_counter()
+    engine = RankedSearch(synthetic)
+    print(f"\nlatency on {len(synthetic)} synthetic tools (index built in {time.perf_counter() - started:.2f}s)")
+
+    rng = random.Random(5)
+    queries = [query for query, _ in QUALITY_QUERIES]
+    queries += [' '.join(typo(rng, word) for word in query.split()) for query in queries]
+    queries += ['ai', 'ai tools marketing', 'xqzv']
+    samples = []
+    worst = (0.0, '')
+    for query in queries:
+        engine.search(query, TOP_K)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            engine.search(query, TOP_K)
+            elapsed = (time.perf_counter() - started) * 1000
+            samples.append(elapsed)
+            worst = max(worst, (elapsed, query))
+    samples.sort()
+    p50 = samples[len(samples) // 2]
+    p99 = samples[int(len(samples) * 0.99)]
+    print(f"  {len(queries)} queries x {args.repeat}: p50 {p50:.3f} ms  p99 {p99:.3f} ms  "
+          f"max {worst[0]:.3f} ms ({worst[1]!r})")
+
+    failures = []
+    if new_hit < MIN_HIT_AT_1:
+        failures.append(f"hit@1 {new_hit:.2f} < {MIN_HIT_AT_1}")
+    if new_precision < MIN_PRECISION_AT_5:
+        failures.append(f"precision@5 {new_precision:.2f} < {MIN_PRECISION_AT_5}")
+    if p50 > MAX_P50_MS:
+        failures.append(f"p50 {p50:.3f} ms > {MAX_P50_MS} ms")
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("\nOK")
+
+
+if __name__ == '__main__':
+    main()
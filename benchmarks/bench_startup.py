@@ -0,0 +1,222 @@
+"""Startup: time until updates are accepted, warming-up replies, the health check, and error-log cost.
+
+The bot starts against the fake Bot API with a synthetic catalog. Updates
+sent while the catalog still loads must get the warming-up notice, and
+/health must answer 503 until the bot is ready and 200 after. Once it is
+ready, /start must show the real categories. A warm-up that fails, on a
+catalog path that is a directory or while rendering a screen, must still
+leave the bot ready, and the catalog watcher must load the catalog once it
+can be read. Finally a burst of failing updates goes through the error
+handler, comparing its cost with formatting and logging every error with
+the whole Update.
+
+    python benchmarks/bench_startup.py --tools 100000
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# Catalog reloads, broadcasts and the metrics port would only add noise here
+os.environ.update(CATALOG_RELOAD_INTERVAL='0', METRICS_PORT='0', SEND_CHAT_RATE='0', SEND_GLOBAL_RATE='0',
+                  THROTTLE_RATE='0', THROTTLE_DUPLICATE_WINDOW='0', BROADCAST_DB_PATH='')
+
+from telegram import Update
+
+import bot_enhanced
+from bot_enhanced import WARMING_UP_MESSAGE, AIToolsBotEnhanced, build_application
+from fake_telegram import FakeTelegramRequest, make_update_json
+from metrics import MetricsServer
+from session_store import InMemorySessionStore
+from synthetic_catalog import generate_tools
+
+
+async def get_status(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def measure_startup(json_path):
+    """Start the bot without preloading; return (timings, failures)"""
+    failures = []
+    started = time.perf_counter()
+    bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='', preload=False)
+    request = FakeTelegramRequest()
+    application = build_application(bot, token='123456:STARTUP', request=request, metrics_port=0)
+    health = MetricsServer(bot.metrics, '127.0.0.1', 0, bot.ready.is_set)
+    await health.start()
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    accepting = time.perf_counter() - started
+
+    # Updates and health checks while the catalog loads
+    statuses = set()
+    update_ids = iter(range(1, 10 ** 6))
+    user_id = 0
+    while not bot.ready.is_set():
+        user_id += 1
+        await application.update_queue.put(Update.de_json(make_update_json(next(update_ids), user_id, '1'), application.bot))
+        statuses.add(await get_status(health.port, '/health'))
+        await asyncio.sleep(0.01)
+    ready = time.perf_counter() - started
+    warming_users = user_id
+
+    await application.update_queue.put(Update.de_json(make_update_json(next(update_ids), 10 ** 6, '/start'), application.bot))
+    after = await get_status(health.port, '/health')
+    await application.stop()
+    await bot.sender.drain()
+    await application.shutdown()
+    await application.post_shutdown(application)
+    await health.stop()
+
+    replies = {}
+    for _, chat_id, text in request.sent:
+        replies.setdefault(int(chat_id), []).append(text)
+    warned = sum(replies.get(user, [None])[0] == WARMING_UP_MESSAGE for user in range(1, warming_users + 1))
+    if warned < warming_users:
+        # The update sent just as loading finished may be handled for real
+        if warned < warming_users - 1:
+            failures.append(f"only {warned} of {warming_users} users got the warming-up reply")
+    if 503 not in statuses and warming_users > 1:
+        failures.append("/health did not answer 503 while warming up")
+    if after != 200:
+        failures.append(f"/health answered {after} once ready")
+    if replies.get(10 ** 6) != [bot.get_screen('start')]:
+        failures.append("/start after warm-up did not get the categories")
+    return {'accepting updates': accepting, 'ready': ready, 'users told to wait': warming_users}, failures
+
+
+async def check_failed_warm_up(directory, json_path):
+    """Warm up with errors load_catalog does not catch, then let the watcher recover; return failures"""
+    failures = []
+    unreadable = os.path.join(directory, 'unreadable.json')
+    # Reading a directory raises IsADirectoryError
+    os.mkdir(unreadable)
+    render_fails = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='', preload=False)
+
+    def broken_render(catalog):
+        raise RuntimeError('render failed')
+
+    render_fails.render_stats_screen = broken_render
+    bots = {
+        'catalog path is a directory': AIToolsBotEnhanced(unreadable, user_states=InMemorySessionStore(),
+                                                          snapshot_path='', preload=False),
+        'pre-rendering raises': render_fails,
+    }
+    # The failures are logged as errors
+    logging.disable(logging.ERROR)
+    try:
+        for label, bot in bots.items():
+            try:
+                await bot.warm_up()
+            except Exception as e:
+                failures.append(f"{label}: warm_up raised {e!r}")
+            if not bot.ready.is_set():
+                failures.append(f"{label}: the bot never became ready")
+                continue
+            watcher = asyncio.create_task(bot.watch_catalog(0.02))
+            if bot.json_file_path == unreadable:
+                await asyncio.sleep(0.1)
+                os.rmdir(unreadable)
+                shutil.copy(json_path, unreadable)
+            for _ in range(500):
+                if bot.tools_data:
+                    break
+                await asyncio.sleep(0.01)
+            watcher.cancel()
+            if not bot.tools_data:
+                failures.append(f"{label}: the catalog watcher did not load the catalog afterwards")
+    finally:
+        logging.disable(logging.NOTSET)
+    return failures
+
+
+def measure_error_burst(bot, count):
+    """Return seconds per error for the sampled error handler and for logging every error with the whole Update"""
+    stream = logging.StreamHandler(io.StringIO())
+    logger = bot_enhanced.logger
+    logger.addHandler(stream)
+    logger.propagate = False
+    try:
+        updates = [Update.de_json(make_update_json(update_id, update_id, 'tools for video'), None)
+                   for update_id in range(1, count + 1)]
+        errors = []
+        for _ in range(count):
+            try:
+                raise KeyError('tool')
+            except KeyError as e:
+                errors.append(e)
+
+        async def sampled():
+            for update, error in zip(updates, errors):
+                # Without a message, the handler only logs; replies are not what is measured
+                await bot.error_handler(SimpleNamespace(update_id=update.update_id), SimpleNamespace(error=error))
+
+        started = time.process_time()
+        asyncio.run(sampled())
+        sampled_seconds = (time.process_time() - started) / count
+
+        started = time.process_time()
+        for update, error in zip(updates, errors):
+            logger.warning(f'Update {update} caused error {error}')
+        eager_seconds = (time.process_time() - started) / count
+    finally:
+        logger.removeHandler(stream)
+        logger.propagate = True
+    return sampled_seconds, eager_seconds, bot.error_log.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=100000)
+    parser.add_argument('--errors', type=int, default=20000, help='failing updates in the error burst')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'tools.json')
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(generate_tools(args.tools), file)
+
+        started = time.perf_counter()
+        bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='')
+        blocking = time.perf_counter() - started
+        print(f"{args.tools} tools")
+        print(f"  loading before starting:   accepting updates after {blocking:6.2f}s")
+
+        timings, failures = asyncio.run(measure_startup(json_path))
+        print(f"  loading in the background: accepting updates after {timings['accepting updates']:6.2f}s, "
+              f"ready after {timings['ready']:6.2f}s, {timings['users told to wait']} users told to wait")
+        warm_up_failures = asyncio.run(check_failed_warm_up(directory, json_path))
+        recovered = 2 - len({failure.split(':')[0] for failure in warm_up_failures})
+        print(f"  failed warm-ups:           {recovered} of 2 ready, then recovered by the watcher")
+        failures += warm_up_failures
+
+    sampled_seconds, eager_seconds, stats = measure_error_burst(bot, args.errors)
+    print(f"\n{args.errors} failing updates")
+    print(f"  sampled error log          {sampled_seconds * 1e6:8.1f} us/error  "
+          f"({stats['logged']} logged, {stats['suppressed']} counted only)")
+    print(f"  every error with its Update {eager_seconds * 1e6:7.1f} us/error")
+
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""Broadcast delivery check against the fake Bot API, including a crash halfway through.
+
+Seeds a session database with users, some of whom exited and some of whom
+blocked the bot (the fake API answers 403 for them). Then:
+
+1. a bot in a child process takes an admin's /broadcast and is killed with
+   SIGKILL partway through delivery;
+2. a few users who have not got it yet exit, and a new bot resumes the job
+   from the broadcast database. Every active user must get the message: at
+   least once, and twice only if they were in the batch in flight at the
+   crash. Exited and blocked users get nothing, and the send rate stays
+   within BROADCAST_RATE;
+3. adding tools to the catalog and reloading it must announce them to the
+   users still active, which no longer includes those who blocked the bot;
+4. /broadcast from a non-admin, or an admin's mistyped sub-command such as
+   '/broadcast cancel' without a number, must queue nothing;
+5. queuing a broadcast for a large audience must not stall the event loop,
+   which keeps handling updates while the recipients are stored;
+6. with a broadcast database that cannot be opened, the catalog watcher must
+   keep loading new tools, although their announcements fail.
+
+    python benchmarks/broadcast_test.py --users 1000 --rate 200 --audience 200000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+ADMIN_ID = 424242
+# Read by the child process too, which inherits the environment
+os.environ.update(THROTTLE_RATE='0', THROTTLE_DUPLICATE_WINDOW='0', SEND_CHAT_RATE='0', SEND_GLOBAL_RATE='0',
+                  CATALOG_RELOAD_INTERVAL='0', METRICS_PORT='0', ADMIN_USER_IDS=str(ADMIN_ID),
+                  BROADCAST_BATCH_SIZE='50', BROADCAST_PROGRESS_INTERVAL='0.5', BROADCAST_POLL_INTERVAL='0.2',
+                  LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+if '--rate' in sys.argv:
+    os.environ['BROADCAST_RATE'] = sys.argv[sys.argv.index('--rate') + 1]
+os.environ.setdefault('BROADCAST_RATE', '200')
+
+from telegram import Update
+
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from broadcast import DONE, Broadcaster, BroadcastQueue
+from config import BROADCAST_BATCH_SIZE, BROADCAST_CONCURRENCY, BROADCAST_RATE
+from fake_telegram import FakeTelegramRequest, make_update_json
+from flood_control import SendScheduler
+from session_store import InMemorySessionStore, SQLiteSessionStore
+from synthetic_catalog import generate_tools
+
+BROADCAST_TEXT = 'Big news: the board now has a newsletter!\nReply start to browse.'
+NEW_CATEGORY = '🧪 Lab Experiments'
+
+
+class JournalTelegramRequest(FakeTelegramRequest):
+    """Answers 403 for users who blocked the bot, and appends delivered messages to a per-process file"""
+
+    def __init__(self, directory, blocked):
+        super().__init__()
+        self.path = os.path.join(directory, f'{os.getpid()}.jsonl')
+        self.blocked = blocked
+        self.edits = 0
+
+    def respond(self, method, params):
+        chat_id = int(params.get('chat_id', 0))
+        if method == 'sendMessage' and chat_id in self.blocked:
+            return 403, {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}
+        if method == 'sendMessage':
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps([time.monotonic(), chat_id, params.get('text')]) + '\n')
+        if method == 'editMessageText':
+            self.edits += 1
+        return super().respond(method, params)
+
+
+def user_groups(users):
+    """(active, exited, blocked) user ids; exited and blocked users do not overlap"""
+    exited = {user_id for user_id in range(1, users + 1) if user_id % 10 == 0}
+    blocked = {user_id for user_id in range(1, users + 1) if user_id % 15 == 1}
+    active = set(range(1, users + 1)) - exited - blocked
+    return active, exited, blocked
+
+
+def make_bot(directory, users):
+    bot = AIToolsBotEnhanced(
+        os.path.join(directory, 'tools.json'), snapshot_path='',
+        user_states=SQLiteSessionStore(os.path.join(directory, 'sessions.db')),
+        broadcaster=None,
+    )
+    # The harness points the queue at its own database
+    bot.broadcaster = Broadcaster(BroadcastQueue(os.path.join(directory, 'broadcasts.db')), bot.sender, bot.user_states)
+    request = JournalTelegramRequest(os.path.join(directory, 'journal'), user_groups(users)[2])
+    return bot, request, build_application(bot, token='123456:BROADCAST', request=request)
+
+
+async def start(application):
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+
+
+async def stop(application):
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+
+
+def run_child(directory, users):
+    """Take the admin's /broadcast and deliver it until the parent kills this process"""
+    async def serve():
+        bot, request, application = make_bot(directory, users)
+        await start(application)
+        await application.update_queue.put(Update.de_json(
+            make_update_json(1, ADMIN_ID, f'/broadcast {BROADCAST_TEXT}'), application.bot
+        ))
+        await asyncio.sleep(3600)
+    asyncio.run(serve())
+
+
+def read_journal(directory):
+    sent = []
+    journal = os.path.join(directory, 'journal')
+    for name in os.listdir(journal):
+        with open(os.path.join(journal, name), encoding='utf-8') as file:
+            sent.extend(json.loads(line) for line in file if line.endswith('\n'))
+    return sorted(sent)
+
+
+def max_per_second(times):
+    """Most messages sent in any one-second window"""
+    best, start = 0, 0
+    for end in range(len(times)):
+        while times[end] - times[start] >= 1.0:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def wait_for_job(queue, job_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get_job(job_id)
+        if job is not None and job['status'] == DONE:
+            return job
+        await asyncio.sleep(0.1)
+    return queue.get_job(job_id)
+
+
+def exit_undelivered(directory, active, count):
+    """Make `count` active users who have not got the broadcast yet leave the bot; return their ids"""
+    delivered = {chat_id for _, chat_id, _ in read_journal(directory)}
+    leaving = sorted(active - delivered)[-count:]
+    store = SQLiteSessionStore(os.path.join(directory, 'sessions.db'))
+    for user_id in leaving:
+        store.set(user_id, 'exit', active=False)
+    store.close()
+    return set(leaving)
+
+
+async def resume_and_announce(directory, users, left, failures):
+    active, exited, blocked = user_groups(users)
+    active -= left
+    bot, request, application = make_bot(directory, users)
+    queue = bot.broadcaster.queue
+    resumed_at = time.monotonic()
+    await start(application)
+    job = await wait_for_job(queue, 1, timeout=users / BROADCAST_RATE * 4 + 30)
+    elapsed = time.monotonic() - resumed_at
+
+    sent = read_journal(directory)
+    received = {}
+    for _, chat_id, text in sent:
+        if text == BROADCAST_TEXT:
+            received[chat_id] = received.get(chat_id, 0) + 1
+    missing = active - set(received)
+    duplicates = sum(count - 1 for count in received.values())
+    resumed_times = [at for at, _, text in sent if text == BROADCAST_TEXT and at >= resumed_at]
+    print(f"resumed broadcast: {len(resumed_times)} sent in {elapsed:.2f}s, {duplicates} sent twice across the crash, "
+          f"peak {max_per_second(resumed_times)} messages/s (limit {BROADCAST_RATE:.0f})")
+    print(f"  job #1: {job}")
+    if job is None or job['status'] != DONE:
+        failures.append("the broadcast did not finish after resuming")
+    elif (job['sent'], job['skipped'], job['blocked']) != (len(active), len(left), len(blocked)):
+        # Users who exited before the /broadcast are not recipients at all
+        failures.append(f"job counts {job['sent']}/{job['skipped']}/{job['blocked']} sent/skipped/blocked, expected "
+                        f"{len(active)}/{len(left)}/{len(blocked)}")
+    if missing:
+        failures.append(f"{len(missing)} active users never got the broadcast")
+    if set(received) & (exited | blocked | left):
+        failures.append("exited or blocked users got the broadcast")
+    if duplicates > BROADCAST_BATCH_SIZE:
+        failures.append(f"{duplicates} duplicates, more than the {BROADCAST_BATCH_SIZE} users of one batch")
+    if max_per_second(resumed_times) > BROADCAST_RATE + BROADCAST_CONCURRENCY:
+        failures.append("the broadcast went faster than BROADCAST_RATE")
+    if ADMIN_ID not in {chat_id for _, chat_id, text in sent if text.startswith('📣')} or request.edits == 0:
+        failures.append("the admin got no progress message, or it was never updated")
+
+    # New tools appear in the catalog: announce them to users still active
+    tools_path = os.path.join(directory, 'tools.json')
+    with open(tools_path, encoding='utf-8') as file:
+        tools = json.load(file)
+    tools += [{'name': f'Lab Tool {n}', 'purpose': NEW_CATEGORY, 'link': f'https://lab{n}.example'} for n in range(7)]
+    with open(tools_path, 'w', encoding='utf-8') as file:
+        json.dump(tools, file)
+    await bot.reload_catalog()
+    announcement = queue.next_job() or queue.recent_jobs(1)[0]
+    job = await wait_for_job(queue, announcement['id'], timeout=users / BROADCAST_RATE * 4 + 30)
+    announced = {chat_id for _, chat_id, text in read_journal(directory) if NEW_CATEGORY in text}
+    print(f"announcement: {job['sent']} sent, {job['total']} recipients")
+    if announcement['kind'] != 'announcement' or 'Lab Tool 0' not in announcement['text']:
+        failures.append("reloading the catalog did not queue an announcement of the new tools")
+    elif announced != active or job['total'] != len(active):
+        failures.append(f"announcement reached {len(announced)} users, expected the {len(active)} active ones")
+
+    # Only admins may broadcast, and a mistyped sub-command must not go out to everyone as a message
+    jobs_before = len(queue.recent_jobs(100))
+    mistyped = ['/broadcast cancel', '/broadcast status now', '/broadcast Cancel 1 2', '/broadcast cancel first']
+    commands = [(5, '/broadcast spam'), (ADMIN_ID, '/broadcast status')] + [(ADMIN_ID, text) for text in mistyped]
+    asked_at = time.monotonic()
+    replies = []
+    # One at a time: identical replies still queued for a chat are sent once
+    for offset, (user_id, text) in enumerate(commands):
+        await application.update_queue.put(Update.de_json(make_update_json(10 ** 6 + offset, user_id, text), application.bot))
+        for _ in range(200):
+            replies = [(chat_id, text) for at, chat_id, text in read_journal(directory) if at >= asked_at]
+            if len(replies) > offset:
+                break
+            await asyncio.sleep(0.01)
+    await stop(application)
+    usage = sum(chat_id == ADMIN_ID and text.startswith('📣 Broadcast commands') for chat_id, text in replies)
+    if len(BroadcastQueue(os.path.join(directory, 'broadcasts.db')).recent_jobs(100)) != jobs_before:
+        failures.append("a non-admin or a mistyped sub-command queued a broadcast")
+    if usage != len(mistyped):
+        failures.append(f"{usage} of {len(mistyped)} mistyped sub-commands got the usage reply")
+
+
+async def measure_enqueue(directory, audience):
+    """Queue a broadcast for `audience` users; return (seconds taken, longest event loop stall, recipients)"""
+    store = SQLiteSessionStore(os.path.join(directory, 'audience.db'))
+    for user_id in range(1, audience + 1):
+        store.set(user_id, 'start')
+    broadcaster = Broadcaster(BroadcastQueue(os.path.join(directory, 'audience_broadcasts.db')), SendScheduler(), store)
+    stall = 0.0
+
+    async def tick():
+        nonlocal stall
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - started - 0.001)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    _, recipients = await broadcaster.enqueue('broadcast', BROADCAST_TEXT)
+    elapsed = time.perf_counter() - started
+    ticker.cancel()
+    broadcaster.queue.close()
+    store.close()
+    return elapsed, stall, recipients
+
+
+async def watch_without_broadcasts(directory):
+    """Add tools twice under a running catalog watcher whose announcements fail; return the tools it loaded each time"""
+    path = os.path.join(directory, 'watched.json')
+    tools = generate_tools(50)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(tools, file)
+    bot = AIToolsBotEnhanced(path, user_states=InMemorySessionStore(), snapshot_path='', broadcaster=None)
+    # SQLite cannot open a directory as its database
+    bot.broadcaster = Broadcaster(BroadcastQueue(directory), bot.sender, bot.user_states)
+    bot.broadcaster.delivering = True  # As if this process ran the delivery loop
+    watcher = asyncio.create_task(bot.watch_catalog(0.02))
+    loaded = []
+    for round_number in range(2):
+        tools.append({'name': f'Watched Tool {round_number}', 'purpose': NEW_CATEGORY, 'link': 'https://watched.example'})
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(tools, file)
+        for _ in range(200):
+            if len(bot.catalog.tools) == len(tools) or watcher.done():
+                break
+            await asyncio.sleep(0.01)
+        loaded.append(len(bot.catalog.tools))
+    watcher.cancel()
+    return loaded, [len(tools) - 1, len(tools)]
+
+
+def seed(directory, users):
+    with open(os.path.join(directory, 'tools.json'), 'w', encoding='utf-8') as file:
+        json.dump(generate_tools(200), file)
+    os.mkdir(os.path.join(directory, 'journal'))
+    _, exited, _ = user_groups(users)
+    store = SQLiteSessionStore(os.path.join(directory, 'sessions.db'))
+    for user_id in range(1, users + 1):
+        store.set(user_id, 'exit' if user_id in exited else 'start', active=user_id not in exited)
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rate', type=float, help='BROADCAST_RATE for this run (default 200)')
+    parser.add_argument('--crash-after', type=float, default=0.4, help='fraction of users reached before the crash')
+    parser.add_argument('--audience', type=int, default=200000, help='users a broadcast is queued for in the stall check')
+    args = parser.parse_args()
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, args.users)
+
+        child = multiprocessing.get_context('spawn').Process(target=run_child, args=(directory, args.users))
+        child.start()
+        target = int(args.users * args.crash_after)
+        deadline = time.monotonic() + args.users / BROADCAST_RATE * 4 + 30
+        while len(read_journal(directory)) < target and time.monotonic() < deadline and child.is_alive():
+            time.sleep(0.05)
+        child.kill()
+        child.join()
+        left = exit_undelivered(directory, user_groups(args.users)[0], 5)
+        print(f"{args.users} users: crashed after {len(read_journal(directory))} messages, then {len(left)} users exited")
+
+        asyncio.run(resume_and_announce(directory, args.users, left, failures))
+
+        elapsed, stall, recipients = asyncio.run(measure_enqueue(directory, args.audience))
+        print(f"queuing for {recipients} users: {elapsed:.2f}s, event loop stalled at most {stall * 1000:.1f}ms")
+        if recipients != args.audience:
+            failures.append(f"queued for {recipients} of {args.audience} active users")
+        if stall > max(0.1, elapsed / 4):
+            failures.append(f"queuing a broadcast stalled the event loop for {stall * 1000:.0f}ms")
+
+        # The failed announcements are logged as errors
+        logging.disable(logging.ERROR)
+        try:
+            loaded, expected = asyncio.run(watch_without_broadcasts(directory))
+        finally:
+            logging.disable(logging.NOTSET)
+        print(f"catalog watcher with a broken broadcast database: loaded {loaded} tools, expected {expected}")
+        if loaded != expected:
+            failures.append("a failed announcement stopped the catalog watcher")
+
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
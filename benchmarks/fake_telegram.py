@@ -0,0 +1,114 @@
+"""A stand-in for the Telegram Bot API so the real Application can run offline.
+
+Pass FakeTelegramRequest() as the request of an Application (see
+bot_enhanced.build_application); every Bot API call is answered locally
+and sent messages are recorded instead of delivered.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+from telegram.request import BaseRequest
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'AI Tools Board', 'username': 'ai_tools_board_bot'}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Answers Bot API methods locally and records every sendMessage"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency  # Simulated round trip per API call, in seconds
+        self.sent = []  # (monotonic time, chat_id, text)
+        self.calls = {}  # method name -> count
+        self.on_send = None  # Optional callback(chat_id, text) for each sendMessage
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def respond(self, method, params):
+        """Return the (status, payload) for one Bot API call; override to inject failures"""
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': BOT_USER}
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            message = {
+                'message_id': len(self.sent) + 1,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+            return 200, {'ok': True, 'result': message}
+        return 200, {'ok': True, 'result': True}
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        params = request_data.parameters if request_data is not None else {}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        status, payload = self.respond(api_method, params)
+        if status == 200 and api_method == 'sendMessage':
+            self.sent.append((time.monotonic(), params.get('chat_id'), params.get('text')))
+            if self.on_send is not None:
+                self.on_send(params.get('chat_id'), params.get('text'))
+        return status, json.dumps(payload).encode('utf-8')
+
+
+class FloodLimitedTelegramRequest(FakeTelegramRequest):
+    """A fake Bot API that enforces flood limits like Telegram does, answering 429 with retry_after.
+
+    At most chat_limit messages per chat and global_limit messages overall
+    are accepted in any window of `window` seconds; sends over the limit
+    are rejected and counted in `rejected`.
+    """
+
+    def __init__(self, latency=0.0, chat_limit=3, global_limit=30, window=1.0, retry_after=1):
+        super().__init__(latency)
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self.window = window
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._chat_sends = {}  # chat_id -> deque of accepted send times
+        self._global_sends = deque()
+
+    def respond(self, method, params):
+        if method not in ('sendMessage', 'editMessageText'):
+            return super().respond(method, params)
+        now = time.monotonic()
+        chat_sends = self._chat_sends.setdefault(params.get('chat_id'), deque())
+        for sends in (chat_sends, self._global_sends):
+            while sends and now - sends[0] >= self.window:
+                sends.popleft()
+        if len(chat_sends) >= self.chat_limit or len(self._global_sends) >= self.global_limit:
+            self.rejected += 1
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }
+        chat_sends.append(now)
+        self._global_sends.append(now)
+        return super().respond(method, params)
+
+
+def make_update_json(update_id, user_id, text):
+    """Build the JSON Telegram would send for a private text message"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return {'update_id': update_id, 'message': message}
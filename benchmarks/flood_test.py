@@ -0,0 +1,141 @@
+"""Flood-control check against a fake Bot API that answers 429s like Telegram.
+
+Many users send bursts of messages (with repeats) at once. The script runs the
+real Application three times:
+
+- unlimited: no throttle, no send limits, no retries (like replying directly)
+- default: the configured throttle and send scheduler
+- strict API: the default bot against an API with much tighter limits, so
+  429s do happen and must be retried after retry_after
+
+Then a reply the API rejects with a 400 must reach the error handler: it is
+counted in bot_handler_errors_total and the user gets the plain-text error
+message instead of silence.
+
+    python benchmarks/flood_test.py --users 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from telegram import Update
+
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from fake_telegram import FakeTelegramRequest, FloodLimitedTelegramRequest, make_update_json
+from flood_control import SendScheduler, UserThrottle
+from session_store import InMemorySessionStore
+
+BURST = ['start', 'start', 'start', '1', '2', '3', 'tools for video', 'tools for video', '/stats', '4', '5', '6']
+
+
+async def run(label, bot, request, users):
+    application = build_application(bot, token='123456:FLOODTEST', request=request, metrics_port=0)
+    await application.initialize()
+    await application.start()
+
+    started = time.monotonic()
+    update_ids = iter(range(1, users * len(BURST) + 1))
+    for text in BURST:
+        for user_id in range(1, users + 1):
+            update = Update.de_json(make_update_json(next(update_ids), user_id, text), application.bot)
+            await application.update_queue.put(update)
+    while not application.update_queue.empty():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    await bot.sender.drain()
+    elapsed = time.monotonic() - started
+
+    await application.stop()
+    await application.shutdown()
+
+    sender = bot.sender.stats()
+    throttle = bot.throttle.stats()
+    print(f"{label:<12} {users * len(BURST):>5} in  {throttle['merged']:>4} merged  {throttle['dropped']:>4} throttled  "
+          f"{len(request.sent):>5} delivered  {request.rejected:>4} x 429  {sender['retries']:>4} retried  "
+          f"{sender['coalesced']:>3} coalesced  {sender['dropped']:>3} dropped  {sender['failures']:>4} failed  {elapsed:6.2f}s")
+    return request, sender
+
+
+class MarkdownRejectingRequest(FakeTelegramRequest):
+    """A fake Bot API that cannot parse any Markdown message"""
+
+    def respond(self, method, params):
+        if method == 'sendMessage' and params.get('parse_mode'):
+            return 400, {'ok': False, 'error_code': 400, 'description': "Bad Request: can't parse entities"}
+        return super().respond(method, params)
+
+
+async def check_rejected_reply():
+    """Send /start to an API that rejects its Markdown reply; return failures"""
+    bot = make_bot()
+    request = MarkdownRejectingRequest()
+    application = build_application(bot, token='123456:FLOODTEST', request=request, metrics_port=0)
+    await application.initialize()
+    await application.start()
+    # The error handler logs the rejected reply
+    logging.disable(logging.WARNING)
+    try:
+        await application.update_queue.put(Update.de_json(make_update_json(1, 1, '/start'), application.bot))
+        for _ in range(200):
+            if request.sent:
+                break
+            await asyncio.sleep(0.01)
+        await bot.sender.drain()
+    finally:
+        logging.disable(logging.NOTSET)
+    await application.stop()
+    await application.shutdown()
+
+    errors = bot.handler_errors.values.get(('send',), 0)
+    replies = [text for _, _, text in request.sent]
+    print(f"rejected reply: {errors} counted in bot_handler_errors_total, {len(replies)} error message sent")
+    failures = []
+    if errors != 1:
+        failures.append(f"the rejected reply was counted {errors} times in bot_handler_errors_total")
+    if len(replies) != 1 or not replies[0].startswith('❌ An error occurred'):
+        failures.append(f"the user got {replies} instead of the error message")
+    return failures
+
+
+def make_bot(sender=None, throttle=None):
+    return AIToolsBotEnhanced(os.path.join(BENCH_DIR, '..', 'tools.json'), user_states=InMemorySessionStore(),
+                              sender=sender, throttle=throttle)
+
+
+async def main_async(args):
+    await run('unlimited', make_bot(SendScheduler(chat_rate=0, global_rate=0, max_retries=0, max_pending=1000),
+                                    UserThrottle(rate=0, duplicate_window=0)),
+              FloodLimitedTelegramRequest(), args.users)
+    default_request, default_sender = await run('default', make_bot(), FloodLimitedTelegramRequest(), args.users)
+    strict_request, strict_sender = await run(
+        'strict API', make_bot(), FloodLimitedTelegramRequest(chat_limit=1, global_limit=10), args.users
+    )
+
+    failures = []
+    if default_request.rejected:
+        failures.append(f"default settings drew {default_request.rejected} 429s")
+    if default_sender['failures'] or strict_sender['failures']:
+        failures.append("some replies were never delivered")
+    if not strict_sender['retries']:
+        failures.append("the strict API run never exercised retry_after")
+    failures += await check_rejected_reply()
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Replay an update stream through the real handlers and report per-handler performance.
+
+The bot is built against tools.json or a synthetic catalog of any size, and
+each update goes to the handler the Application would route it to, with a
+stubbed Update whose replies are discarded. Streams are either generated
+(numeric selections, natural-language queries, /search, /stats, /help,
+start/exit) or replayed from a JSON Lines file of Telegram updates or
+{"user_id": ..., "text": ...} records.
+
+Reports throughput and p50/p99 latency per handler type, then replays again
+under tracemalloc for the bytes each update leaves allocated and the peak
+memory it needs. Save results
+with --output and pass them to --compare on another commit:
+
+    python benchmarks/replay.py --tools 10000 --updates 20000 --record /tmp/stream.jsonl --output /tmp/before.json
+    python benchmarks/replay.py --tools 10000 --stream /tmp/stream.jsonl --compare /tmp/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bot_enhanced import MAX_NATURAL_QUERY_LENGTH, NATURAL_QUERY_KEYWORDS, AIToolsBotEnhanced
+from flood_control import SendScheduler
+from session_store import InMemorySessionStore
+from synthetic_catalog import generate_tools
+
+# Share of each kind of message in a generated stream
+MIX = {
+    'category': 40,
+    'natural': 25,
+    'search': 10,
+    'start': 8,
+    'stats': 5,
+    'help': 3,
+    'exit': 3,
+    'unknown': 6,
+}
+NATURAL_TEMPLATES = ['tools for {}', '{} tools', 'best {} tools', 'ai tools for {}', '{} software', 'show {} tools']
+UNKNOWN_MESSAGES = ['hello', 'thanks!', 'what can you do?', '👍', 'ok', '0', '99999']
+
+
+async def _discard_reply(text, **kwargs):
+    return None
+
+
+def make_update(user_id, text):
+    """Build a minimal stand-in for telegram.Update"""
+    message = SimpleNamespace(text=text, chat_id=user_id, message_id=1, reply_text=_discard_reply)
+    return SimpleNamespace(message=message, effective_message=message, effective_user=SimpleNamespace(id=user_id))
+
+
+def generate_stream(bot, count, users, seed):
+    """Return (user_id, text) pairs following MIX, with query words taken from the catalog"""
+    rng = random.Random(seed)
+    words = sorted({word for purpose in bot.purposes for word in purpose.lower().split() if word.isalpha() and len(word) > 3})
+    names = [tool.name for tool in bot.tools_data[:1000]]
+    kinds = list(MIX)
+    weights = list(MIX.values())
+    stream = []
+    for _ in range(count):
+        # A few users send most of the traffic
+        user_id = min(int(rng.paretovariate(1.0)), users)
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'category':
+            text = str(rng.randint(1, max(len(bot.purposes), 1)))
+        elif kind == 'natural':
+            # Popular queries repeat, as they do in real traffic
+            text = rng.choice(NATURAL_TEMPLATES).format(words[min(int(rng.expovariate(0.15)), len(words) - 1)])
+        elif kind == 'search':
+            text = f"/search {rng.choice(names).split()[0].lower() if rng.random() < 0.5 else rng.choice(words)}"
+        elif kind in ('start', 'exit'):
+            text = kind if rng.random() < 0.5 or kind == 'exit' else '/start'
+        elif kind in ('stats', 'help'):
+            text = f'/{kind}'
+        else:
+            text = rng.choice(UNKNOWN_MESSAGES)
+        stream.append((user_id, text))
+    return stream
+
+
+def read_stream(path):
+    """Read (user_id, text) pairs from JSON Lines of Telegram updates or {"user_id", "text"} records"""
+    stream = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            message = record.get('message')
+            if message is not None:
+                if 'text' in message:
+                    stream.append((message['from']['id'], message['text']))
+            else:
+                stream.append((record['user_id'], record['text']))
+    return stream
+
+
+def is_natural_language_query(bot, text):
+    """Whether detect_natural_language_query would find a query, without touching its cache or timers"""
+    text_lower = text.lower().strip()
+    return (len(text) <= MAX_NATURAL_QUERY_LENGTH and NATURAL_QUERY_KEYWORDS.search(text_lower) is not None
+            and bot.match_natural_language_query(text_lower) is not None)
+
+
+def route(bot, text):
+    """Return (handler type, handler, context args) the way build_application routes a message"""
+    if text.startswith('/'):
+        command, *args = text.split()
+        handler = {
+            '/start': bot.start_command, '/help': bot.help_command,
+            '/stats': bot.stats_command, '/search': bot.search_command,
+        }.get(command)
+        if handler is not None:
+            return command[1:], handler, args
+        return 'unknown', None, args
+
+    lowered = text.strip().lower()
+    if lowered in ('start', 'exit'):
+        return lowered, bot.handle_message, []
+    if lowered.isdigit():
+        return 'category', bot.handle_message, []
+    if is_natural_language_query(bot, text):
+        return 'natural', bot.handle_message, []
+    return 'unknown', bot.handle_message, []
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def replay(bot, routed, memory=False):
+    """Run a routed stream once; return {handler type: list of (seconds, allocated bytes, peak bytes)}"""
+    results = {}
+    for user_id, text, (kind, handler, args) in routed:
+        if handler is None:
+            continue
+        update = make_update(user_id, text)
+        context = SimpleNamespace(args=args)
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        await handler(update, context)
+        await bot.sender.drain()
+        elapsed = time.perf_counter() - started
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            results.setdefault(kind, []).append((elapsed, max(current - before, 0), peak - before))
+        else:
+            results.setdefault(kind, []).append((elapsed, 0, 0))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def summarize(timings, memory):
+    summary = {}
+    for kind in sorted(timings):
+        seconds = sorted(elapsed for elapsed, _, _ in timings[kind])
+        samples = memory.get(kind, [])
+        summary[kind] = {
+            'updates': len(seconds),
+            'per_second': len(seconds) / sum(seconds) if sum(seconds) else 0.0,
+            'p50_us': percentile(seconds, 0.5) * 1e6,
+            'p99_us': percentile(seconds, 0.99) * 1e6,
+            'allocated_bytes': sum(allocated for _, allocated, _ in samples) / len(samples) if samples else 0.0,
+            'peak_bytes': max((peak for _, _, peak in samples), default=0),
+        }
+    return summary
+
+
+def print_summary(summary, total_updates, elapsed, baseline=None):
+    print(f"{'handler':<10} {'updates':>8} {'updates/s':>10} {'p50 us':>9} {'p99 us':>9} "
+          f"{'alloc B/upd':>12} {'peak KiB':>9}")
+    for kind, row in summary.items():
+        line = (f"{kind:<10} {row['updates']:>8} {row['per_second']:>10,.0f} {row['p50_us']:>9.1f} {row['p99_us']:>9.1f} "
+                f"{row['allocated_bytes']:>12,.0f} {row['peak_bytes'] / 1024:>9.1f}")
+        old = (baseline or {}).get(kind)
+        if old:
+            line += f"   p50 x{row['p50_us'] / old['p50_us']:.2f}  p99 x{row['p99_us'] / old['p99_us']:.2f}"
+        print(line)
+    print(f"\noverall: {total_updates} updates in {elapsed:.2f}s, {total_updates / elapsed:,.0f} updates/s, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = args.json
+        if json_path is None:
+            json_path = os.path.join(directory, 'tools.json')
+            with open(json_path, 'w', encoding='utf-8') as file:
+                json.dump(generate_tools(args.tools, seed=args.seed), file)
+        started = time.perf_counter()
+        bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(),
+                                 sender=SendScheduler(chat_rate=0, global_rate=0))
+        load_seconds = time.perf_counter() - started
+
+    stream = read_stream(args.stream) if args.stream else generate_stream(bot, args.updates, args.users, args.seed)
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as file:
+            for user_id, text in stream:
+                file.write(json.dumps({'user_id': user_id, 'text': text}, ensure_ascii=False) + '\n')
+
+    revision = git_revision()
+    print(f"commit {revision}: {len(bot.tools_data)} tools loaded in {load_seconds:.2f}s, {len(stream)} updates")
+
+    # Routed once up front: only the handlers may fill the caches they are measured with
+    routed = [(user_id, text, route(bot, text)) for user_id, text in stream]
+
+    # Warm-up pass fills the caches as a long-running bot would have them
+    await replay(bot, routed[:args.warmup])
+    started = time.perf_counter()
+    timings = await replay(bot, routed)
+    elapsed = time.perf_counter() - started
+
+    memory = {}
+    if not args.no_memory:
+        tracemalloc.start()
+        memory = await replay(bot, routed, memory=True)
+        tracemalloc.stop()
+
+    summary = summarize(timings, memory)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            previous = json.load(file)
+        baseline = previous['handlers']
+        print(f"compared with commit {previous['commit']} ({previous['tools']} tools, {previous['updates']} updates)")
+    print_summary(summary, sum(row['updates'] for row in summary.values()), elapsed, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'commit': revision,
+                'tools': len(bot.tools_data),
+                'updates': len(stream),
+                'seed': args.seed,
+                'load_seconds': load_seconds,
+                'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'handlers': summary,
+            }, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=10000, help='synthetic catalog size')
+    parser.add_argument('--json', help='replay against this catalog file instead of a synthetic one')
+    parser.add_argument('--updates', type=int, default=20000, help='length of a generated stream')
+    parser.add_argument('--users', type=int, default=5000, help='distinct users in a generated stream')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stream', help='JSON Lines file of updates to replay instead of generating them')
+    parser.add_argument('--record', help='save the stream as JSON Lines for later replays')
+    parser.add_argument('--warmup', type=int, default=2000, help='updates replayed before measuring')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='results JSON from another run to compare against')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
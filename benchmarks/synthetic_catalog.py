@@ -0,0 +1,56 @@
+"""Generate synthetic tool catalogs of any size, shaped like tools.json.
+
+Names and categories are recombined from the words of the real catalog so
+token frequencies stay realistic:
+
+    python benchmarks/synthetic_catalog.py 50000 > /tmp/tools_50k.json
+"""
+import json
+import os
+import random
+import re
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_JSON = os.path.join(BENCH_DIR, '..', 'tools.json')
+
+SUFFIXES = ['', '', '', ' AI', '.ai', ' Pro', ' Studio', ' Labs', 'ly', 'ify', ' GPT', ' Hub']
+EMOJIS = ['🧩', '🛰️', '🧭', '🔬', '🗂️', '🏗️', '🚚', '🏥', '🏦', '🎬']
+
+
+def generate_tools(count, seed=42):
+    """Return `count` tool dicts with realistic names, purposes and links"""
+    with open(TOOLS_JSON, encoding='utf-8') as file:
+        real_tools = json.load(file)
+
+    rng = random.Random(seed)
+    name_words = sorted({word for tool in real_tools for word in re.findall(r'[A-Za-z]{3,}', tool['name'])})
+    purpose_words = sorted({word for tool in real_tools for word in re.findall(r'[A-Za-z]{3,}', tool['purpose'])})
+    real_purposes = sorted({tool['purpose'] for tool in real_tools})
+
+    # Roughly one category per 200 tools, at least the real ones
+    purposes = list(real_purposes)
+    while len(purposes) < max(len(real_purposes), count // 200):
+        first, second = rng.sample(purpose_words, 2)
+        purpose = f"{rng.choice(EMOJIS)} {first} & {second}"
+        if purpose not in purposes:
+            purposes.append(purpose)
+
+    tools = []
+    for i in range(count):
+        words = rng.sample(name_words, rng.choice((1, 1, 2, 2, 3)))
+        name = ''.join(words) if rng.random() < 0.4 else ' '.join(words)
+        name += rng.choice(SUFFIXES)
+        slug = re.sub(r'[^a-z0-9]+', '', name.lower()) or 'tool'
+        tools.append({
+            'name': name,
+            # Skewed so a few categories are much larger than the rest
+            'purpose': purposes[min(int(rng.paretovariate(1.2)) - 1, len(purposes) - 1)] if rng.random() < 0.5
+            else rng.choice(purposes),
+            'link': f"https://{slug}{i}.com",
+        })
+    return tools
+
+
+if __name__ == '__main__':
+    json.dump(generate_tools(int(sys.argv[1]) if len(sys.argv) > 1 else 10000), sys.stdout, ensure_ascii=False, indent=2)
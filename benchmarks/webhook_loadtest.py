@@ -0,0 +1,107 @@
+"""Local load test for webhook mode; no Telegram connection needed.
+
+Starts the real Application and webhook server on localhost with a fake
+Bot API, POSTs synthetic Update JSON to the endpoint and reports p50/p99
+latency from POST to the bot's reply:
+
+    python benchmarks/webhook_loadtest.py --updates 2000 --clients 20 --concurrent-updates 8
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from flood_control import SendScheduler
+from fake_telegram import FakeTelegramRequest, make_update_json
+
+MESSAGES = ['/start', 'video editing tools', '3', '/search notion', '/stats', 'tools for marketing', '/help']
+SECRET = 'loadtest-secret'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args):
+    request = FakeTelegramRequest(latency=args.api_latency / 1000)
+    # The fake API has no flood limits, so neither does the send scheduler here
+    bot = AIToolsBotEnhanced(os.path.join(BENCH_DIR, '..', 'tools.json'), sender=SendScheduler(chat_rate=0, global_rate=0))
+    application = build_application(bot, token='123456:LOADTEST', request=request,
+                                    concurrent_updates=args.concurrent_updates, metrics_port=0)
+
+    # Each update gets its own chat id, so a reply identifies the update it answers
+    posted_at = {}
+    latencies = []
+    done = asyncio.Event()
+
+    def on_send(chat_id, text):
+        started = posted_at.pop(int(chat_id), None)
+        if started is not None:
+            latencies.append(time.monotonic() - started)
+            if len(latencies) == args.updates:
+                done.set()
+    request.on_send = on_send
+
+    await application.initialize()
+    await application.updater.start_webhook(listen='127.0.0.1', port=args.port, url_path='telegram',
+                                            secret_token=SECRET)
+    await application.start()
+
+    url = f'http://127.0.0.1:{args.port}/telegram'
+    update_ids = itertools.count(1)
+    async with httpx.AsyncClient() as client:
+        rejected = await client.post(url, json=make_update_json(0, 0, '/start'),
+                                     headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+        print(f"request with a wrong secret token -> HTTP {rejected.status_code}")
+
+        async def worker(count):
+            for _ in range(count):
+                update_id = next(update_ids)
+                payload = make_update_json(update_id, update_id, MESSAGES[update_id % len(MESSAGES)])
+                posted_at[update_id] = time.monotonic()
+                response = await client.post(url, json=payload, headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+                response.raise_for_status()
+
+        started = time.monotonic()
+        per_client = args.updates // args.clients
+        await asyncio.gather(*(worker(per_client) for _ in range(args.clients)))
+        args.updates = per_client * args.clients
+        if len(latencies) < args.updates:
+            await asyncio.wait_for(done.wait(), timeout=60)
+        elapsed = time.monotonic() - started
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+
+    print(f"{args.updates} updates from {args.clients} clients, concurrent_updates={args.concurrent_updates}, "
+          f"simulated API latency {args.api_latency} ms")
+    print(f"throughput {args.updates / elapsed:,.0f} updates/s")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms  "
+          f"mean {statistics.mean(latencies) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=20, help='parallel HTTP senders')
+    parser.add_argument('--concurrent-updates', type=int, default=8)
+    parser.add_argument('--api-latency', type=float, default=0.0, help='simulated Bot API latency in ms')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
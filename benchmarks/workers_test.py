@@ -0,0 +1,152 @@
+"""Multi-worker check: the same update stream through one process and through a receiver with N workers.
+
+Users send interleaved conversations (start, categories, searches, exit...).
+The script checks that every user gets exactly the replies, in the same
+order, that a single process gives, and that the workers share session state
+through SQLite. It also reports throughput for both runs.
+
+    python benchmarks/workers_test.py --workers 4 --users 200 --tools 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from functools import partial
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# Measure the handlers, not the flood limits; read by the workers too, as they inherit the environment
+os.environ.update(THROTTLE_RATE='0', THROTTLE_DUPLICATE_WINDOW='0', SEND_CHAT_RATE='0', SEND_GLOBAL_RATE='0', SEND_MAX_PENDING='1000',
+                  CATALOG_RELOAD_INTERVAL='0', METRICS_PORT='0', BROADCAST_DB_PATH='', LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+
+from telegram import Update
+
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from fake_telegram import FakeTelegramRequest, make_update_json
+from session_store import InMemorySessionStore
+from synthetic_catalog import generate_tools
+from workers import WorkerPool, build_receiver
+
+# No reply repeats within a conversation, so none is coalesced with an identical one still queued
+CONVERSATION = ['/help', '1', '2', 'tools for video', '/search chat', '/stats', '3', 'design software', 'exit', '4', '/start']
+
+
+class JournalTelegramRequest(FakeTelegramRequest):
+    """Appends each sent message to a per-process file, so a parent can collect what workers sent"""
+
+    def __init__(self, directory):
+        super().__init__()
+        self.path = os.path.join(directory, f'{os.getpid()}.jsonl')
+
+    def respond(self, method, params):
+        if method == 'sendMessage':
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps([time.monotonic(), params.get('chat_id'), params.get('text')]) + '\n')
+        return super().respond(method, params)
+
+
+def make_stream(users):
+    update_ids = iter(range(1, users * len(CONVERSATION) + 1))
+    return [make_update_json(next(update_ids), user_id, text) for text in CONVERSATION for user_id in range(1, users + 1)]
+
+
+async def feed(application, stream):
+    for data in stream:
+        await application.update_queue.put(Update.de_json(data, application.bot))
+
+
+def replies_by_chat(sent):
+    replies = {}
+    for _, chat_id, text in sorted(sent):
+        replies.setdefault(int(chat_id), []).append(text)
+    return replies
+
+
+async def run_single(json_path, stream):
+    bot = AIToolsBotEnhanced(json_path, user_states=InMemorySessionStore(), snapshot_path='')
+    request = FakeTelegramRequest()
+    application = build_application(bot, token='123456:WORKERS', request=request, metrics_port=0)
+    await application.initialize()
+    await application.start()
+    started = time.monotonic()
+    await feed(application, stream)
+    await application.stop()
+    await bot.sender.drain()
+    elapsed = time.monotonic() - started
+    await application.shutdown()
+    await application.post_shutdown(application)
+    return replies_by_chat(request.sent), elapsed
+
+
+async def run_workers(json_path, stream, workers, directory):
+    journal = os.path.join(directory, 'journal')
+    os.mkdir(journal)
+    db_path = os.path.join(directory, 'sessions.db')
+    pool = WorkerPool(workers, token='123456:WORKERS', json_file_path=json_path,
+                      snapshot_path=os.path.join(directory, 'tools.snapshot'), session_db_path=db_path,
+                      metrics_port=0, request_factory=partial(JournalTelegramRequest, journal))
+    pool.prepare_catalog()
+    application = build_receiver(pool, token='123456:WORKERS', request=FakeTelegramRequest())
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    # Wait for every worker to start so the timing covers handling, not process startup
+    if not await pool.wait_ready(timeout=60):
+        sys.exit("FAILED: workers did not start")
+    started = time.monotonic()
+    await feed(application, stream)
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+    elapsed = time.monotonic() - started
+
+    sent = []
+    for name in os.listdir(journal):
+        with open(os.path.join(journal, name), encoding='utf-8') as file:
+            sent.extend(json.loads(line) for line in file)
+    with sqlite3.connect(db_path) as db:
+        sessions = dict(db.execute('SELECT user_id, last_action FROM user_states'))
+    return replies_by_chat(sent), elapsed, sessions, pool.stats()
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'tools.json')
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(generate_tools(args.tools), file)
+        stream = make_stream(args.users)
+
+        single, single_elapsed = await run_single(json_path, stream)
+        print(f"1 process   {len(stream):>6} updates in {single_elapsed:6.2f}s  {len(stream) / single_elapsed:8,.0f} updates/s")
+        sharded, workers_elapsed, sessions, stats = await run_workers(json_path, stream, args.workers, directory)
+        print(f"{args.workers} workers   {len(stream):>6} updates in {workers_elapsed:6.2f}s  "
+              f"{len(stream) / workers_elapsed:8,.0f} updates/s  (per worker: {stats['dispatched']})")
+
+    failures = []
+    mismatched = [chat_id for chat_id in single if single[chat_id] != sharded.get(chat_id)]
+    if mismatched or set(sharded) != set(single):
+        failures.append(f"{len(mismatched)} users got different replies than from a single process")
+    if len(sessions) != args.users or any(action != 'start' for action in sessions.values()):
+        failures.append(f"expected {args.users} sessions ending in 'start' in the shared store, found {len(sessions)}")
+    if failures:
+        sys.exit('FAILED: ' + '; '.join(failures))
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--tools', type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
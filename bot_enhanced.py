@@ -1,10 +1,28 @@
+import asyncio
 import json
 import logging
-import os
 import re
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from config import BOT_TOKEN, JSON_FILE_PATH, LOG_LEVEL
+import time
+from functools import partial
+from telegram import Update, InlineQueryResultsButton
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes,
+    CallbackQueryHandler, InlineQueryHandler
+)
+from config import (
+    BOT_TOKEN, JSON_FILE_PATH, LOG_LEVEL, CATALOG_RELOAD_INTERVAL, CATALOG_SNAPSHOT_PATH, BOT_MODE, CONCURRENT_UPDATES,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET_TOKEN, SEARCH_TOP_K, METRICS_LISTEN,
+    METRICS_PORT, WORKERS, INLINE_CACHE_SIZE, INLINE_CACHE_TIME, INLINE_DEBOUNCE, ADMIN_USER_IDS, ANNOUNCE_NEW_TOOLS
+)
+from broadcast import create_broadcaster, format_announcement, format_progress
+from catalog import CatalogSnapshot, file_stamp, load_catalog, new_tools_by_purpose, update_catalog
+from flood_control import ALLOW, WARN, ErrorLogSampler, SendScheduler, UserThrottle
+from inline_mode import InlineResults, normalize_inline_query, parse_offset
+from metrics import MetricsRegistry, MetricsServer
+from pagination import PAGE_CALLBACK_PREFIX, ResultView, ResultViewCache, make_view_key, parse_page_callback
+from query_cache import QueryCache
+from session_store import create_session_store
 
 # Enable logging
 logging.basicConfig(
@@ -13,167 +31,501 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SOCIAL_LINKS = (
+    "📸 Instagram: [Follow @aiwithteja](https://www.instagram.com/aiwithteja?igsh=MWE2dW93dWVseDBrdg==)\n"
+    "🎥 YouTube: [Subscribe to TechWith Teja](https://youtube.com/@techwith_teja?si=QSRQw2-r9en8hd9j)\n\n"
+)
+
+EXIT_MESSAGE = (
+    "👋 **Thank you for using AI Tools Board!**\n\n"
+    "🔄 To start again, simply type 'start' or use /start\n\n"
+    "📱 **Don't forget to follow us:**\n"
+    + SOCIAL_LINKS +
+    "See you soon! 🚀"
+)
+
+CATEGORY_FOOTER = (
+    "💡 **Navigation:**\n"
+    "• Type 'start' to see all categories again\n"
+    "• Type 'exit' to exit the bot\n"
+    "• Use /help for more commands"
+)
+
+NATURAL_SEARCH_FOOTER = (
+    "💡 **Navigation:**\n"
+    "• Type 'start' to see all categories\n"
+    "• Try other queries like 'tools for design'\n"
+    "• Type 'exit' to exit the bot"
+)
+
+SLOW_DOWN_MESSAGE = "⏳ You're sending messages too quickly. Please wait a moment and try again."
+
+WARMING_UP_MESSAGE = "⏳ The bot is starting up and loading the AI tools catalog. Please try again in a few seconds."
+
+BROADCAST_USAGE = (
+    "📣 Broadcast commands (admins only):\n"
+    "/broadcast <message> - send a message to every user who has not exited\n"
+    "/broadcast status - show recent broadcasts\n"
+    "/broadcast cancel <number> - stop a broadcast\n"
+    "A message cannot start with the word status or cancel."
+)
+
+# Screens rendered while warming up, so the first users do not pay for them
+PRERENDERED_SCREENS = ('start', 'stats', 'invalid_selection', 'unknown_input')
+
+SEARCH_FOOTER = (
+    "💡 **Navigation:**\n"
+    "• Type 'start' to see all categories\n"
+    "• Type 'exit' to exit the bot"
+)
+
+# Patterns to detect natural language queries, tried in order and grouped by
+# the literal keyword each one requires so most messages skip the regexes entirely
+NATURAL_QUERY_PATTERNS = (
+    ('tool', (
+        re.compile(r'tools?\s+for\s+(.+)'),
+        re.compile(r'(.+)\s+tools?'),
+        re.compile(r'find\s+(.+)\s+tools?'),
+        re.compile(r'show\s+(.+)\s+tools?'),
+        re.compile(r'(.+)\s+ai\s+tools?'),
+        re.compile(r'ai\s+tools?\s+for\s+(.+)'),
+        re.compile(r'best\s+(.+)\s+tools?'),
+    )),
+    ('software', (re.compile(r'(.+)\s+software'),)),
+    ('application', (re.compile(r'(.+)\s+applications?'),)),
+    ('platform', (re.compile(r'(.+)\s+platforms?'),)),
+)
+NATURAL_QUERY_KEYWORDS = re.compile('|'.join(keyword for keyword, _ in NATURAL_QUERY_PATTERNS))
+STOP_WORDS_PATTERN = re.compile(r'\b(the|a|an|for|with|using|best|top|good)\b')
+MAX_NATURAL_QUERY_LENGTH = 200
+
 class AIToolsBotEnhanced:
-    def __init__(self, json_file_path=JSON_FILE_PATH):
+    def __init__(self, json_file_path=JSON_FILE_PATH, user_states=None, sender=None, throttle=None,
+                 snapshot_path=CATALOG_SNAPSHOT_PATH, snapshot_readonly=False, preload=True, broadcaster=None):
         self.json_file_path = json_file_path
-        self.tools_data = self.load_tools_data()
-        self.purposes = self.extract_purposes()
-        self.user_states = {}  # Track user states for better UX
+        self.snapshot_path = snapshot_path
+        self.snapshot_readonly = snapshot_readonly  # Workers share a snapshot that only the receiver writes
+        self.catalog_mtime = self.get_catalog_mtime()
+        # Set once the catalog is loaded; without preload, warm_up() loads it in the background
+        self.ready = asyncio.Event()
+        if preload:
+            self.catalog = self.load_catalog()
+            self.ready.set()
+        else:
+            self.catalog = CatalogSnapshot((), version=0)
+        self.query_cache = QueryCache()  # Detected search terms and result ids for repeat queries
+        self.result_views = ResultViewCache()  # Paginated result lists, reused when paging
+        self.inline_cache = QueryCache(INLINE_CACHE_SIZE)  # Inline answers per normalized query, shared by all users
+        self.inline_pending = {}  # user id -> id of their latest inline query still waiting out the debounce
+        self.inline_debounce = INLINE_DEBOUNCE
+        self.user_states = user_states if user_states is not None else create_session_store()  # Track user states for better UX
+        self.sender = sender if sender is not None else SendScheduler()  # Rate-limited outgoing messages
+        self.throttle = throttle if throttle is not None else UserThrottle()  # Flood control on incoming messages
+        self.error_log = ErrorLogSampler()  # Which handler errors get logged
+        # Persistent broadcast jobs; None when broadcasts are disabled
+        self.broadcaster = broadcaster if broadcaster is not None else create_broadcaster(self.sender, self.user_states)
+        self.metrics = MetricsRegistry()
+        self.register_metrics()
+        self.application = None  # Set by build_application; failed sends are passed to its error handlers
+    
+    def register_metrics(self):
+        """Create the bot's metrics; gauges and cache counters are read from the live objects when scraped"""
+        metrics = self.metrics
+        self.handler_seconds = metrics.histogram('bot_handler_seconds', 'Time spent in each update handler', ('handler',))
+        self.handler_errors = metrics.counter('bot_handler_errors_total', 'Handler calls that raised', ('handler',))
+        self.phase_seconds = metrics.histogram(
+            'bot_phase_seconds', 'Time spent in search, query detection regexes and Bot API sends', ('phase',)
+        )
+        
+        caches = {
+            'query': lambda: self.query_cache.stats(),
+            'inline': lambda: self.inline_cache.stats(),
+            'session': lambda: self.user_states.stats(),
+        }
+        metrics.callback('bot_cache_hits_total', 'Cache lookups that hit',
+                         lambda: {(name,): stats()['hits'] for name, stats in caches.items()}, ('cache',), 'counter')
+        metrics.callback('bot_cache_misses_total', 'Cache lookups that missed',
+                         lambda: {(name,): stats()['misses'] for name, stats in caches.items()}, ('cache',), 'counter')
+        metrics.callback('bot_cache_hit_ratio', 'Fraction of cache lookups that hit since startup',
+                         lambda: {(name,): stats()['hit_rate'] for name, stats in caches.items()}, ('cache',))
+        metrics.callback('bot_user_states', 'User sessions held in memory', lambda: len(self.user_states))
+        metrics.callback('bot_result_views', 'Paginated result lists cached for paging', lambda: len(self.result_views))
+        metrics.callback('bot_ready', 'Whether the catalog is loaded and updates are handled', lambda: int(self.ready.is_set()))
+        metrics.callback('bot_catalog_tools', 'Tools in the current catalog', lambda: len(self.catalog.tools))
+        metrics.callback('bot_catalog_version', 'Catalog reloads since startup, plus one', lambda: self.catalog.version)
+        metrics.callback('bot_send_queue', 'Replies waiting for the send scheduler', lambda: self.sender.stats()['queued'])
+        outcomes = ('sent', 'coalesced', 'dropped', 'retries', 'failures')
+        metrics.callback('bot_outgoing_messages_total', 'Outgoing messages by outcome', lambda: {
+            (outcome,): count for outcome, count in self.sender.stats().items() if outcome in outcomes
+        }, ('outcome',), 'counter')
+        verdicts = ('allowed', 'merged', 'dropped')
+        metrics.callback('bot_incoming_messages_total', 'Incoming messages by throttle verdict', lambda: {
+            (verdict,): count for verdict, count in self.throttle.stats().items() if verdict in verdicts
+        }, ('verdict',), 'counter')
+        if self.broadcaster is not None:
+            metrics.callback('bot_broadcast_messages_total', 'Broadcast recipients by delivery outcome', lambda: {
+                (outcome,): count for outcome, count in self.broadcaster.stats().items()
+            }, ('outcome',), 'counter')
+        metrics.callback('bot_error_logs_total', 'Handler errors by whether they were logged or only counted', lambda: {
+            (outcome,): count for outcome, count in self.error_log.stats().items()
+        }, ('outcome',), 'counter')
+    
+    def instrument(self, name, callback):
+        """Wrap a handler callback to record its latency and errors under `name`"""
+        latency = self.handler_seconds
+        errors = self.handler_errors
+        
+        async def instrumented(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except ApplicationHandlerStop:
+                raise
+            except Exception:
+                errors.inc(name)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started, name)
+        return instrumented
     
-    def load_tools_data(self):
-        """Load tools data from JSON file"""
+    def load_catalog(self):
+        """Load the tools catalog, from its binary snapshot when that is up to date"""
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
+            return load_catalog(self.json_file_path, self.snapshot_path, readonly=self.snapshot_readonly)
         except FileNotFoundError:
             logger.error(f"JSON file {self.json_file_path} not found")
-            return []
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON in {self.json_file_path}")
-            return []
+        except (json.JSONDecodeError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid catalog in {self.json_file_path}: {e}")
+        return CatalogSnapshot(())
+    
+    def prepare_catalog(self):
+        """Load the catalog and render its screens; run off the event loop"""
+        catalog = self.load_catalog()
+        for screen in PRERENDERED_SCREENS:
+            self.get_screen(screen, catalog)
+        return catalog
+    
+    async def warm_up(self):
+        """Load the catalog in a thread while updates already arrive, then start handling them"""
+        started = time.perf_counter()
+        try:
+            self.catalog = await asyncio.to_thread(self.prepare_catalog)
+        except Exception as e:
+            # Serve an empty catalog rather than warm up forever; the watcher retries on its next poll
+            logger.error(f"Failed to load {self.json_file_path}, starting with an empty catalog: {e}", exc_info=e)
+            self.catalog = CatalogSnapshot(())
+            self.catalog_mtime = None
+        self.ready.set()
+        logger.info(f"Ready in {time.perf_counter() - started:.2f}s: {len(self.catalog.tools)} tools, "
+                    f"{len(self.catalog.purposes)} categories")
+    
+    @property
+    def tools_data(self):
+        return self.catalog.tools
     
-    def extract_purposes(self):
-        """Extract unique purposes from tools data"""
-        purposes = list(set(tool['purpose'] for tool in self.tools_data))
-        return sorted(purposes)
+    @property
+    def purposes(self):
+        return self.catalog.purposes
+    
+    @property
+    def search_index(self):
+        return self.catalog.search_index
     
     def get_tools_by_purpose(self, purpose):
         """Get all tools for a specific purpose"""
-        return [tool for tool in self.tools_data if tool['purpose'] == purpose]
+        return self.catalog.get_tools_by_purpose(purpose)
     
     def get_stats(self):
         """Get statistics about the tools"""
-        total_tools = len(self.tools_data)
-        total_categories = len(self.purposes)
-        
-        category_counts = {}
-        for tool in self.tools_data:
-            purpose = tool['purpose']
-            category_counts[purpose] = category_counts.get(purpose, 0) + 1
-        
-        return {
-            'total_tools': total_tools,
-            'total_categories': total_categories,
-            'category_counts': category_counts
-        }
+        return self.catalog.stats
+    
+    def get_catalog_mtime(self):
+        """Return a (mtime, size) stamp for the catalog file, or None if it is missing"""
+        return file_stamp(self.json_file_path)
+    
+    async def reload_catalog(self):
+        """Update the catalog off the event loop and swap it in; keep the old one on failure"""
+        current = self.catalog
+        try:
+            snapshot = await asyncio.to_thread(
+                update_catalog, current, self.json_file_path, self.snapshot_path, current.version + 1,
+                self.snapshot_readonly
+            )
+        except Exception as e:
+            logger.error(f"Keeping catalog v{current.version}: failed to reload {self.json_file_path}: {e}")
+            return False
+        
+        # A single attribute assignment is atomic; in-flight handlers keep the snapshot they started with
+        self.catalog = snapshot
+        logger.info(f"Catalog v{snapshot.version} loaded: {len(snapshot.tools)} tools, {len(snapshot.purposes)} categories")
+        try:
+            await self.announce_new_tools(current, snapshot)
+        except Exception as e:
+            # Hot reload must not depend on broadcasts: an error here would end watch_catalog
+            logger.error(f"Could not announce the tools added in catalog v{snapshot.version}: {e}")
+        return True
+    
+    async def announce_new_tools(self, old, new):
+        """Broadcast the tools a reload added, from the one process that delivers broadcasts"""
+        # Everything would look new after a failed first load
+        if not ANNOUNCE_NEW_TOOLS or self.broadcaster is None or not self.broadcaster.delivering or not old.tools:
+            return
+        new_tools = await asyncio.to_thread(new_tools_by_purpose, old, new)
+        if new_tools:
+            await self.broadcaster.enqueue('announcement', format_announcement(new_tools))
+    
+    async def watch_catalog(self, interval=CATALOG_RELOAD_INTERVAL):
+        """Poll the catalog file and hot-reload it whenever it changes"""
+        # A reload finishing before the first load would be overwritten by it
+        await self.ready.wait()
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self.get_catalog_mtime()
+            if mtime is None or mtime == self.catalog_mtime:
+                continue
+            # Record the stamp first so a failed parse is not retried until the file changes again
+            self.catalog_mtime = mtime
+            await self.reload_catalog()
+    
+    def get_screen(self, screen, catalog=None):
+        """Return the pre-rendered reply for a screen, rendering it once per catalog snapshot"""
+        catalog = catalog or self.catalog
+        message = catalog.render_cache.get(screen)
+        if message is None:
+            message = catalog.render_cache[screen] = getattr(self, f'render_{screen}_screen')(catalog)
+        return message
+    
+    def get_result_view(self, catalog, key_parts, header, footer, find_tools, show_category=True):
+        """Return the cached paginated view for a result list, running find_tools only on a miss"""
+        key = make_view_key(catalog.version, *key_parts)
+        view = self.result_views.get(key)
+        if view is None:
+            view = self.result_views.put(ResultView(key, header, find_tools(), footer, show_category))
+        return view
+    
+    def get_category_view(self, catalog, purpose):
+        """Return the paginated tool listing for one category"""
+        return self.get_result_view(
+            catalog, ('category', purpose), f"🔧 **Tools under {purpose}:**\n\n", CATEGORY_FOOTER,
+            lambda: catalog.get_tools_by_purpose(purpose), show_category=False
+        )
+    
+    async def reply(self, update: Update, text, **kwargs):
+        """Queue a reply to the update's chat; an identical reply still waiting there is sent only once"""
+        future = self.submit_reply(update, text, **kwargs)
+        if future is not None:
+            future.add_done_callback(partial(self.report_send_error, update))
+        return future
+    
+    def submit_reply(self, update: Update, text, **kwargs):
+        """Queue a reply without reporting it if it fails"""
+        message = update.effective_message
+        return self.sender.submit(message.chat_id, partial(self.timed_send, message.reply_text, text, **kwargs),
+                                  key=('reply', text))
+    
+    def report_send_error(self, update, future):
+        """Done callback of a queued send: pass its error to the error handlers, as a handler's own would be"""
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        self.handler_errors.inc('send')
+        if update is None or self.application is None:
+            logger.warning(f"Failed to send a message: {error!r}")
+            return
+        # Handlers return before their replies are sent, so the Application never sees these errors itself
+        self.application.create_task(self.application.process_error(update, error))
+    
+    async def timed_send(self, send, *args, **kwargs):
+        """Make one Bot API call, recording how long it took"""
+        with self.phase_seconds.time('send'):
+            return await send(*args, **kwargs)
+    
+    async def send_result_view(self, update: Update, view):
+        """Reply with the first page of a result view"""
+        text, keyboard = view.render_page(0)
+        await self.reply(update, text, parse_mode='Markdown', reply_markup=keyboard)
+    
+    def render_start_screen(self, catalog):
+        """Render the /start menu"""
+        stats = catalog.stats
+        parts = [
+            "🤖 **Welcome to the AI Tools Board!**\n\n",
+            "📊 **Statistics:**\n",
+            f"• {stats['total_tools']} AI tools available\n",
+            f"• {stats['total_categories']} categories\n\n",
+            "📱 **Follow us on social media:**\n",
+            SOCIAL_LINKS,
+            "🎯 **Choose a category by sending its number:**\n\n",
+        ]
+        
+        for i, purpose in enumerate(catalog.purposes, 1):
+            tool_count = stats['category_counts'].get(purpose, 0)
+            parts.append(f"{i}. {purpose} ({tool_count} tools)\n")
+        
+        parts.append(
+            "\n💡 **Tips & Guide for New Users:**\n"
+            "• Use /help for more commands\n"
+            "• Use /stats for detailed statistics\n"
+            "• Use /search <keyword> to find specific tools\n"
+            "• **NEW**: Type natural queries like:\n"
+            "  - 'tools for content creation'\n"
+            "  - 'video editing tools'\n"
+            "  - 'AI tools for marketing'\n"
+            "• Type 'exit' to exit the bot\n"
+            "• Type 'start' to return to this menu"
+        )
+        return ''.join(parts)
+    
+    def render_stats_screen(self, catalog):
+        """Render the /stats summary"""
+        stats = catalog.stats
+        parts = [
+            "📊 **AI Tools Board Statistics:**\n\n",
+            f"🔧 **Total Tools:** {stats['total_tools']}\n",
+            f"📁 **Total Categories:** {stats['total_categories']}\n\n",
+            "📈 **Tools per Category:**\n",
+        ]
+        
+        for purpose, count in sorted(stats['category_counts'].items()):
+            parts.append(f"• {purpose}: {count} tools\n")
+        
+        parts.append(
+            "\n💡 **Navigation:**\n"
+            "• Type 'start' to see all categories\n"
+            "• Type 'exit' to exit the bot"
+        )
+        return ''.join(parts)
+    
+    def render_invalid_selection_screen(self, catalog):
+        """Render the reply for an out-of-range category number"""
+        return (
+            f"❌ Invalid selection. Please enter a valid number from 1 to {len(catalog.purposes)}.\n\n"
+            f"💡 **Quick commands:**\n"
+            f"• Type 'start' to see the categories again\n"
+            f"• Type 'exit' to exit the bot\n"
+            f"• Try natural queries like 'tools for design'"
+        )
+    
+    def render_unknown_input_screen(self, catalog):
+        """Render the guidance reply for unrecognised text"""
+        return (
+            "❌ I didn't understand that. Here's what you can do:\n\n"
+            "🔢 **Category Selection:** Enter a number (1-" + str(len(catalog.purposes)) + ")\n"
+            "🗣️ **Natural Search:** Try queries like:\n"
+            "• 'tools for content creation'\n"
+            "• 'video editing tools'\n"
+            "• 'AI marketing tools'\n\n"
+            "💡 **Quick commands:**\n"
+            "• Type 'start' to see all categories\n"
+            "• Type 'exit' to exit the bot\n"
+            "• Use /help for more commands"
+        )
     
     def detect_natural_language_query(self, text):
         """Detect if the message is a natural language query for tools"""
-        # Patterns to detect natural language queries
-        patterns = [
-            r'tools?\s+for\s+(.+)',
-            r'(.+)\s+tools?',
-            r'find\s+(.+)\s+tools?',
-            r'show\s+(.+)\s+tools?',
-            r'(.+)\s+ai\s+tools?',
-            r'ai\s+tools?\s+for\s+(.+)',
-            r'best\s+(.+)\s+tools?',
-            r'(.+)\s+software',
-            r'(.+)\s+applications?',
-            r'(.+)\s+platforms?'
-        ]
+        # Long messages are never queries, and the patterns backtrack quadratically on them
+        if len(text) > MAX_NATURAL_QUERY_LENGTH:
+            return None
         
         text_lower = text.lower().strip()
         
-        for pattern in patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                # Extract the search term
-                search_term = match.group(1).strip()
-                # Clean up common words
-                search_term = re.sub(r'\b(the|a|an|for|with|using|best|top|good)\b', '', search_term).strip()
-                if search_term:
-                    return search_term
+        # None of the patterns can match without one of their keywords; such
+        # messages (category numbers, 'start', ...) bypass the cache entirely
+        if not NATURAL_QUERY_KEYWORDS.search(text_lower):
+            return None
+        
+        version = self.catalog.version
+        key = ('detect', text_lower)
+        search_term = self.query_cache.get(key, version)
+        if search_term is None:
+            # '' records "not a query" so repeats skip the regexes too
+            with self.phase_seconds.time('regex'):
+                search_term = self.match_natural_language_query(text_lower) or ''
+            search_term = self.query_cache.put(key, search_term, version)
+        return search_term or None
+    
+    def match_natural_language_query(self, text_lower):
+        """Run the query patterns over lowercased text and return the cleaned search term"""
+        for keyword, patterns in NATURAL_QUERY_PATTERNS:
+            # None of these patterns can match without their keyword
+            if keyword not in text_lower:
+                continue
+            for pattern in patterns:
+                match = pattern.search(text_lower)
+                if match:
+                    # Extract the search term
+                    search_term = match.group(1).strip()
+                    # Clean up common words
+                    search_term = STOP_WORDS_PATTERN.sub('', search_term).strip()
+                    if search_term:
+                        return search_term
         
         return None
     
-    def search_tools_by_query(self, query):
-        """Search for tools based on natural language query"""
+    def search_tools_by_query(self, query, catalog=None):
+        """Search for tools based on natural language query, best matches first"""
+        catalog = catalog or self.catalog
         query = query.lower()
-        matching_tools = []
-        
-        # Search in tool names, purposes, and links
-        for tool in self.tools_data:
-            if (query in tool['name'].lower() or 
-                query in tool['purpose'].lower() or 
-                query in tool['link'].lower()):
-                matching_tools.append(tool)
-        
-        # Also search for partial matches in purpose keywords
-        if not matching_tools:
-            for tool in self.tools_data:
-                purpose_words = tool['purpose'].lower().split()
-                query_words = query.split()
+        key = ('query', query)
+        tool_ids = self.query_cache.get(key, catalog.version)
+        
+        if tool_ids is None:
+            with self.phase_seconds.time('search'):
+                tool_ids = catalog.ranked_search.search(query, SEARCH_TOP_K)
                 
-                # Check if any query word matches any purpose word
-                for query_word in query_words:
-                    for purpose_word in purpose_words:
-                        if query_word in purpose_word or purpose_word in query_word:
-                            if tool not in matching_tools:
-                                matching_tools.append(tool)
-                            break
+                # Fall back to literal matching for what the ranking cannot tokenize, such as URLs or emoji
+                if not tool_ids:
+                    search_index = catalog.search_index
+                    tool_ids = search_index.substring_ids(query)
+                    
+                    # Also search for partial matches in purpose keywords
+                    if not tool_ids:
+                        tool_ids = search_index.purpose_word_ids(query)
+            
+            tool_ids = self.query_cache.put(key, tuple(tool_ids), catalog.version)
+        
+        return [catalog.tools_by_id[tool_id] for tool_id in tool_ids]
+    
+    def search_tools_by_keyword(self, query, catalog=None):
+        """Search tools for a keyword (the /search command), best matches first"""
+        catalog = catalog or self.catalog
+        query = query.lower()
+        key = ('keyword', query)
+        tool_ids = self.query_cache.get(key, catalog.version)
+        
+        if tool_ids is None:
+            with self.phase_seconds.time('search'):
+                tool_ids = catalog.ranked_search.search(query, SEARCH_TOP_K) or catalog.search_index.substring_ids(query)
+            tool_ids = self.query_cache.put(key, tuple(tool_ids), catalog.version)
         
-        return matching_tools
+        return [catalog.tools_by_id[tool_id] for tool_id in tool_ids]
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         user_id = update.effective_user.id
         
-        if not self.purposes:
-            await update.message.reply_text("No tools available at the moment. Please try again later.")
-            return
-        
-        stats = self.get_stats()
-        
-        message = f"🤖 **Welcome to the AI Tools Board!**\n\n"
-        message += f"📊 **Statistics:**\n"
-        message += f"• {stats['total_tools']} AI tools available\n"
-        message += f"• {stats['total_categories']} categories\n\n"
-        
-        # Add social media links
-        message += f"📱 **Follow us on social media:**\n"
-        message += f"📸 Instagram: [Follow @aiwithteja](https://www.instagram.com/aiwithteja?igsh=MWE2dW93dWVseDBrdg==)\n"
-        message += f"🎥 YouTube: [Subscribe to TechWith Teja](https://youtube.com/@techwith_teja?si=QSRQw2-r9en8hd9j)\n\n"
+        catalog = self.catalog
         
-        message += "🎯 **Choose a category by sending its number:**\n\n"
-        
-        for i, purpose in enumerate(self.purposes, 1):
-            tool_count = stats['category_counts'].get(purpose, 0)
-            message += f"{i}. {purpose} ({tool_count} tools)\n"
-        
-        message += "\n💡 **Tips & Guide for New Users:**\n"
-        message += "• Use /help for more commands\n"
-        message += "• Use /stats for detailed statistics\n"
-        message += "• Use /search <keyword> to find specific tools\n"
-        message += "• **NEW**: Type natural queries like:\n"
-        message += "  - 'tools for content creation'\n"
-        message += "  - 'video editing tools'\n"
-        message += "  - 'AI tools for marketing'\n"
-        message += "• Type 'exit' to exit the bot\n"
-        message += "• Type 'start' to return to this menu"
+        if not catalog.purposes:
+            await self.reply(update, "No tools available at the moment. Please try again later.")
+            return
         
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await self.reply(update, self.get_screen('start', catalog), parse_mode='Markdown')
         
         # Store user state
-        self.user_states[user_id] = {'last_action': 'start', 'active': True}
+        self.user_states.set(user_id, 'start')
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle user messages (category selection, exit, start, natural language queries)"""
         user_input = update.message.text.strip()
         user_input_lower = user_input.lower()
         user_id = update.effective_user.id
+        catalog = self.catalog
         
         # Handle exit command
         if user_input_lower == 'exit':
-            self.user_states[user_id] = {'last_action': 'exit', 'active': False}
-            exit_message = "👋 **Thank you for using AI Tools Board!**\n\n"
-            exit_message += "🔄 To start again, simply type 'start' or use /start\n\n"
-            exit_message += "📱 **Don't forget to follow us:**\n"
-            exit_message += "📸 Instagram: [Follow @aiwithteja](https://www.instagram.com/aiwithteja?igsh=MWE2dW93dWVseDBrdg==)\n"
-            exit_message += "🎥 YouTube: [Subscribe to TechWith Teja](https://youtube.com/@techwith_teja?si=QSRQw2-r9en8hd9j)\n\n"
-            exit_message += "See you soon! 🚀"
-            
-            await update.message.reply_text(exit_message, parse_mode='Markdown')
+            self.user_states.set(user_id, 'exit', active=False)
+            await self.reply(update, EXIT_MESSAGE, parse_mode='Markdown')
             return
         
         # Handle start command (text input)
@@ -182,9 +534,9 @@ class AIToolsBotEnhanced:
             return
         
         # Check if user is active (not exited)
-        user_state = self.user_states.get(user_id, {'active': True})
-        if not user_state.get('active', True):
-            await update.message.reply_text(
+        if not self.user_states.is_active(user_id):
+            await self.reply(
+                update,
                 "🔄 Welcome back! Type 'start' or use /start to begin using the AI Tools Board."
             )
             return
@@ -200,86 +552,42 @@ class AIToolsBotEnhanced:
             selection = int(user_input)
             
             # Validate selection range
-            if 1 <= selection <= len(self.purposes):
-                selected_purpose = self.purposes[selection - 1]
-                tools = self.get_tools_by_purpose(selected_purpose)
+            if 1 <= selection <= len(catalog.purposes):
+                selected_purpose = catalog.purposes[selection - 1]
+                tools = catalog.get_tools_by_purpose(selected_purpose)
                 
                 if tools:
-                    message = f"🔧 **Tools under {selected_purpose}:**\n\n"
-                    
-                    for i, tool in enumerate(tools, 1):
-                        message += f"**{i}. {tool['name']}**\n"
-                        message += f"🔗 {tool['link']}\n\n"
-                    
-                    message += f"📊 **{len(tools)} tools found**\n\n"
-                    message += "💡 **Navigation:**\n"
-                    message += "• Type 'start' to see all categories again\n"
-                    message += "• Type 'exit' to exit the bot\n"
-                    message += "• Use /help for more commands"
-                    
-                    await update.message.reply_text(message, parse_mode='Markdown')
+                    await self.send_result_view(update, self.get_category_view(catalog, selected_purpose))
                     
                     # Update user state
-                    self.user_states[user_id] = {
-                        'last_action': 'category_selected',
-                        'selected_purpose': selected_purpose,
-                        'active': True
-                    }
+                    self.user_states.set(user_id, 'category_selected', detail=selected_purpose)
                 else:
-                    await update.message.reply_text(f"No tools found under {selected_purpose}.")
+                    await self.reply(update, f"No tools found under {selected_purpose}.")
             else:
-                await update.message.reply_text(
-                    f"❌ Invalid selection. Please enter a valid number from 1 to {len(self.purposes)}.\n\n"
-                    f"💡 **Quick commands:**\n"
-                    f"• Type 'start' to see the categories again\n"
-                    f"• Type 'exit' to exit the bot\n"
-                    f"• Try natural queries like 'tools for design'"
-                )
+                await self.reply(update, self.get_screen('invalid_selection', catalog))
                 
         except ValueError:
             # If not a number and not a natural language query, provide guidance
-            await update.message.reply_text(
-                "❌ I didn't understand that. Here's what you can do:\n\n"
-                "🔢 **Category Selection:** Enter a number (1-" + str(len(self.purposes)) + ")\n"
-                "🗣️ **Natural Search:** Try queries like:\n"
-                "• 'tools for content creation'\n"
-                "• 'video editing tools'\n"
-                "• 'AI marketing tools'\n\n"
-                "💡 **Quick commands:**\n"
-                "• Type 'start' to see all categories\n"
-                "• Type 'exit' to exit the bot\n"
-                "• Use /help for more commands"
-            )
+            await self.reply(update, self.get_screen('unknown_input', catalog))
     
     async def handle_natural_language_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE, search_query: str, original_query: str):
         """Handle natural language search queries"""
-        matching_tools = self.search_tools_by_query(search_query)
+        catalog = self.catalog
+        view = self.get_result_view(
+            catalog, ('natural', original_query),
+            f"🔍 **Search results for '{original_query}':**\n\n", NATURAL_SEARCH_FOOTER,
+            lambda: self.search_tools_by_query(search_query, catalog)
+        )
         
-        if matching_tools:
-            message = f"🔍 **Search results for '{original_query}':**\n\n"
-            
-            for i, tool in enumerate(matching_tools, 1):
-                message += f"**{i}. {tool['name']}**\n"
-                message += f"📁 Category: {tool['purpose']}\n"
-                message += f"🔗 {tool['link']}\n\n"
-            
-            message += f"📊 **{len(matching_tools)} tools found**\n\n"
-            message += "💡 **Navigation:**\n"
-            message += "• Type 'start' to see all categories\n"
-            message += "• Try other queries like 'tools for design'\n"
-            message += "• Type 'exit' to exit the bot"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
+        if view.tools:
+            await self.send_result_view(update, view)
             
             # Update user state
             user_id = update.effective_user.id
-            self.user_states[user_id] = {
-                'last_action': 'natural_search',
-                'search_query': search_query,
-                'active': True
-            }
+            self.user_states.set(user_id, 'natural_search', detail=search_query)
         else:
-            await update.message.reply_text(
+            await self.reply(
+                update,
                 f"❌ No tools found matching '{original_query}'.\n\n"
                 f"💡 **Try again with:**\n"
                 f"• Different keywords (e.g., 'design', 'video', 'writing')\n"
@@ -295,30 +603,17 @@ class AIToolsBotEnhanced:
     async def search_tools(self, update: Update, context: ContextTypes.DEFAULT_TYPE, query: str):
         """Search for tools based on query (legacy method for /search command)"""
         query = query.lower()
-        matching_tools = []
+        catalog = self.catalog
+        view = self.get_result_view(
+            catalog, ('search', query), f"🔍 **Search results for '{query}':**\n\n", SEARCH_FOOTER,
+            lambda: self.search_tools_by_keyword(query, catalog)
+        )
         
-        for tool in self.tools_data:
-            if (query in tool['name'].lower() or 
-                query in tool['purpose'].lower() or 
-                query in tool['link'].lower()):
-                matching_tools.append(tool)
-        
-        if matching_tools:
-            message = f"🔍 **Search results for '{query}':**\n\n"
-            
-            for i, tool in enumerate(matching_tools, 1):
-                message += f"**{i}. {tool['name']}**\n"
-                message += f"📁 Category: {tool['purpose']}\n"
-                message += f"🔗 {tool['link']}\n\n"
-            
-            message += f"📊 **{len(matching_tools)} tools found**\n\n"
-            message += "💡 **Navigation:**\n"
-            message += "• Type 'start' to see all categories\n"
-            message += "• Type 'exit' to exit the bot"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
+        if view.tools:
+            await self.send_result_view(update, view)
         else:
-            await update.message.reply_text(
+            await self.reply(
+                update,
                 f"❌ No tools found matching '{query}'.\n\n"
                 f"💡 **Try again:**\n"
                 f"• Use different keywords\n"
@@ -332,7 +627,8 @@ class AIToolsBotEnhanced:
             query = ' '.join(context.args)
             await self.search_tools(update, context, query)
         else:
-            await update.message.reply_text(
+            await self.reply(
+                update,
                 "🔍 **How to search:**\n\n"
                 "**Method 1 - Command:**\n"
                 "Use: `/search <keyword>`\n\n"
@@ -351,23 +647,38 @@ class AIToolsBotEnhanced:
                 parse_mode='Markdown'
             )
     
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /broadcast (admins only): queue a message to all users, or show or cancel broadcasts"""
+        if update.effective_user.id not in ADMIN_USER_IDS:
+            await self.reply(update, "⛔ Only admins can send broadcasts.")
+            return
+        if self.broadcaster is None:
+            await self.reply(update, "📣 Broadcasts are disabled: set BROADCAST_DB_PATH to enable them.")
+            return
+        
+        args = context.args
+        command = args[0].lower() if args else None
+        # A message starting with a sub-command is never sent, so a mistyped one cannot reach every user
+        if (command is None or (command == 'status' and len(args) != 1)
+                or (command == 'cancel' and (len(args) != 2 or not args[1].isdigit()))):
+            await self.reply(update, BROADCAST_USAGE)
+        elif command == 'status':
+            jobs = await asyncio.to_thread(self.broadcaster.queue.recent_jobs)
+            await self.reply(update, '\n'.join(map(format_progress, jobs)) if jobs else "📣 No broadcasts yet.")
+        elif command == 'cancel':
+            if await self.broadcaster.cancel(int(args[1])):
+                await self.reply(update, f"📣 Broadcast #{args[1]} cancelled.")
+            else:
+                await self.reply(update, f"📣 No unfinished broadcast #{args[1]}.")
+        else:
+            # The text as typed, keeping its line breaks, which context.args loses
+            text = update.message.text.split(maxsplit=1)[1]
+            job_id, recipients = await self.broadcaster.enqueue('broadcast', text, requested_by=update.effective_chat.id)
+            await self.reply(update, f"📣 Broadcast #{job_id} queued for {recipients} users. Progress will show up here.")
+    
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /stats command"""
-        stats = self.get_stats()
-        
-        message = f"📊 **AI Tools Board Statistics:**\n\n"
-        message += f"🔧 **Total Tools:** {stats['total_tools']}\n"
-        message += f"📁 **Total Categories:** {stats['total_categories']}\n\n"
-        message += f"📈 **Tools per Category:**\n"
-        
-        for purpose, count in sorted(stats['category_counts'].items()):
-            message += f"• {purpose}: {count} tools\n"
-        
-        message += "\n💡 **Navigation:**\n"
-        message += "• Type 'start' to see all categories\n"
-        message += "• Type 'exit' to exit the bot"
-        
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await self.reply(update, self.get_screen('stats'), parse_mode='Markdown')
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
@@ -380,6 +691,9 @@ class AIToolsBotEnhanced:
 • `/stats` - Show detailed statistics
 • `/search <keyword>` - Search for specific tools
 
+**Inline Mode:**
+Type the bot's username and a query in any chat, e.g. `@bot video editing`, to share a tool there
+
 **Text Commands:**
 • `start` - Return to main menu
 • `exit` - Exit the bot gracefully
@@ -420,20 +734,205 @@ Just type what you're looking for:
 
 Need help? Just send a message!
         """
-        await update.message.reply_text(help_text, parse_mode='Markdown')
+        await self.reply(update, help_text, parse_mode='Markdown')
+    
+    async def handle_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle the Prev/Next buttons under a paginated result list"""
+        query = update.callback_query
+        parsed = parse_page_callback(query.data)
+        view = self.result_views.get(parsed[0]) if parsed else None
+        if view is None:
+            await query.answer("⌛ These results have expired. Please search again.", show_alert=True)
+            return
+        
+        text, keyboard = view.render_page(parsed[1])
+        await query.answer()
+        
+        async def edit():
+            try:
+                return await self.timed_send(query.edit_message_text, text, parse_mode='Markdown', reply_markup=keyboard)
+            except BadRequest as e:
+                # A double tap asks for the page that is already shown
+                if 'not modified' not in str(e).lower():
+                    raise
+        
+        message = query.message
+        future = self.sender.submit(message.chat_id, edit, key=('edit', message.message_id, text))
+        if future is not None:
+            future.add_done_callback(partial(self.report_send_error, update))
+    
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer an inline query (@bot <query>) with a page of matching tools as articles"""
+        inline_query = update.inline_query
+        user_id = inline_query.from_user.id
+        query = normalize_inline_query(inline_query.query)
+        # Any earlier query of this user still waiting is now outdated
+        self.inline_pending.pop(user_id, None)
+        
+        if not query:
+            await self.answer_inline_query(inline_query, (), '', button=InlineQueryResultsButton(
+                f"🔍 Type to search {len(self.catalog.tools)} AI tools", start_parameter='inline'
+            ))
+            return
+        
+        results = self.inline_cache.get(query, self.catalog.version)
+        offset = parse_offset(inline_query.offset)
+        if results is None and offset == 0 and self.inline_debounce > 0:
+            # Queries arrive on every keystroke: search only once the user pauses typing
+            self.inline_pending[user_id] = inline_query.id
+            await asyncio.sleep(self.inline_debounce)
+            if self.inline_pending.get(user_id) != inline_query.id:
+                return
+            del self.inline_pending[user_id]
+            # Another user may have searched the same text meanwhile
+            results = self.inline_cache.get(query, self.catalog.version)
+        
+        if results is None:
+            catalog = self.catalog
+            tools = self.search_tools_by_query(query, catalog)[:SEARCH_TOP_K]
+            results = self.inline_cache.put(query, InlineResults(tools), catalog.version)
+        
+        articles, next_offset = results.page(offset)
+        button = None
+        if not articles and offset == 0:
+            button = InlineQueryResultsButton("❌ No tools found. Browse categories", start_parameter='inline')
+        await self.answer_inline_query(inline_query, articles, next_offset, button=button)
+    
+    async def answer_inline_query(self, inline_query, articles, next_offset, button=None, cache_time=INLINE_CACHE_TIME):
+        """Send an inline answer right away: it is not a chat message, and a late one is useless"""
+        try:
+            # Results do not depend on who asks, so Telegram may reuse them for every user
+            await self.timed_send(inline_query.answer, articles, cache_time=cache_time, is_personal=False,
+                                  next_offset=next_offset, button=button)
+        except BadRequest as e:
+            # The user typed on and the client dropped this query
+            if 'query is too old' not in str(e).lower() and 'query_id_invalid' not in str(e).lower():
+                raise
+            logger.debug(f"Inline query {inline_query.id} expired before it was answered")
+    
+    async def warming_up(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Until the catalog is loaded, answer every update with a short notice instead of handling it"""
+        if self.ready.is_set():
+            return
+        if update.inline_query is not None:
+            # Not cached by Telegram: the real results are seconds away
+            await self.answer_inline_query(update.inline_query, (), '', cache_time=0, button=InlineQueryResultsButton(
+                "⏳ Starting up, please try again in a few seconds", start_parameter='inline'
+            ))
+        elif update.callback_query is not None:
+            await update.callback_query.answer(WARMING_UP_MESSAGE)
+        elif update.effective_message is not None:
+            await self.reply(update, WARMING_UP_MESSAGE)
+        raise ApplicationHandlerStop
+    
+    async def throttle_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop repeated or too frequent messages before any other handler sees them"""
+        message = update.message
+        if message is None or message.text is None or update.effective_user is None:
+            return
+        verdict = self.throttle.check(update.effective_user.id, message.text)
+        if verdict == ALLOW:
+            return
+        if verdict == WARN:
+            await self.reply(update, SLOW_DOWN_MESSAGE)
+        raise ApplicationHandlerStop
     
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE):
-        """Log errors caused by updates"""
-        logger.warning(f'Update {update} caused error {context.error}')
+        """Log errors caused by updates, sampled per error type"""
+        error = context.error
+        skipped = self.error_log.sample(type(error).__name__)
+        if skipped is not None:
+            # Only the update id is formatted, and only for the errors that are logged
+            logger.warning("Update %s caused error %r%s", getattr(update, 'update_id', None), error,
+                           f" ({skipped} more since the last one logged)" if skipped else '', exc_info=error)
+        
+        # Replying to a flood-control error would only add to the flood
+        if isinstance(context.error, RetryAfter):
+            return
         
         # Send error message to user if possible
         if update and hasattr(update, 'message') and update.message:
-            await update.message.reply_text(
+            # Plain text, and not reported again if it fails too: that would only lead back here
+            future = self.submit_reply(
+                update,
                 "❌ An error occurred while processing your request. Please try again later.\n\n"
                 "💡 **Quick commands:**\n"
                 "• Type 'start' to return to main menu\n"
                 "• Type 'exit' to exit the bot"
             )
+            if future is not None:
+                future.add_done_callback(partial(self.report_send_error, None))
+
+def build_application(bot, token=BOT_TOKEN, request=None, concurrent_updates=CONCURRENT_UPDATES,
+                      metrics_port=METRICS_PORT, deliver_broadcasts=True):
+    """Create the Application with all of the bot's handlers registered.
+
+    With deliver_broadcasts, this process also sends queued broadcasts; any
+    process can queue them, but only one may deliver.
+    """
+    background_tasks = []
+    metrics_server = MetricsServer(bot.metrics, METRICS_LISTEN, metrics_port, bot.ready.is_set) if metrics_port else None
+    
+    async def post_init(application):
+        if not bot.ready.is_set():
+            # Polling or the webhook starts right after this returns, while the catalog loads
+            background_tasks.append(asyncio.create_task(bot.warm_up()))
+        if deliver_broadcasts and bot.broadcaster is not None:
+            # Resumes a broadcast that a crash or restart interrupted
+            background_tasks.append(asyncio.create_task(bot.broadcaster.run(application.bot)))
+        if CATALOG_RELOAD_INTERVAL > 0:
+            # Not application.create_task: Application.stop() waits for those, and this one never ends
+            background_tasks.append(asyncio.create_task(bot.watch_catalog(CATALOG_RELOAD_INTERVAL)))
+        if metrics_server is not None:
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                logger.error(f"Metrics endpoint disabled: cannot listen on {METRICS_LISTEN}:{metrics_port}: {e}")
+    
+    async def post_shutdown(application):
+        for task in background_tasks:
+            task.cancel()
+        background_tasks.clear()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        try:
+            await asyncio.wait_for(bot.sender.drain(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Discarding {bot.sender.stats()['queued']} unsent messages at shutdown")
+        bot.sender.close()
+        bot.user_states.close()
+        if bot.broadcaster is not None:
+            bot.broadcaster.queue.close()
+    
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(concurrent_updates)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    
+    # Add handlers; groups -2 and -1 run first and can stop an update from reaching the rest
+    application.add_handler(TypeHandler(Update, bot.throttle_update), group=-2)
+    application.add_handler(TypeHandler(Update, bot.warming_up), group=-1)
+    application.add_handler(CommandHandler("start", bot.instrument('start', bot.start_command)))
+    application.add_handler(CommandHandler("help", bot.instrument('help', bot.help_command)))
+    application.add_handler(CommandHandler("stats", bot.instrument('stats', bot.stats_command)))
+    application.add_handler(CommandHandler("search", bot.instrument('search', bot.search_command)))
+    application.add_handler(CommandHandler("broadcast", bot.instrument('broadcast', bot.broadcast_command)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.instrument('message', bot.handle_message)))
+    application.add_handler(CallbackQueryHandler(bot.instrument('page', bot.handle_page_callback),
+                                                 pattern=f'^{PAGE_CALLBACK_PREFIX}:'))
+    # Non-blocking, so a query waiting out its debounce does not hold up other updates
+    application.add_handler(InlineQueryHandler(bot.instrument('inline', bot.inline_query), block=False))
+    
+    # Add error handler
+    application.add_error_handler(bot.error_handler)
+    bot.application = application
+    return application
 
 def main():
     """Main function to run the bot"""
@@ -441,45 +940,51 @@ def main():
         print("❌ Please set your bot token in the .env file or config.py")
         return
     
-    # Create bot instance
-    bot = AIToolsBotEnhanced()
-    
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # Add handlers
-    application.add_handler(CommandHandler("start", bot.start_command))
-    application.add_handler(CommandHandler("help", bot.help_command))
-    application.add_handler(CommandHandler("stats", bot.stats_command))
-    application.add_handler(CommandHandler("search", bot.search_command))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
+    if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+        print("❌ Please set WEBHOOK_URL to the bot's public base URL to use webhook mode")
+        return
     
-    # Add error handler
-    application.add_error_handler(bot.error_handler)
+    if WORKERS > 1:
+        # Imported here: workers builds on this module
+        from workers import WorkerPool, build_receiver
+        
+        # This process only receives updates; the workers load the catalog and handle them
+        pool = WorkerPool(WORKERS)
+        tool_count, category_count = pool.prepare_catalog()
+        application = build_receiver(pool)
+    else:
+        # Create bot instance; the catalog loads in the background once the bot is running
+        bot = AIToolsBotEnhanced(preload=False)
+        
+        # Create application
+        application = build_application(bot)
     
     # Run the bot
     print("🤖 AI Tools Board Bot is starting...")
     print(f"📁 Using JSON file: {JSON_FILE_PATH}")
-    print(f"🔧 Total tools loaded: {len(bot.tools_data)}")
-    print(f"📊 Categories available: {len(bot.purposes)}")
-    print("✅ Bot is running... Press Ctrl+C to stop.")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
-
-import os
-import asyncio
-from telegram.ext import ApplicationBuilder, CommandHandler
-from telegram import Update
-from telegram.ext import ContextTypes
-
-BOT_TOKEN = os.getenv("BOT_TOKEN")  # or hardcode it, if testing
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("Hello! Bot is working!")
-
-async def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
-    app.add_handler(CommandHandler("start", start))
-    await app.run_polling()
+    if WORKERS > 1:
+        print(f"🔧 Total tools loaded: {tool_count}")
+        print(f"📊 Categories available: {category_count}")
+        print(f"👷 Handing updates to {WORKERS} worker processes")
+    else:
+        print("🔧 Loading tools in the background; users are asked to wait until it finishes")
+    
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_SECRET_TOKEN:
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set; webhook requests will not be verified")
+        print(f"🌐 Serving webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        print("✅ Bot is running... Press Ctrl+C to stop.")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN or None,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        print("✅ Bot is running... Press Ctrl+C to stop.")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from telegram.error import BadRequest, Forbidden
+
+from config import (
+    BROADCAST_DB_PATH, BROADCAST_BATCH_SIZE, BROADCAST_CONCURRENCY, BROADCAST_RATE, BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_POLL_INTERVAL
+)
+from flood_control import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+
+# Recipient states; all but PENDING are also delivery outcomes
+PENDING = 'pending'
+SENT = 'sent'
+SKIPPED = 'skipped'  # Exited the bot after the job was queued
+BLOCKED = 'blocked'  # Blocked the bot or deleted their account
+FAILED = 'failed'
+OUTCOMES = (SENT, SKIPPED, BLOCKED, FAILED)
+
+# An announcement lists at most this many categories, and this many tools in each
+MAX_ANNOUNCED_CATEGORIES = 5
+MAX_ANNOUNCED_TOOLS = 5
+
+
+def format_announcement(new_tools):
+    """Plain-text announcement for {category: [new tools]}; tool names could break Markdown"""
+    parts = ["🆕 New AI tools on the board!\n"]
+    for purpose, tools in list(new_tools.items())[:MAX_ANNOUNCED_CATEGORIES]:
+        parts.append(f"\n{purpose}\n")
+        parts.extend(f"• {tool.name}: {tool.link}\n" for tool in tools[:MAX_ANNOUNCED_TOOLS])
+        if len(tools) > MAX_ANNOUNCED_TOOLS:
+            parts.append(f"…and {len(tools) - MAX_ANNOUNCED_TOOLS} more\n")
+    if len(new_tools) > MAX_ANNOUNCED_CATEGORIES:
+        parts.append(f"\n…plus new tools in {len(new_tools) - MAX_ANNOUNCED_CATEGORIES} more categories\n")
+    parts.append("\nType 'start' to browse all categories.")
+    return ''.join(parts)
+
+
+def format_progress(job):
+    """One line on how far a job has got"""
+    handled = sum(job[outcome] for outcome in OUTCOMES)
+    return (f"📣 {job['kind'].capitalize()} #{job['id']} {job['status']}: {handled}/{job['total']} handled, "
+            f"{job[SENT]} sent, {job[SKIPPED]} skipped (exited), {job[BLOCKED]} blocked, {job[FAILED]} failed")
+
+
+class BroadcastQueue:
+    """Broadcast jobs and their recipients, persisted in SQLite so delivery resumes after a restart.
+
+    A job stores its recipients when it is queued. Each recipient stays
+    pending until the batch they were sent in is recorded, so a crash
+    repeats at most the batch that was in flight. The database opens on
+    first use, in WAL mode so several worker processes can queue jobs.
+
+    Storing a job's recipients grows with the number of users, so callers on
+    the event loop run these methods in a thread; one lock serializes them
+    on the shared connection.
+    """
+
+    def __init__(self, db_path=BROADCAST_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS broadcast_jobs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, text TEXT NOT NULL, status TEXT NOT NULL, '
+                'requested_by INTEGER, progress_message_id INTEGER, total INTEGER NOT NULL, '
+                'sent INTEGER NOT NULL DEFAULT 0, skipped INTEGER NOT NULL DEFAULT 0, '
+                'blocked INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, '
+                'created_at REAL NOT NULL, finished_at REAL)'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS broadcast_recipients ('
+                'job_id INTEGER NOT NULL, user_id INTEGER NOT NULL, status TEXT NOT NULL, '
+                'PRIMARY KEY (job_id, user_id)) WITHOUT ROWID'
+            )
+            # Finds the next batch without scanning the recipients already handled
+            self._db.execute('CREATE INDEX IF NOT EXISTS broadcast_recipients_status '
+                             'ON broadcast_recipients (job_id, status)')
+            self._db.commit()
+        return self._db
+
+    def create_job(self, kind, text, user_ids, requested_by=None):
+        """Queue a job sending text to user_ids; return its id"""
+        with self.lock, self.db:
+            job_id = self.db.execute(
+                'INSERT INTO broadcast_jobs (kind, text, status, requested_by, total, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', (kind, text, QUEUED, requested_by, len(user_ids), time.time())
+            ).lastrowid
+            self.db.executemany('INSERT OR IGNORE INTO broadcast_recipients VALUES (?, ?, ?)',
+                                ((job_id, user_id, PENDING) for user_id in user_ids))
+        return job_id
+
+    def get_job(self, job_id):
+        with self.lock:
+            row = self.db.execute('SELECT * FROM broadcast_jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def next_job(self):
+        """The oldest job not yet finished, including one a crash interrupted"""
+        with self.lock:
+            row = self.db.execute('SELECT * FROM broadcast_jobs WHERE status IN (?, ?) ORDER BY id LIMIT 1',
+                                  (QUEUED, RUNNING)).fetchone()
+        return dict(row) if row is not None else None
+
+    def recent_jobs(self, limit=5):
+        with self.lock:
+            rows = self.db.execute('SELECT * FROM broadcast_jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def pending_recipients(self, job_id, limit):
+        with self.lock:
+            return [row[0] for row in self.db.execute(
+                'SELECT user_id FROM broadcast_recipients WHERE job_id = ? AND status = ? LIMIT ?',
+                (job_id, PENDING, limit)
+            )]
+
+    def record(self, job_id, outcomes):
+        """Store {user_id: outcome} for a batch and add them to the job's counts, in one transaction"""
+        if not outcomes:
+            return
+        counts = {outcome: 0 for outcome in OUTCOMES}
+        for outcome in outcomes.values():
+            counts[outcome] += 1
+        with self.lock, self.db:
+            self.db.executemany('UPDATE broadcast_recipients SET status = ? WHERE job_id = ? AND user_id = ?',
+                                ((outcome, job_id, user_id) for user_id, outcome in outcomes.items()))
+            self.db.execute(
+                'UPDATE broadcast_jobs SET sent = sent + ?, skipped = skipped + ?, blocked = blocked + ?, '
+                'failed = failed + ? WHERE id = ?', (counts[SENT], counts[SKIPPED], counts[BLOCKED], counts[FAILED], job_id)
+            )
+
+    def set_status(self, job_id, status):
+        """Move a job to status; returns False if it had already finished"""
+        finished_at = time.time() if status in (DONE, CANCELLED) else None
+        with self.lock, self.db:
+            return self.db.execute(
+                'UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)',
+                (status, finished_at, job_id, QUEUED, RUNNING)
+            ).rowcount > 0
+
+    def set_progress_message(self, job_id, message_id):
+        with self.lock, self.db:
+            self.db.execute('UPDATE broadcast_jobs SET progress_message_id = ? WHERE id = ?', (message_id, job_id))
+
+    def close(self):
+        with self.lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class Broadcaster:
+    """Delivers queued broadcasts, one job at a time, in batches of recipients.
+
+    Within a batch at most `concurrency` messages are in flight, and sends
+    are shaped to `rate` per second by a token bucket of their own before
+    they join the bot's SendScheduler, which also applies the global limit
+    and retries 429s. Recipients who exited since the job was queued are
+    skipped, and those who blocked the bot are marked as exited so later
+    broadcasts leave them out.
+    """
+
+    def __init__(self, queue, sender, user_states, rate=BROADCAST_RATE, concurrency=BROADCAST_CONCURRENCY,
+                 batch_size=BROADCAST_BATCH_SIZE, progress_interval=BROADCAST_PROGRESS_INTERVAL,
+                 poll_interval=BROADCAST_POLL_INTERVAL):
+        self.queue = queue
+        self.sender = sender
+        self.user_states = user_states
+        self.bucket = TokenBucket(rate, concurrency)
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.poll_interval = poll_interval
+        self.delivering = False  # Whether this process runs the delivery loop
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+        self._reported = {}  # job id -> progress text last shown, as Telegram rejects an edit that changes nothing
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, kind, text, requested_by=None):
+        """Queue text for every user who has not exited; return (job id, number of recipients)"""
+        # Pending session writes are stored on the loop that owns them; reading the audience and
+        # storing a row per recipient take a thread, as they grow with the number of users
+        self.user_states.flush()
+        job_id, recipients = await asyncio.to_thread(self._create_job, kind, text, requested_by)
+        logger.info(f"{kind.capitalize()} #{job_id} queued for {recipients} users")
+        self._wakeup.set()
+        return job_id, recipients
+
+    def _create_job(self, kind, text, requested_by):
+        user_ids = self.user_states.active_user_ids()
+        return self.queue.create_job(kind, text, user_ids, requested_by), len(user_ids)
+
+    async def cancel(self, job_id):
+        """Stop a job before its next batch; returns False if it is unknown or already finished"""
+        return await asyncio.to_thread(self.queue.set_status, job_id, CANCELLED)
+
+    async def run(self, telegram_bot):
+        """Deliver jobs oldest first, starting with any a crash left unfinished, until cancelled"""
+        self.delivering = True
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    job = await asyncio.to_thread(self.queue.next_job)
+                    if job is not None:
+                        await self.deliver(telegram_bot, job)
+                        continue
+                except sqlite3.Error as e:
+                    logger.error(f"Broadcast delivery paused: {self.queue.db_path}: {e}")
+                # Jobs queued here wake the loop at once; those queued by other workers are polled for
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.delivering = False
+
+    async def deliver(self, telegram_bot, job):
+        job_id = job['id']
+        if job['status'] == QUEUED:
+            await asyncio.to_thread(self.queue.set_status, job_id, RUNNING)
+        else:
+            logger.info(f"Resuming {job['kind']} #{job_id}")
+        reported_at = time.monotonic()
+        while True:
+            if (await asyncio.to_thread(self.queue.get_job, job_id))['status'] == CANCELLED:
+                logger.info(f"{job['kind'].capitalize()} #{job_id} cancelled")
+                break
+            user_ids = await asyncio.to_thread(self.queue.pending_recipients, job_id, self.batch_size)
+            if not user_ids:
+                await asyncio.to_thread(self.queue.set_status, job_id, DONE)
+                break
+            outcomes = {}
+            try:
+                await self._send_batch(telegram_bot, job['text'], user_ids, outcomes)
+            except BaseException:
+                # Also when cancelled at shutdown, so the part of the batch already sent is not repeated;
+                # right away, as the task may not get to run again
+                self.queue.record(job_id, outcomes)
+                raise
+            await asyncio.to_thread(self.queue.record, job_id, outcomes)
+            if time.monotonic() - reported_at >= self.progress_interval:
+                reported_at = time.monotonic()
+                await self.report_progress(telegram_bot, job_id)
+        await self.report_progress(telegram_bot, job_id)
+
+    async def _send_batch(self, telegram_bot, text, user_ids, outcomes):
+        """Send text to a batch of users, filling outcomes as each send completes"""
+        exited = self.user_states.exited_user_ids(user_ids)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver_one(user_id):
+            async with semaphore:
+                delay = self.bucket.reserve(time.monotonic())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                future = self.sender.submit(user_id, partial(self._send, telegram_bot, user_id, text))
+                try:
+                    # None: the user's reply queue was full, or flood control kept refusing the message
+                    outcome = (await future if future is not None else None) or FAILED
+                except Exception as e:
+                    logger.warning(f"Failed to send a broadcast to user {user_id}: {e}")
+                    outcome = FAILED
+            if outcome == BLOCKED:
+                self.user_states.set(user_id, BLOCKED, active=False)
+            outcomes[user_id] = outcome
+            self.outcomes[outcome] += 1
+
+        for user_id in exited:
+            outcomes[user_id] = SKIPPED
+            self.outcomes[SKIPPED] += 1
+        await asyncio.gather(*(deliver_one(user_id) for user_id in user_ids if user_id not in exited))
+
+    async def _send(self, telegram_bot, user_id, text):
+        try:
+            await telegram_bot.send_message(user_id, text, disable_web_page_preview=True)
+        except Forbidden:
+            return BLOCKED
+        except BadRequest as e:
+            if 'chat not found' not in str(e).lower():
+                raise
+            return BLOCKED
+        return SENT
+
+    async def report_progress(self, telegram_bot, job_id):
+        """Log a job's progress and show it to whoever queued it, editing one message as it advances"""
+        job = await asyncio.to_thread(self.queue.get_job, job_id)
+        text = format_progress(job)
+        logger.info(text)
+        chat_id = job['requested_by']
+        if chat_id is None or self._reported.get(job_id) == text:
+            return
+        self._reported[job_id] = text
+        if job['status'] in (DONE, CANCELLED):
+            del self._reported[job_id]
+        message_id = job['progress_message_id']
+        if message_id is None:
+            future = self.sender.submit(chat_id, partial(telegram_bot.send_message, chat_id, text))
+            try:
+                message = await future if future is not None else None
+            except Exception as e:
+                logger.warning(f"Failed to show the progress of broadcast #{job_id}: {e}")
+                message = None
+            if message is not None:
+                await asyncio.to_thread(self.queue.set_progress_message, job_id, message.message_id)
+        else:
+            future = self.sender.submit(chat_id, partial(telegram_bot.edit_message_text, text, chat_id, message_id))
+            if future is not None:
+                future.add_done_callback(partial(log_failed_edit, job_id))
+
+    def stats(self):
+        """Counters for monitoring"""
+        return dict(self.outcomes)
+
+
+def log_failed_edit(job_id, future):
+    """Done callback of a progress edit nobody waits for"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"Failed to update the progress of broadcast #{job_id}: {future.exception()}")
+
+
+def create_broadcaster(sender, user_states, db_path=BROADCAST_DB_PATH):
+    """Build the Broadcaster for a bot, or None when BROADCAST_DB_PATH is empty"""
+    if not db_path:
+        return None
+    return Broadcaster(BroadcastQueue(db_path), sender, user_states)
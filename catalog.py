@@ -0,0 +1,329 @@
+import logging
+import marshal
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import chain
+
+from config import CATALOG_MAX_REJECT_FRACTION, CATALOG_REBUILD_FRACTION
+from ingest import IngestReport, read_tools, tool_key
+from ranking import RankedSearch
+from tool_index import ToolSearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the snapshot layout or anything it stores changes
+SNAPSHOT_FORMAT = 2
+
+
+def file_stamp(path):
+    """Return a (mtime, size) stamp for a file, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class Tool:
+    """One catalog entry; its id is its position in the catalog"""
+    __slots__ = ('id', 'name', 'purpose', 'link')
+
+    def __init__(self, tool_id, name, purpose, link):
+        self.id = tool_id
+        self.name = name
+        self.purpose = purpose
+        self.link = link
+
+    def __repr__(self):
+        return f"Tool({self.id}, {self.name!r}, {self.purpose!r}, {self.link!r})"
+
+
+def _tool_id(tool):
+    return tool.id
+
+
+def _without(tools, removed):
+    """tools as a tuple without the removed Tools; both are in id order and every removed one is listed.
+
+    The kept runs between removed tools are copied as slices instead of
+    testing every tool.
+    """
+    runs = []
+    start = 0
+    for tool in removed:
+        index = bisect_left(tools, tool.id, start, key=_tool_id)
+        runs.append(tools[start:index])
+        start = index + 1
+    runs.append(tools[start:])
+    return tuple(chain.from_iterable(runs))
+
+
+def build_tools(tools, first_id=0, purposes=None):
+    """Tool records for an iterable of tool dicts, sharing one string per distinct purpose"""
+    purposes = {} if purposes is None else purposes
+    records = []
+    for tool_id, tool in enumerate(tools, first_id):
+        purpose = tool['purpose']
+        records.append(Tool(tool_id, tool['name'], purposes.setdefault(purpose, purpose), tool['link']))
+    return tuple(records)
+
+
+class CatalogSnapshot:
+    """One immutable version of the tools catalog and everything derived from it.
+
+    A snapshot is never modified after construction (apart from its lazily
+    filled render cache), so a handler that holds a reference keeps a
+    consistent view even if a newer snapshot is swapped in mid-request.
+
+    Tool ids index tools_by_id. A snapshot derived with with_changes keeps
+    the ids of unchanged tools, so removed tools leave None in their place
+    and added ones get new ids at the end. tools and every category's tools
+    stay in id order.
+    """
+
+    def __init__(self, tools, version=1, index_state=None):
+        # tools are Tool records; index_state restores prebuilt indexes from a snapshot file
+        self.version = version
+        self.tools = self.tools_by_id = tuple(tools)
+        self.changes = 0  # Tools added or removed since the indexes were last built from scratch
+
+        tools_by_purpose = {}
+        for tool in self.tools:
+            tools_by_purpose.setdefault(tool.purpose, []).append(tool)
+        self._set_partition({purpose: tuple(group) for purpose, group in tools_by_purpose.items()})
+        index_state = index_state or {}
+        self.search_index = ToolSearchIndex(self.tools, index_state.get('search_index'))
+        self.ranked_search = RankedSearch(self.tools, index_state.get('ranked_search'))
+
+        # Pre-rendered replies keyed by screen; dies with the snapshot
+        self.render_cache = {}
+        self._tool_ids = None
+
+    @property
+    def tool_ids(self):
+        """tool_key -> id of every listed tool; built on first use, then patched by with_changes"""
+        if self._tool_ids is None:
+            self._tool_ids = {tool_key(tool.name, tool.purpose, tool.link): tool.id for tool in self.tools}
+        return self._tool_ids
+
+    def _set_partition(self, tools_by_purpose):
+        self.tools_by_purpose = tools_by_purpose
+        self.purposes = tuple(sorted(self.tools_by_purpose))
+        self.stats = {
+            'total_tools': len(self.tools),
+            'total_categories': len(self.tools_by_purpose),
+            'category_counts': {purpose: len(group) for purpose, group in self.tools_by_purpose.items()}
+        }
+
+    @classmethod
+    def from_file(cls, json_file_path, version=1):
+        """Build a snapshot from a JSON array or JSON Lines file, raising if it is missing, malformed or unusable"""
+        report = IngestReport(json_file_path)
+        # Records stream straight into Tool records; the parsed file is never held whole
+        tools = build_tools(read_tools(json_file_path, report))
+        report.log_summary()
+        report.check(CATALOG_MAX_REJECT_FRACTION)
+        return cls(tools, version)
+
+    def with_changes(self, removed_ids, added, version):
+        """A new snapshot without the tools in removed_ids and with the added tool dicts.
+
+        Only the index entries of those tools are recomputed. Unchanged
+        containers are shared with this snapshot, and the ones a change
+        touches are copied whole in C (slices, dict and array copies), so
+        the Python work follows the size of the change while a copy still
+        grows with the catalog. This snapshot is left as it was.
+        """
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.version = version
+        removed = [self.tools_by_id[tool_id] for tool_id in sorted(removed_ids)]
+        added = build_tools(added, len(self.tools_by_id), {purpose: purpose for purpose in self.tools_by_purpose})
+
+        tools_by_id = list(self.tools_by_id)
+        for tool in removed:
+            tools_by_id[tool.id] = None
+        tools_by_id.extend(added)
+        snapshot.tools_by_id = tuple(tools_by_id)
+        snapshot.tools = _without(self.tools, removed) + added
+        snapshot.changes = self.changes + len(removed) + len(added)
+
+        removed_by_purpose = {}
+        for tool in removed:
+            removed_by_purpose.setdefault(tool.purpose, []).append(tool)
+        added_by_purpose = {}
+        for tool in added:
+            added_by_purpose.setdefault(tool.purpose, []).append(tool)
+        tools_by_purpose = dict(self.tools_by_purpose)
+        for purpose in removed_by_purpose.keys() | added_by_purpose.keys():
+            group = tools_by_purpose.get(purpose, ())
+            if purpose in removed_by_purpose:
+                group = _without(group, removed_by_purpose[purpose])
+            group += tuple(added_by_purpose.get(purpose, ()))
+            if group:
+                tools_by_purpose[purpose] = group
+            else:
+                del tools_by_purpose[purpose]
+        snapshot._set_partition(tools_by_purpose)
+
+        snapshot._tool_ids = None
+        if self._tool_ids is not None:
+            # Carried forward so the next diff_catalog does not rebuild it from every tool
+            tool_ids = dict(self._tool_ids)
+            for tool in removed:
+                key = tool_key(tool.name, tool.purpose, tool.link)
+                # A catalog built from records that were never deduplicated maps a repeated key to its last id
+                if tool_ids.get(key) == tool.id:
+                    del tool_ids[key]
+            for tool in added:
+                tool_ids[tool_key(tool.name, tool.purpose, tool.link)] = tool.id
+            snapshot._tool_ids = tool_ids
+
+        snapshot.search_index = self.search_index.with_changes(snapshot.tools_by_id, removed, added)
+        snapshot.ranked_search = self.ranked_search.with_changes(len(snapshot.tools), removed, added)
+        snapshot.render_cache = {}
+        return snapshot
+
+    def get_tools_by_purpose(self, purpose):
+        """Get all tools for a specific purpose"""
+        return self.tools_by_purpose.get(purpose, ())
+
+
+def write_snapshot_file(snapshot, snapshot_path, source_stamp):
+    """Save the catalog columns and built indexes in marshal format, tagged with the source file stamp"""
+    if snapshot.changes:
+        raise ValueError("Only a catalog built from scratch can be saved: tool ids must be positions")
+    purposes = list(snapshot.tools_by_purpose)
+    purpose_ids = {purpose: purpose_id for purpose_id, purpose in enumerate(purposes)}
+    state = {
+        'format': SNAPSHOT_FORMAT,
+        # marshal data is only guaranteed to load on the Python version that wrote it
+        'python': tuple(sys.version_info[:2]),
+        'source': source_stamp,
+        'names': [tool.name for tool in snapshot.tools],
+        'links': [tool.link for tool in snapshot.tools],
+        'purposes': purposes,
+        'tool_purpose': array('I', (purpose_ids[tool.purpose] for tool in snapshot.tools)).tobytes(),
+        'search_index': snapshot.search_index.to_state(),
+        'ranked_search': snapshot.ranked_search.to_state(),
+    }
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, 'wb') as file:
+        marshal.dump(state, file)
+    # Readers never see a half-written snapshot
+    os.replace(temp_path, snapshot_path)
+
+
+def read_snapshot_file(snapshot_path, source_stamp, version=1):
+    """Load a snapshot saved by write_snapshot_file, or None if it is missing, stale or unreadable"""
+    try:
+        with open(snapshot_path, 'rb') as file:
+            state = marshal.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable catalog snapshot {snapshot_path}: {e}")
+        return None
+    if (not isinstance(state, dict) or state.get('format') != SNAPSHOT_FORMAT
+            or state.get('python') != tuple(sys.version_info[:2]) or state.get('source') != source_stamp):
+        return None
+
+    tool_purpose = array('I')
+    tool_purpose.frombytes(state['tool_purpose'])
+    purposes = state['purposes']
+    tools = tuple(
+        Tool(tool_id, name, purposes[purpose_id], link)
+        for tool_id, (name, link, purpose_id) in enumerate(zip(state['names'], state['links'], tool_purpose))
+    )
+    return CatalogSnapshot(tools, version, state)
+
+
+def load_catalog(json_file_path, snapshot_path='', version=1, readonly=False):
+    """Load the catalog, preferring a binary snapshot built from the current JSON file.
+
+    Without a usable snapshot the JSON file is parsed (raising if it is
+    missing or malformed) and, when snapshot_path is set and readonly is
+    false, a fresh snapshot is written for the next start.
+    """
+    stamp = file_stamp(json_file_path)
+    if snapshot_path and stamp is not None:
+        snapshot = read_snapshot_file(snapshot_path, stamp, version)
+        if snapshot is not None:
+            return snapshot
+
+    snapshot = CatalogSnapshot.from_file(json_file_path, version)
+    if snapshot_path and not readonly and stamp is not None and stamp == file_stamp(json_file_path):
+        try:
+            write_snapshot_file(snapshot, snapshot_path, stamp)
+        except OSError as e:
+            logger.warning(f"Could not write catalog snapshot {snapshot_path}: {e}")
+    return snapshot
+
+
+def diff_catalog(snapshot, tools, limit):
+    """Compare tool dicts against a snapshot; return (removed tool ids, added tool dicts).
+
+    Only the added tools are kept in memory. Returns None as soon as more
+    than `limit` tools would be added.
+    """
+    ids = snapshot.tool_ids
+    kept = bytearray(len(snapshot.tools_by_id))
+    added = []
+    for tool in tools:
+        tool_id = ids.get(tool_key(tool['name'], tool['purpose'], tool['link']))
+        if tool_id is not None:
+            current = snapshot.tools_by_id[tool_id]
+            # A change of case or a trailing slash is an edit: the old record goes, the new one comes
+            if (current.name, current.link) == (tool['name'], tool['link']):
+                kept[tool_id] = 1
+                continue
+        added.append(tool)
+        if len(added) > limit:
+            return None
+    removed = []
+    tool_id = kept.find(0)
+    while tool_id != -1:
+        # Ids already removed earlier are unmarked too; there are at most `limit` of them
+        if snapshot.tools_by_id[tool_id] is not None:
+            removed.append(tool_id)
+        tool_id = kept.find(0, tool_id + 1)
+    return removed, added
+
+
+def new_tools_by_purpose(old, new):
+    """Tools listed in snapshot `new` but not in `old`, grouped by category in catalog order"""
+    known = old.tool_ids
+    added = {}
+    for tool in new.tools:
+        if tool_key(tool.name, tool.purpose, tool.link) not in known:
+            added.setdefault(tool.purpose, []).append(tool)
+    return added
+
+
+def update_catalog(current, json_file_path, snapshot_path='', version=None, readonly=False,
+                   rebuild_fraction=CATALOG_REBUILD_FRACTION):
+    """Bring a snapshot up to date with the catalog file, applying just the difference when it is small.
+
+    Once the changes since the last full build would exceed rebuild_fraction
+    of the catalog, everything is rebuilt from the file instead (through
+    load_catalog), which also restores file order and exact ranking statistics.
+    """
+    version = current.version + 1 if version is None else version
+    limit = int(rebuild_fraction * len(current.tools)) - current.changes
+    report = IngestReport(json_file_path)
+    diff = diff_catalog(current, read_tools(json_file_path, report), limit) if limit > 0 else None
+    if diff is None or len(diff[0]) + len(diff[1]) > limit:
+        return load_catalog(json_file_path, snapshot_path, version, readonly)
+    report.log_summary()
+    report.check(CATALOG_MAX_REJECT_FRACTION)
+    removed_ids, added = diff
+    logger.info(f"Applying catalog changes: {len(removed_ids)} tools removed, {len(added)} added")
+    return current.with_changes(removed_ids, added, version)
+
+
+if __name__ == '__main__':
+    # Precompile a snapshot, e.g. during deployment: python catalog.py tools.json tools.snapshot
+    if len(sys.argv) != 3:
+        sys.exit(f"usage: {sys.argv[0]} <tools.json> <snapshot path>")
+    load_catalog(sys.argv[1], sys.argv[2])
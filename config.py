@@ -8,5 +8,103 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 JSON_FILE_PATH = os.getenv('JSON_FILE_PATH', 'tools.json')
 
+# How updates are received: 'polling' (getUpdates) or 'webhook' (Telegram POSTs to us)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public base URL, e.g. https://my-bot.onrender.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443')))
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')  # Checked against X-Telegram-Bot-Api-Secret-Token
+
+# Number of updates processed concurrently (1 keeps them strictly in order)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '1'))
+
+# Tools shown per page of a category or search result, and how many result lists to keep for paging
+RESULTS_PAGE_SIZE = int(os.getenv('RESULTS_PAGE_SIZE', '10'))
+RESULT_VIEW_CACHE_SIZE = int(os.getenv('RESULT_VIEW_CACHE_SIZE', '1000'))
+
+# Maximum number of ranked results returned by a search
+SEARCH_TOP_K = int(os.getenv('SEARCH_TOP_K', '50'))
+
+# Normalized queries whose detected search term and result ids are cached
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '10000'))
+
+# Inline mode (@bot query): results per answer (Telegram allows at most 50), seconds Telegram
+# may serve an answer from its own cache, how long an uncached query waits for the user to stop
+# typing before it is searched, and how many normalized queries keep their answers
+INLINE_PAGE_SIZE = int(os.getenv('INLINE_PAGE_SIZE', '20'))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.25'))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '5000'))
+
+# Seconds between checks of JSON_FILE_PATH for changes (0 disables hot reload)
+CATALOG_RELOAD_INTERVAL = float(os.getenv('CATALOG_RELOAD_INTERVAL', '5'))
+
+# A reload applies only the changed tools to the search indexes until the changes since
+# the last full build exceed this fraction of the catalog, which then triggers a rebuild
+CATALOG_REBUILD_FRACTION = float(os.getenv('CATALOG_REBUILD_FRACTION', '0.2'))
+# A catalog file with no valid tools, or with more than this fraction of its records rejected,
+# is refused as a whole (e.g. a truncated or mangled save), so a reload keeps the current catalog
+CATALOG_MAX_REJECT_FRACTION = float(os.getenv('CATALOG_MAX_REJECT_FRACTION', '0.5'))
+
+# Optional binary snapshot of the parsed catalog and its indexes, rebuilt whenever
+# JSON_FILE_PATH changes and loaded instead of it at startup (empty disables)
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', '')
+
+# Worker processes handling updates (1 handles them in the receiving process); with more,
+# the receiver shards updates by user id over per-worker queues of WORKER_QUEUE_SIZE
+WORKERS = int(os.getenv('WORKERS', '1'))
+WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', '1000'))
+
+# User session storage: 'memory' (bounded LRU) or 'sqlite' (persisted across restarts)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+SESSION_MAX_USERS = int(os.getenv('SESSION_MAX_USERS', '100000'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', str(30 * 24 * 3600)))  # seconds of inactivity, 0 keeps forever
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+SESSION_FLUSH_SIZE = int(os.getenv('SESSION_FLUSH_SIZE', '100'))
+SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '5'))
+
+# Telegram user ids allowed to use admin commands such as /broadcast (comma-separated)
+ADMIN_USER_IDS = frozenset(int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip())
+
+# Broadcasts: jobs and their recipients persist in BROADCAST_DB_PATH (empty disables broadcasts)
+# and are delivered BROADCAST_BATCH_SIZE recipients at a time, with at most BROADCAST_CONCURRENCY
+# sends in flight and BROADCAST_RATE messages per second, kept below SEND_GLOBAL_RATE so replies
+# still get through. Progress is reported every BROADCAST_PROGRESS_INTERVAL seconds, and jobs
+# queued by other processes are picked up within BROADCAST_POLL_INTERVAL seconds
+BROADCAST_DB_PATH = os.getenv('BROADCAST_DB_PATH', 'broadcasts.db')
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '200'))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '10'))
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '10'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '10'))
+BROADCAST_POLL_INTERVAL = float(os.getenv('BROADCAST_POLL_INTERVAL', '5'))
+# Broadcast "new tools in <category>" to all users when a catalog reload adds tools
+ANNOUNCE_NEW_TOOLS = os.getenv('ANNOUNCE_NEW_TOOLS', '1') == '1'
+
+# Outgoing messages: per-chat and global rate limits (messages per second, 0 disables),
+# retries after a 429, and how many replies may wait per chat before new ones are dropped
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '2'))
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '25'))
+SEND_GLOBAL_BURST = int(os.getenv('SEND_GLOBAL_BURST', '5'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+SEND_MAX_PENDING = int(os.getenv('SEND_MAX_PENDING', '10'))
+
+# Incoming messages per user (messages per second, 0 disables), and the window in
+# seconds within which a repeat of the user's previous message is ignored
+THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', '1'))
+THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', '5'))
+THROTTLE_DUPLICATE_WINDOW = float(os.getenv('THROTTLE_DUPLICATE_WINDOW', '2'))
+
+# Errors logged per error type: bursts of ERROR_LOG_BURST, then ERROR_LOG_RATE per second
+# (0 logs every error); the rest are only counted and reported with the next one logged
+ERROR_LOG_RATE = float(os.getenv('ERROR_LOG_RATE', '0.1'))
+ERROR_LOG_BURST = int(os.getenv('ERROR_LOG_BURST', '5'))
+
+# Prometheus metrics endpoint (http://METRICS_LISTEN:METRICS_PORT/metrics), which also answers
+# the /health readiness check; port 0 disables both
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
 # Logging configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
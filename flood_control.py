@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from telegram.error import RetryAfter
+
+from config import (
+    SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_MAX_RETRIES, SEND_MAX_PENDING,
+    THROTTLE_RATE, THROTTLE_BURST, THROTTLE_DUPLICATE_WINDOW, SESSION_MAX_USERS, ERROR_LOG_RATE, ERROR_LOG_BURST
+)
+
+logger = logging.getLogger(__name__)
+
+# A 429 asking us to wait longer than this drops the message instead of holding the chat's queue
+MAX_RETRY_AFTER = 60
+
+# Verdicts of UserThrottle.check
+ALLOW = 'allow'
+MERGE = 'merge'  # Same text as the user's previous message moments ago
+DROP = 'drop'
+WARN = 'warn'  # Dropped, and the first drop since the user was last allowed through
+
+
+class TokenBucket:
+    """Allows `rate` events per second with bursts of up to `capacity`; a rate of 0 means unlimited"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def try_take(self, now):
+        """Take a token if one is available now"""
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, now):
+        """Take a token, borrowing from the future if needed; return seconds until it may be used"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self, now):
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _ChatQueue:
+    __slots__ = ('bucket', 'pending', 'keys', 'task')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.pending = deque()  # (key, send, future), oldest first
+        self.keys = {}  # coalescing key -> future of the queued or in-flight message
+        self.task = None
+
+
+class SendScheduler:
+    """Sends outgoing messages within Telegram's per-chat and global flood limits.
+
+    Each chat gets a FIFO queue and token bucket, drained by one task while
+    it has messages, and every send also takes a token from a global bucket.
+    A 429 holds the chat's queue for its retry_after, then the message is retried;
+    any other error is left for whoever awaits the message's future.
+    A message whose key matches one already queued or in flight for the same
+    chat is coalesced into it instead of being sent twice, and a chat with
+    max_pending messages waiting has new ones dropped.
+    """
+
+    def __init__(self, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST, global_rate=SEND_GLOBAL_RATE,
+                 global_burst=SEND_GLOBAL_BURST, max_retries=SEND_MAX_RETRIES, max_pending=SEND_MAX_PENDING,
+                 max_chats=SESSION_MAX_USERS):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.max_chats = max_chats
+        self._chats = {}  # chat_id -> _ChatQueue
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.retries = 0
+        self.failures = 0
+
+    def submit(self, chat_id, send, key=None):
+        """Queue `send`, a coroutine function, for chat_id and return a future for its result.
+
+        The future resolves to None if flood control keeps refusing the
+        message and raises any other error the send raised; submit returns
+        None when the message is dropped because the chat's queue is full.
+        """
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self.max_chats:
+                self._prune()
+            chat = self._chats[chat_id] = _ChatQueue(TokenBucket(self.chat_rate, self.chat_burst))
+
+        if key is not None:
+            future = chat.keys.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+        if len(chat.pending) >= self.max_pending:
+            self.dropped += 1
+            logger.debug(f"Dropped a message to chat {chat_id}: {len(chat.pending)} already queued")
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        chat.pending.append((key, send, future))
+        if key is not None:
+            chat.keys[key] = future
+        if chat.task is None:
+            chat.task = asyncio.create_task(self._drain_chat(chat_id, chat))
+        return future
+
+    async def _drain_chat(self, chat_id, chat):
+        """Send the chat's queued messages in order"""
+        try:
+            while chat.pending:
+                key, send, future = chat.pending[0]
+                error = result = None
+                try:
+                    result = await self._send(chat_id, chat, send)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    error = e
+                finally:
+                    chat.pending.popleft()
+                    if key is not None:
+                        chat.keys.pop(key, None)
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        finally:
+            chat.task = None
+            # Cancelled mid-queue, e.g. at shutdown
+            for _, _, future in chat.pending:
+                future.cancel()
+            chat.pending.clear()
+            chat.keys.clear()
+
+    async def _wait_for_slot(self, chat):
+        """Sleep until both the chat's and the global bucket allow one more message"""
+        delay = chat.bucket.reserve(time.monotonic())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self.global_bucket.reserve(time.monotonic())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send(self, chat_id, chat, send):
+        """Send one message, retrying after 429s; return its result, or None if flood control never lets it through"""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_slot(chat)
+            try:
+                result = await send()
+            except RetryAfter as e:
+                if e.retry_after > MAX_RETRY_AFTER or attempt == self.max_retries:
+                    logger.warning(f"Giving up on a message to chat {chat_id}: flood control asks to wait {e.retry_after}s")
+                    break
+                # Holding the chat's queue keeps its later messages in order behind this one
+                self.retries += 1
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception:
+                self.failures += 1
+                raise
+            self.sent += 1
+            return result
+        self.failures += 1
+        return None
+
+    def _prune(self):
+        """Forget idle chats, preferring those whose buckets have refilled (a new bucket is identical)"""
+        now = time.monotonic()
+        idle = [chat_id for chat_id, chat in self._chats.items() if chat.task is None]
+        refilled = [chat_id for chat_id in idle if self._chats[chat_id].bucket.is_full(now)]
+        for chat_id in refilled if len(self._chats) - len(refilled) < self.max_chats else idle:
+            del self._chats[chat_id]
+
+    async def drain(self):
+        """Wait until every queued message has been sent or given up on"""
+        while True:
+            tasks = [chat.task for chat in self._chats.values() if chat.task is not None]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """Cancel everything still queued"""
+        for chat in self._chats.values():
+            if chat.task is not None:
+                chat.task.cancel()
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {
+            'chats': len(self._chats),
+            'queued': sum(len(chat.pending) for chat in self._chats.values()),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'failures': self.failures,
+        }
+
+
+class _UserHistory:
+    __slots__ = ('bucket', 'last_text', 'last_at', 'warned')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.last_text = None
+        self.last_at = 0.0
+        self.warned = False
+
+
+class UserThrottle:
+    """Per-user limit on incoming messages, checked before any handler runs.
+
+    A message repeating the user's previous text within duplicate_window
+    seconds is merged into it; past the user's token bucket, messages are
+    dropped. Users are tracked in a bounded LRU.
+    """
+
+    def __init__(self, rate=THROTTLE_RATE, burst=THROTTLE_BURST, duplicate_window=THROTTLE_DUPLICATE_WINDOW,
+                 max_users=SESSION_MAX_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_window = duplicate_window
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> _UserHistory, least recently seen first
+        self.allowed = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def check(self, user_id, text):
+        """Return ALLOW, MERGE, DROP or WARN for a message from user_id"""
+        now = time.monotonic()
+        history = self._users.get(user_id)
+        if history is None:
+            history = self._users[user_id] = _UserHistory(TokenBucket(self.rate, self.burst))
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+
+        if text == history.last_text and now - history.last_at < self.duplicate_window:
+            self.merged += 1
+            return MERGE
+        if not history.bucket.try_take(now):
+            self.dropped += 1
+            if history.warned:
+                return DROP
+            history.warned = True
+            return WARN
+
+        history.last_text = text
+        history.last_at = now
+        history.warned = False
+        self.allowed += 1
+        return ALLOW
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {'users': len(self._users), 'allowed': self.allowed, 'merged': self.merged, 'dropped': self.dropped}
+
+
+class ErrorLogSampler:
+    """Decides which errors are logged: bursts of `burst` per kind of error, then `rate` per second.
+
+    A log record with a traceback costs more to format and write than most
+    updates cost to handle, so a burst of failing updates is only counted.
+    """
+
+    def __init__(self, rate=ERROR_LOG_RATE, burst=ERROR_LOG_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # kind -> TokenBucket
+        self._skipped = {}  # kind -> errors not logged since the last one that was
+        self.logged = 0
+        self.suppressed = 0
+
+    def sample(self, kind):
+        """Return None if this error should not be logged, else how many of its kind were skipped before it"""
+        bucket = self._buckets.get(kind)
+        if bucket is None:
+            bucket = self._buckets[kind] = TokenBucket(self.rate, self.burst)
+        if bucket.try_take(time.monotonic()):
+            self.logged += 1
+            return self._skipped.pop(kind, 0)
+        self._skipped[kind] = self._skipped.get(kind, 0) + 1
+        self.suppressed += 1
+        return None
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {'logged': self.logged, 'suppressed': self.suppressed}
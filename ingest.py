@@ -0,0 +1,204 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+TOOL_FIELDS = ('name', 'purpose', 'link')
+
+# Characters read from the catalog file at a time
+CHUNK_SIZE = 1 << 16
+# A JSON array element still incomplete after this many characters is treated as malformed
+MAX_RECORD_SIZE = 1 << 20
+# Rejected records logged one by one before the rest are only counted
+MAX_LOGGED_REJECTS = 5
+
+WHITESPACE = re.compile(r'\s+')
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+URL_SCHEME = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://')
+
+
+class InvalidRecord(ValueError):
+    """A catalog record that cannot be turned into a tool"""
+
+
+class IngestReport:
+    """Counts of what happened to the records read from one catalog file"""
+
+    def __init__(self, source):
+        self.source = source
+        self.read = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = {}  # reason -> count
+
+    def reject(self, position, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        if sum(self.rejected.values()) <= MAX_LOGGED_REJECTS:
+            logger.warning(f"Skipping record {position} of {self.source}: {reason}")
+
+    def duplicate(self, position, record):
+        self.duplicates += 1
+        if self.duplicates <= MAX_LOGGED_REJECTS:
+            logger.info(f"Skipping record {position} of {self.source}: duplicate of {record['name']!r} "
+                        f"in {record['purpose']!r}")
+
+    def check(self, max_reject_fraction):
+        """Raise ValueError if the file is not a usable catalog: no valid tools, or mostly rejected records"""
+        rejected = sum(self.rejected.values())
+        if not self.accepted:
+            raise ValueError(f"{self.source}: no valid tools in {self.read} records")
+        if rejected > max_reject_fraction * self.read:
+            raise ValueError(f"{self.source}: {rejected} of {self.read} records rejected")
+
+    def log_summary(self):
+        rejected = sum(self.rejected.values())
+        if rejected or self.duplicates:
+            reasons = ', '.join(f"{count} {reason}" for reason, count in sorted(self.rejected.items()))
+            logger.warning(f"Read {self.read} records from {self.source}: {self.accepted} accepted, "
+                           f"{self.duplicates} duplicates, {rejected} rejected" + (f" ({reasons})" if reasons else ''))
+
+
+def _iter_array(file, buffer, report):
+    """Yield (position, element) for a JSON array one element at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    position = 1  # Just past the opening bracket
+    eof = False
+    index = 0
+    after_value = False  # An element was just read, so ',' or ']' must follow
+    after_comma = False  # A ',' was just read, so an element must follow
+
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()
+        if position == len(buffer) and not eof:
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        if position == len(buffer):
+            raise ValueError(f"{report.source}: unterminated JSON array")
+
+        char = buffer[position]
+        if after_value:
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"{report.source}: expected ',' or ']' after element {index}")
+            position += 1
+            after_value, after_comma = False, True
+            continue
+        if char == ']' and not after_comma:
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A number cut off by the chunk boundary would also decode
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError as e:
+            if eof or len(buffer) - position > MAX_RECORD_SIZE:
+                raise ValueError(f"{report.source}: malformed JSON in element {index + 1}: {e.msg}") from None
+            complete = False
+        if not complete:
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield f"at index {index}", value
+        index += 1
+        after_value, after_comma = True, False
+        position = end
+        if position > CHUNK_SIZE:
+            buffer, position = buffer[position:], 0
+
+
+def iter_json_records(path, report):
+    """Yield (position, value) for each record of a JSON array or JSON Lines file without loading it whole.
+
+    A malformed line of a JSON Lines file is rejected on its own; a malformed
+    JSON array or an empty file raises ValueError, as nothing after the error
+    can be trusted.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        first = file.read(CHUNK_SIZE)
+        stripped = first.lstrip()
+        if not stripped and len(first) < CHUNK_SIZE:
+            raise ValueError(f"{report.source}: empty file")
+        if stripped.startswith('['):
+            yield from _iter_array(file, stripped, report)
+            return
+
+        # JSON Lines: one record per line
+        file.seek(0)
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                report.read += 1
+                report.reject(f"on line {line_number}", f"malformed JSON ({e.msg})")
+                continue
+            yield f"on line {line_number}", record
+
+
+def normalize_link(link):
+    """Add the scheme a bare domain is missing; reject anything that is not an http(s) URL"""
+    if link.startswith(('https://', 'http://')):
+        return link
+    if not URL_SCHEME.match(link):
+        link = f"https://{link}"
+    if not link.lower().startswith(('http://', 'https://')):
+        raise InvalidRecord('link is not an http(s) URL')
+    return link
+
+
+def normalize_record(record):
+    """Return a clean {'name', 'purpose', 'link'} dict for a raw record, or raise InvalidRecord"""
+    if not isinstance(record, dict):
+        raise InvalidRecord('not a JSON object')
+    tool = {}
+    for field in TOOL_FIELDS:
+        value = record.get(field)
+        if value is None:
+            raise InvalidRecord(f'missing {field}')
+        if not isinstance(value, str):
+            raise InvalidRecord(f'{field} is not a string')
+        # Most values are already clean, and checking is much cheaper than rewriting
+        if not value.isprintable() or '  ' in value or value[:1].isspace() or value[-1:].isspace():
+            value = WHITESPACE.sub(' ', value).strip()
+        if not value:
+            raise InvalidRecord(f'empty {field}')
+        tool[field] = value
+    tool['link'] = normalize_link(tool['link'])
+    return tool
+
+
+def tool_key(name, purpose, link):
+    """Identity of a catalog entry: the same tool may be listed under several categories, but once in each"""
+    return (name.casefold(), purpose, link.lower().rstrip('/'))
+
+
+def ingest_records(records, report):
+    """Yield normalized, deduplicated tool dicts for (position, raw record) pairs, counting rejects in report"""
+    seen = set()
+    for position, record in records:
+        report.read += 1
+        try:
+            tool = normalize_record(record)
+        except InvalidRecord as e:
+            report.reject(position, str(e))
+            continue
+        key = tool_key(tool['name'], tool['purpose'], tool['link'])
+        if key in seen:
+            report.duplicate(position, tool)
+            continue
+        seen.add(key)
+        report.accepted += 1
+        yield tool
+
+
+def read_tools(path, report=None):
+    """Yield the valid, unique tools of a JSON array or JSON Lines catalog file"""
+    report = report or IngestReport(path)
+    yield from ingest_records(iter_json_records(path, report), report)
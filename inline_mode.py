@@ -0,0 +1,46 @@
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+
+from config import INLINE_PAGE_SIZE
+
+
+def normalize_inline_query(text):
+    """Lowercase and collapse whitespace, so 'Video  ' and 'video' share one cached answer"""
+    return ' '.join(text.lower().split())
+
+
+def parse_offset(offset):
+    """Index of the first result to return for an inline query's offset ('' for the first page)"""
+    return int(offset) if offset.isdigit() else 0
+
+
+def make_article(tool):
+    """An inline result that sends the tool's card to the chat when picked"""
+    return InlineQueryResultArticle(
+        id=str(tool.id),
+        title=tool.name,
+        description=tool.purpose,
+        url=tool.link,
+        input_message_content=InputTextMessageContent(
+            f"**{tool.name}**\n📁 Category: {tool.purpose}\n🔗 {tool.link}", parse_mode='Markdown'
+        ),
+    )
+
+
+class InlineResults:
+    """The tools found for one inline query, turned into articles a page at a time"""
+    __slots__ = ('tools', 'page_size', 'pages')
+
+    def __init__(self, tools, page_size=INLINE_PAGE_SIZE):
+        self.tools = tools
+        self.page_size = page_size
+        self.pages = {}  # start index -> (articles, next offset), built on first request
+
+    def page(self, start):
+        """Return (articles, next_offset) for the page beginning at result `start`"""
+        page = self.pages.get(start)
+        if page is None:
+            end = start + self.page_size
+            # Telegram asks for the next page with next_offset; '' tells it there is none
+            next_offset = str(end) if end < len(self.tools) else ''
+            page = self.pages[start] = (tuple(map(make_article, self.tools[start:end])), next_offset)
+        return page
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond handler work to slow Bot API calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [*zip(labelnames, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}  # label values tuple -> count
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, optionally split by label values"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values tuple -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        # Counts are stored per bucket and only made cumulative when scraped
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels):
+        """Context manager that observes the seconds spent in its block"""
+        return _Timer(self, labels)
+
+    def count(self, *labels):
+        series = self.series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, (('le', _format_value(bound)),))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter read from the application when scraped, so it costs nothing in between.
+
+    The callback returns a number, or a dict of label values tuple -> number.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = labelnames
+        self.kind = kind
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        return self._register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                # One broken callback should not take the whole endpoint down
+                logger.error(f"Failed to collect metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics with the registry's current values.
+
+    GET /health answers 200 once `is_ready()` is true and 503 before, for
+    load balancers and orchestrators to hold traffic until the bot is ready.
+    """
+
+    def __init__(self, registry, host, port, is_ready=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.is_ready = is_ready if is_ready is not None else (lambda: True)
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 asks the OS for a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Skip the headers; nothing in them changes the response
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) >= 2 and parts[0] == 'GET' else None
+            if path == '/metrics':
+                status, body = '200 OK', self.registry.render().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/health':
+                ready = self.is_ready()
+                status, body = ('200 OK', b'ok\n') if ready else ('503 Service Unavailable', b'warming up\n')
+                content_type = 'text/plain'
+            else:
+                status, body, content_type = '404 Not Found', b'Not Found\n', 'text/plain'
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,101 @@
+import hashlib
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import RESULTS_PAGE_SIZE, RESULT_VIEW_CACHE_SIZE
+
+# Callback data is "page:<view key>:<page number>", well under Telegram's 64-byte limit
+PAGE_CALLBACK_PREFIX = 'page'
+
+
+def make_view_key(*parts):
+    """Short stable key for a result view, safe to embed in callback data"""
+    return hashlib.blake2b('\x00'.join(map(str, parts)).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ResultView:
+    """A list of tools shown page by page, with its header and footer text"""
+    __slots__ = ('key', 'header', 'tools', 'show_category', 'footer', 'page_size', 'pages')
+
+    def __init__(self, key, header, tools, footer, show_category=False, page_size=RESULTS_PAGE_SIZE):
+        self.key = key
+        self.header = header
+        self.tools = tools
+        self.footer = footer
+        self.show_category = show_category
+        self.page_size = page_size
+        self.pages = {}  # page number -> (text, keyboard), rendered on first view
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.tools) // self.page_size))
+
+    def render_page(self, page):
+        """Return (text, reply_markup) for a 0-based page number"""
+        page = min(max(page, 0), self.page_count - 1)
+        rendered = self.pages.get(page)
+        if rendered is None:
+            rendered = self.pages[page] = (self._render_text(page), self._render_keyboard(page))
+        return rendered
+
+    def _render_text(self, page):
+        start = page * self.page_size
+        parts = [self.header]
+        for i, tool in enumerate(self.tools[start:start + self.page_size], start + 1):
+            if self.show_category:
+                parts.append(f"**{i}. {tool.name}**\n📁 Category: {tool.purpose}\n🔗 {tool.link}\n\n")
+            else:
+                parts.append(f"**{i}. {tool.name}**\n🔗 {tool.link}\n\n")
+
+        if self.page_count > 1:
+            parts.append(f"📊 **{len(self.tools)} tools found** (page {page + 1}/{self.page_count})\n\n")
+        else:
+            parts.append(f"📊 **{len(self.tools)} tools found**\n\n")
+        parts.append(self.footer)
+        return ''.join(parts)
+
+    def _render_keyboard(self, page):
+        if self.page_count == 1:
+            return None
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"{PAGE_CALLBACK_PREFIX}:{self.key}:{page - 1}"))
+        if page < self.page_count - 1:
+            buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"{PAGE_CALLBACK_PREFIX}:{self.key}:{page + 1}"))
+        return InlineKeyboardMarkup([buttons])
+
+
+class ResultViewCache:
+    """Bounded LRU of result views, looked up again when the user pages"""
+
+    def __init__(self, max_views=RESULT_VIEW_CACHE_SIZE):
+        self.max_views = max_views
+        self._views = OrderedDict()
+
+    def __len__(self):
+        return len(self._views)
+
+    def get(self, key):
+        view = self._views.get(key)
+        if view is not None:
+            self._views.move_to_end(key)
+        return view
+
+    def put(self, view):
+        self._views[view.key] = view
+        self._views.move_to_end(view.key)
+        while len(self._views) > self.max_views:
+            self._views.popitem(last=False)
+        return view
+
+
+def parse_page_callback(data):
+    """Split 'page:<key>:<n>' callback data into (key, n), or None if malformed"""
+    try:
+        prefix, key, page = data.split(':')
+        if prefix != PAGE_CALLBACK_PREFIX:
+            return None
+        return key, int(page)
+    except (AttributeError, ValueError):
+        return None
@@ -0,0 +1,420 @@
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from tool_index import without_ids
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 2.0  # A query term in the tool's name counts double one in its category
+
+# Query terms that are not in the vocabulary are matched to terms within this
+# many edits (optimal string alignment, so a transposition counts as one)
+MIN_TYPO_LENGTH = 4
+MAX_EDITS_SHORT = 1
+MAX_EDITS_LONG = 2
+LONG_TERM_LENGTH = 7
+MAX_EXPANSIONS = 20
+MAX_TYPO_CHECKS = 20
+
+# Tools scored per query before the threshold algorithm gives up on an exact top k
+MAX_CANDIDATES = 300
+TYPO_PENALTY = 0.7
+PREFIX_PENALTY = 0.8
+
+# Results scoring below this fraction of the best result are not returned
+MIN_RELATIVE_SCORE = 0.25
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of text"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _trigrams(term):
+    padded = f' {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between a and b, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only cells within `limit` of the diagonal can stay under the limit
+    over = limit + 1
+    previous2 = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            char_b = b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+    return min(previous[-1], over)
+
+
+def _scaled(ranked, posting, factor):
+    for tool_id in ranked:
+        yield factor * posting[tool_id], tool_id
+
+
+def _descending(entry):
+    return -entry[0]
+
+
+def _bm25(tf, length, average_length, idf):
+    norm = K1 * (1 - B + B * length / average_length) if average_length else K1
+    return idf * tf * (K1 + 1) / (tf + norm)
+
+
+def _idf(total, df):
+    return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+
+class RankedSearch:
+    """BM25 ranking over tool names and categories with typo-tolerant term matching.
+
+    Category scores are computed per distinct purpose rather than per tool,
+    so a query that matches a large category costs no more than one that
+    matches a small one.
+    """
+
+    def __init__(self, tools, state=None):
+        self.tool_purpose = array('I')  # tool id -> purpose id
+        self.purpose_ids = {}  # purpose -> purpose id
+        self.purposes = []
+        for tool in tools:
+            purpose_id = self.purpose_ids.get(tool.purpose)
+            if purpose_id is None:
+                purpose_id = self.purpose_ids[tool.purpose] = len(self.purposes)
+                self.purposes.append(tool.purpose)
+            self.tool_purpose.append(purpose_id)
+
+        # Tools of each purpose, in file order
+        self.purpose_tools = [array('I') for _ in self.purposes]
+        for tool_id, purpose_id in enumerate(self.tool_purpose):
+            self.purpose_tools[purpose_id].append(tool_id)
+
+        # The idf each name term was last scored with, for terms rescored by with_changes;
+        # the others were scored against all len(tools) tools of the full build
+        self.name_idf = {}
+        # Factor from a rescored term's stored name scores to its current ones, so
+        # with_changes never rewrites the scores of tools that did not change
+        self.name_scale = {}
+        self.idf_total = len(tools)
+        if state is None:
+            # term -> {tool id: score} for names, term -> {purpose id: score} for categories
+            name_tokens = [tokenize(tool.name) for tool in tools]
+            self.average_name_length = sum(map(len, name_tokens)) / max(len(tools), 1)
+            self.name_postings = self._build_postings(name_tokens, [1] * len(tools), len(tools))
+            self.purpose_postings = self._build_purpose_postings(len(tools))
+            # term -> tool ids, best name score first, for reading name postings in score order
+            self.name_ranked = {
+                term: array('I', sorted(posting, key=lambda tool_id: (-posting[tool_id], tool_id)))
+                for term, posting in self.name_postings.items()
+            }
+        else:
+            self._load_state(state)
+
+        self.vocabulary = sorted(set(self.name_postings) | set(self.purpose_postings))
+        # (trigram, term length) -> terms, so typo lookups only scan plausible lengths
+        self.trigram_index = defaultdict(list)
+        for term in self.vocabulary:
+            for trigram in _trigrams(term):
+                self.trigram_index[(trigram, len(term))].append(term)
+
+    def to_state(self):
+        """The scored postings as plain values, for a catalog snapshot file"""
+        name_postings = {}
+        for term, ranked in self.name_ranked.items():
+            posting = self.name_postings[term]
+            name_postings[term] = (ranked.tobytes(), array('d', (posting[tool_id] for tool_id in ranked)).tobytes())
+        return {
+            'name_postings': name_postings,
+            'purpose_postings': self.purpose_postings,
+            'average_name_length': self.average_name_length,
+        }
+
+    def _load_state(self, state):
+        """Restore the postings saved by to_state"""
+        self.name_postings = {}
+        self.name_ranked = {}
+        for term, (id_bytes, score_bytes) in state['name_postings'].items():
+            ranked = self.name_ranked[term] = array('I')
+            ranked.frombytes(id_bytes)
+            scores = array('d')
+            scores.frombytes(score_bytes)
+            self.name_postings[term] = dict(zip(ranked, scores))
+        self.purpose_postings = state['purpose_postings']
+        self.average_name_length = state['average_name_length']
+
+    def _build_purpose_postings(self, total):
+        # Categories emptied by with_changes keep their id but no longer count
+        purpose_tokens = [tokenize(purpose) if group else [] for purpose, group in zip(self.purposes, self.purpose_tools)]
+        purpose_sizes = [len(group) for group in self.purpose_tools]
+        return self._build_postings(purpose_tokens, purpose_sizes, total)
+
+    def with_changes(self, total, removed, added):
+        """A new ranking with the removed Tools taken out and the added ones scored in; `total` tools remain.
+
+        Name terms of the changed tools are rescored with their new document
+        frequency through name_scale, and only the entries of the changed
+        tools are written. Every other term keeps its scores and the average
+        name length stays that of the last full build, so rankings drift
+        slightly until the catalog is next rebuilt from scratch. Categories
+        are few and always rescored.
+        """
+        ranked = RankedSearch.__new__(RankedSearch)
+        ranked.tool_purpose = array('I', self.tool_purpose)
+        ranked.purpose_ids = dict(self.purpose_ids)
+        ranked.purposes = list(self.purposes)
+        ranked.purpose_tools = list(self.purpose_tools)
+        ranked.idf_total = self.idf_total
+        ranked.average_name_length = self.average_name_length
+        ranked.name_idf = dict(self.name_idf)
+        ranked.name_scale = dict(self.name_scale)
+        ranked.name_postings = dict(self.name_postings)
+        ranked.name_ranked = dict(self.name_ranked)
+
+        removed_by_purpose = defaultdict(list)
+        for tool in removed:
+            removed_by_purpose[self.tool_purpose[tool.id]].append(tool.id)
+        changed_purposes = set(removed_by_purpose)
+        removed_terms = defaultdict(list)
+        for tool in removed:
+            for term in set(tokenize(tool.name)):
+                removed_terms[term].append(tool.id)
+        added_terms = defaultdict(list)  # term -> [(tool id, tf, name length)]
+        for tool in added:
+            purpose_id = ranked.purpose_ids.get(tool.purpose)
+            if purpose_id is None:
+                purpose_id = ranked.purpose_ids[tool.purpose] = len(ranked.purposes)
+                ranked.purposes.append(tool.purpose)
+                ranked.purpose_tools.append(array('I'))
+            ranked.tool_purpose.append(purpose_id)
+            changed_purposes.add(purpose_id)
+            tokens = tokenize(tool.name)
+            for term in set(tokens):
+                added_terms[term].append((tool.id, tokens.count(term), len(tokens)))
+
+        for purpose_id in changed_purposes:
+            tool_ids = without_ids(ranked.purpose_tools[purpose_id], sorted(removed_by_purpose.get(purpose_id, ())))
+            tool_ids.extend(tool.id for tool in added if ranked.tool_purpose[tool.id] == purpose_id)
+            ranked.purpose_tools[purpose_id] = tool_ids
+        ranked.purpose_postings = ranked._build_purpose_postings(total)
+
+        for term in removed_terms.keys() | added_terms.keys():
+            old = self.name_postings.get(term, {})
+            gone = removed_terms.get(term, ())
+            new_entries = added_terms.get(term, ())
+            df = len(old) - len(gone) + len(new_entries)
+            if not df:
+                del ranked.name_postings[term], ranked.name_ranked[term]
+                ranked.name_idf.pop(term, None)
+                ranked.name_scale.pop(term, None)
+                continue
+            idf = _idf(total, df)
+            # Scores are proportional to idf, so existing entries keep their stored scores and order
+            # and the term's scale absorbs the new idf
+            scale = (self.name_scale.get(term, 1.0) * idf / self.name_idf.get(term, _idf(self.idf_total, len(old)))
+                     if old else 1.0)
+            posting = dict(old)
+            order_ids = array('I', self.name_ranked.get(term, ()))
+
+            def order(tool_id, posting=posting):
+                return -posting[tool_id], tool_id
+            for tool_id in gone:
+                del order_ids[bisect_left(order_ids, order(tool_id), key=order)]
+                del posting[tool_id]
+            for tool_id, tf, length in new_entries:
+                posting[tool_id] = _bm25(tf, length, self.average_name_length, idf) / scale
+                order_ids.insert(bisect_left(order_ids, order(tool_id), key=order), tool_id)
+            ranked.name_ranked[term] = order_ids
+            ranked.name_postings[term] = posting
+            ranked.name_idf[term] = idf
+            if scale == 1.0:
+                ranked.name_scale.pop(term, None)
+            else:
+                ranked.name_scale[term] = scale
+
+        # Only the changed tools' name terms and the category terms can enter or leave the vocabulary
+        candidates = (removed_terms.keys() | added_terms.keys()
+                      | self.purpose_postings.keys() | ranked.purpose_postings.keys())
+        old_terms = {term for term in candidates if term in self.name_postings or term in self.purpose_postings}
+        new_terms = {term for term in candidates if term in ranked.name_postings or term in ranked.purpose_postings}
+        ranked.vocabulary = list(self.vocabulary)
+        ranked.trigram_index = dict(self.trigram_index)
+        for term in old_terms - new_terms:
+            del ranked.vocabulary[bisect_left(ranked.vocabulary, term)]
+            for trigram in _trigrams(term):
+                key = (trigram, len(term))
+                ranked.trigram_index[key] = [candidate for candidate in ranked.trigram_index[key] if candidate != term]
+        for term in new_terms - old_terms:
+            ranked.vocabulary.insert(bisect_left(ranked.vocabulary, term), term)
+            for trigram in _trigrams(term):
+                key = (trigram, len(term))
+                ranked.trigram_index[key] = ranked.trigram_index.get(key, []) + [term]
+        return ranked
+
+    @staticmethod
+    def _build_postings(token_lists, weights, total):
+        """BM25 postings for fields that stand for `weights[i]` tools each out of `total`"""
+        if not token_lists:
+            return {}
+        document_frequency = defaultdict(int)
+        for tokens, weight in zip(token_lists, weights):
+            for term in set(tokens):
+                document_frequency[term] += weight
+        average_length = sum(len(tokens) * weight for tokens, weight in zip(token_lists, weights)) / max(total, 1)
+
+        postings = defaultdict(dict)
+        for field_id, tokens in enumerate(token_lists):
+            counts = defaultdict(int)
+            for term in tokens:
+                counts[term] += 1
+            for term, tf in counts.items():
+                postings[term][field_id] = _bm25(tf, len(tokens), average_length, _idf(total, document_frequency[term]))
+        return dict(postings)
+
+    def expand_term(self, term):
+        """Vocabulary terms a query term should match, with a weight for each"""
+        if term in self.name_postings or term in self.purpose_postings:
+            return {term: 1.0}
+
+        # Prefixes: 'edit' also finds 'editing' and 'editor'
+        expansions = {}
+        if len(term) >= 3:
+            start = bisect_left(self.vocabulary, term)
+            for candidate in self.vocabulary[start:start + MAX_EXPANSIONS]:
+                if not candidate.startswith(term):
+                    break
+                expansions.setdefault(candidate, PREFIX_PENALTY)
+
+        if expansions or len(term) < MIN_TYPO_LENGTH:
+            return expansions
+
+        # Typos: candidates share trigrams with the term, then pass the edit-distance check
+        limit = MAX_EDITS_LONG if len(term) >= LONG_TERM_LENGTH else MAX_EDITS_SHORT
+        trigrams = _trigrams(term)
+        shared = defaultdict(int)
+        for length in range(len(term) - limit, len(term) + limit + 1):
+            for trigram in trigrams:
+                for candidate in self.trigram_index.get((trigram, length), ()):
+                    shared[candidate] += 1
+        # Each edit changes at most four trigrams (a transposition spans two characters)
+        required = max(1, len(trigrams) - 4 * limit)
+        plausible = [candidate for candidate, count in shared.items() if count >= required]
+        for candidate in heapq.nlargest(MAX_TYPO_CHECKS, plausible, key=shared.get):
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit:
+                expansions[candidate] = TYPO_PENALTY ** distance
+        return expansions
+
+    def _name_stream(self, term, weight):
+        factor = NAME_WEIGHT * weight * self.name_scale.get(term, 1.0)
+        return _scaled(self.name_ranked[term], self.name_postings[term], factor)
+
+    def search(self, query, k):
+        """Ids of the k best-scoring tools for query, best first.
+
+        Uses Fagin's threshold algorithm: postings are read in descending score
+        order and reading stops as soon as no unseen tool could still enter the
+        top k, so a common term like 'ai' costs about k lookups, not one per tool.
+        Equal scores keep discovery order, which is file order within a category.
+        """
+        if k <= 0:
+            return []
+
+        name_terms = []  # per query term: [(weight, vocabulary term)] with name postings
+        purpose_scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            expansions = self.expand_term(term)
+            # Each query term contributes its best-matching expansion per purpose
+            best_purpose = {}
+            for candidate, weight in expansions.items():
+                for purpose_id, score in self.purpose_postings.get(candidate, {}).items():
+                    best_purpose[purpose_id] = max(best_purpose.get(purpose_id, 0.0), weight * score)
+            for purpose_id, score in best_purpose.items():
+                purpose_scores[purpose_id] += score
+            matched = [(weight, candidate) for candidate, weight in expansions.items() if candidate in self.name_postings]
+            if matched:
+                name_terms.append(matched)
+
+        # Random access: the best weighted name score per tool for each query term, as (factor, scores)
+        term_scores = []
+        for matched in name_terms:
+            if len(matched) == 1 and matched[0][0] == 1.0:
+                term = matched[0][1]
+                term_scores.append((NAME_WEIGHT * self.name_scale.get(term, 1.0), self.name_postings[term]))
+                continue
+            best = {}
+            for weight, candidate in matched:
+                weight *= self.name_scale.get(candidate, 1.0)
+                for tool_id, score in self.name_postings[candidate].items():
+                    if weight * score > best.get(tool_id, 0.0):
+                        best[tool_id] = weight * score
+            term_scores.append((NAME_WEIGHT, best))
+
+        def score_tool(tool_id):
+            score = purpose_scores.get(self.tool_purpose[tool_id], 0.0)
+            for factor, scores in term_scores:
+                score += factor * scores.get(tool_id, 0.0)
+            return score
+
+        # One stream per query term plus one for categories, each yielding
+        # (score upper bound, tool id) in descending score order
+        streams = [heapq.merge(*(self._name_stream(candidate, weight) for weight, candidate in matched), key=_descending)
+                   if len(matched) > 1 else self._name_stream(matched[0][1], matched[0][0])
+                   for matched in name_terms]
+        ranked_purposes = sorted(purpose_scores.items(), key=lambda item: (-item[1], item[0]))
+        streams.append((score, tool_id) for purpose_id, score in ranked_purposes
+                       for tool_id in self.purpose_tools[purpose_id])
+
+        top = []  # min-heap of (score, -tool id)
+        seen = set()
+        bounds = [math.inf] * len(streams)
+        active = list(range(len(streams)))
+        while active:
+            for index in list(active):
+                entry = next(streams[index], None)
+                if entry is None:
+                    bounds[index] = 0.0
+                    active.remove(index)
+                    continue
+                bounds[index], tool_id = entry
+                if tool_id in seen:
+                    continue
+                seen.add(tool_id)
+                item = (score_tool(tool_id), -tool_id)
+                if len(top) < k:
+                    heapq.heappush(top, item)
+                elif item > top[0]:
+                    heapq.heapreplace(top, item)
+            if len(top) == k and top[0][0] >= sum(bounds):
+                break
+            # Past the budget the top k is approximate, but built from the highest-scoring postings
+            if len(seen) >= MAX_CANDIDATES:
+                break
+
+        best = sorted(top, reverse=True)
+        if not best:
+            return []
+        # Drop the long tail that only matched a weak term such as 'ai'
+        cutoff = best[0][0] * MIN_RELATIVE_SCORE
+        return [-negative_id for score, negative_id in best if score >= cutoff]
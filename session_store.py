@@ -0,0 +1,267 @@
+import logging
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+from config import SESSION_BACKEND, SESSION_MAX_USERS, SESSION_TTL, SESSION_DB_PATH, SESSION_FLUSH_SIZE, SESSION_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class UserState:
+    """Compact per-user session record"""
+    __slots__ = ('last_action', 'active', 'detail', 'updated_at')
+
+    def __init__(self, last_action, active=True, detail=None, updated_at=None):
+        self.last_action = last_action
+        self.active = active
+        # selected_purpose or search_query, depending on last_action
+        self.detail = detail
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+
+class InMemorySessionStore:
+    """Bounded LRU session store; entries also expire after ttl seconds of inactivity"""
+
+    def __init__(self, max_users=SESSION_MAX_USERS, ttl=SESSION_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._states = OrderedDict()  # user_id -> UserState, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    def _is_expired(self, state, now):
+        return self.ttl > 0 and now - state.updated_at > self.ttl
+
+    def _expire(self, now):
+        """Drop expired entries from the least recently used end"""
+        while self._states:
+            user_id, state = next(iter(self._states.items()))
+            if not self._is_expired(state, now):
+                break
+            del self._states[user_id]
+            self.expirations += 1
+
+    def _put(self, user_id, state):
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        self._expire(time.time())
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, user_id):
+        """Return the cached state for user_id, or None if absent or expired"""
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        if self._is_expired(state, time.time()):
+            del self._states[user_id]
+            self.expirations += 1
+            return None
+        self._states.move_to_end(user_id)
+        return state
+
+    def get(self, user_id):
+        """Return the UserState for user_id, or None if unknown or expired"""
+        state = self._lookup(user_id)
+        if state is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return state
+
+    def set(self, user_id, last_action, active=True, detail=None):
+        """Record the latest action for user_id"""
+        state = UserState(last_action, active, detail)
+        self._put(user_id, state)
+        return state
+
+    def is_active(self, user_id):
+        """Users are active unless their last action was exiting the bot"""
+        state = self.get(user_id)
+        return state is None or state.active
+
+    def active_user_ids(self):
+        """Ids of the users who have not exited, e.g. the audience of a broadcast; safe to call from a thread"""
+        now = time.time()
+        # Copied in one step, as the event loop may change the store meanwhile
+        states = list(self._states.items())
+        return [user_id for user_id, state in states if state.active and not self._is_expired(state, now)]
+
+    def exited_user_ids(self, user_ids):
+        """The subset of user_ids whose last action was exiting the bot; looking them up does not count as use"""
+        now = time.time()
+        exited = set()
+        for user_id in user_ids:
+            state = self._states.get(user_id)
+            if state is not None and not state.active and not self._is_expired(state, now):
+                exited.add(user_id)
+        return exited
+
+    def memory_bytes(self):
+        """Approximate memory held by the cached records"""
+        if not self._states:
+            return sys.getsizeof(self._states)
+        sample = next(iter(self._states.values()))
+        return sys.getsizeof(self._states) + len(self._states) * sys.getsizeof(sample)
+
+    def stats(self):
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'size': len(self._states),
+            'max_users': self.max_users,
+            'memory_bytes': self.memory_bytes(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def flush(self):
+        """Nothing to persist for the in-memory backend"""
+
+    def close(self):
+        """Nothing to release for the in-memory backend"""
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """Session store persisted to SQLite behind an in-memory LRU cache.
+
+    Writes are buffered and flushed in one transaction once flush_size
+    records are pending or flush_interval seconds have passed, so the
+    active/exit status survives restarts without a disk write per message.
+    The database is opened in WAL mode so several worker processes can
+    share it; each caches only the users sharded to it.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH, max_users=SESSION_MAX_USERS, ttl=SESSION_TTL,
+                 flush_size=SESSION_FLUSH_SIZE, flush_interval=SESSION_FLUSH_INTERVAL):
+        super().__init__(max_users, ttl)
+        self.db_path = db_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = {}  # user_id -> UserState not yet written
+        self._last_flush = time.monotonic()
+        self.db_hits = 0
+        self.db_writes = 0
+        self.flushes = 0
+
+        # Other workers may hold the write lock briefly while flushing
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS user_states ('
+            'user_id INTEGER PRIMARY KEY, last_action TEXT NOT NULL, active INTEGER NOT NULL, '
+            'detail TEXT, updated_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS user_states_updated_at ON user_states (updated_at)')
+        self._db.commit()
+
+    def _lookup(self, user_id):
+        state = super()._lookup(user_id)
+        if state is None:
+            # Evicted from the cache but not yet flushed
+            state = self._pending.get(user_id)
+        if state is not None:
+            return state
+
+        row = self._db.execute(
+            'SELECT last_action, active, detail, updated_at FROM user_states WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state = UserState(row[0], bool(row[1]), row[2], row[3])
+        if self._is_expired(state, time.time()):
+            return None
+        self.db_hits += 1
+        self._put(user_id, state)
+        return state
+
+    def set(self, user_id, last_action, active=True, detail=None):
+        state = super().set(user_id, last_action, active, detail)
+        self._pending[user_id] = state
+        if len(self._pending) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return state
+
+    def flush(self):
+        """Write all pending records in one transaction and prune expired rows"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows = [(user_id, state.last_action, int(state.active), state.detail, state.updated_at)
+                for user_id, state in self._pending.items()]
+        try:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO user_states VALUES (?, ?, ?, ?, ?)', rows)
+                if self.ttl > 0:
+                    self._db.execute('DELETE FROM user_states WHERE updated_at < ?', (time.time() - self.ttl,))
+        except sqlite3.Error as e:
+            # Keep the records pending and retry on the next flush
+            logger.error(f"Failed to persist {len(rows)} user states to {self.db_path}: {e}")
+            return
+        self._pending.clear()
+        self.db_writes += len(rows)
+        self.flushes += 1
+
+    def active_user_ids(self):
+        # Every user in the database, not just the cached ones, as of the last flush(). This may run in a
+        # thread, so it reads through a connection of its own; self._db belongs to the event loop
+        cutoff = time.time() - self.ttl if self.ttl > 0 else 0
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            return [row[0] for row in db.execute(
+                'SELECT user_id FROM user_states WHERE active = 1 AND updated_at >= ?', (cutoff,)
+            )]
+        finally:
+            db.close()
+
+    def exited_user_ids(self, user_ids):
+        # Read from the database, which other workers write to, rather than this process's cache
+        self.flush()
+        user_ids = list(user_ids)
+        cutoff = time.time() - self.ttl if self.ttl > 0 else 0
+        exited = set()
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            exited.update(row[0] for row in self._db.execute(
+                f'SELECT user_id FROM user_states WHERE active = 0 AND updated_at >= ? '
+                f'AND user_id IN ({",".join("?" * len(chunk))})', (cutoff, *chunk)
+            ))
+        return exited
+
+    def close(self):
+        """Flush pending writes and close the database"""
+        self.flush()
+        self._db.close()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            'backend': 'sqlite',
+            'db_hits': self.db_hits,
+            'db_writes': self.db_writes,
+            'pending_writes': len(self._pending),
+            'flushes': self.flushes,
+        })
+        return stats
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Build the session store selected by SESSION_BACKEND ('memory' or 'sqlite')"""
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    if backend != 'memory':
+        logger.warning(f"Unknown SESSION_BACKEND {backend!r}, using in-memory sessions")
+    return InMemorySessionStore()
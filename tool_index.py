@@ -0,0 +1,225 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from heapq import merge
+
+# Grams up to this length are indexed; shorter queries hit a posting list directly
+NGRAM_SIZE = 3
+
+
+def _grams(text, size):
+    """Return every distinct gram of length 1..size in text"""
+    grams = set()
+    length = len(text)
+    for n in range(1, size + 1):
+        for start in range(length - n + 1):
+            grams.add(text[start:start + n])
+    return grams
+
+
+def without_ids(posting, tool_ids):
+    """Copy of an ascending array of ids without tool_ids, which are ascending and all in it"""
+    updated = array('I')
+    start = 0
+    for tool_id in tool_ids:
+        index = bisect_left(posting, tool_id, start)
+        updated.extend(posting[start:index])
+        start = index + 1
+    updated.extend(posting[start:])
+    return updated
+
+
+def _changed_postings(postings, removed, added):
+    """Copy of postings with ids taken out of and appended to some lists.
+
+    removed and added map keys to ascending ids; removed ids are in the
+    key's list and added ids are higher than any in it. Only the lists of
+    those keys are copied, and keys left empty are dropped.
+    """
+    postings = dict(postings)
+    for key in removed.keys() | added.keys():
+        updated = without_ids(postings.get(key, array('I')), removed.get(key, ()))
+        updated.extend(added.get(key, ()))
+        if updated:
+            postings[key] = updated
+        else:
+            postings.pop(key, None)
+    return postings
+
+
+def _lower(text):
+    """Lowercase text, reusing the original string when it is already lowercase"""
+    lowered = text.lower()
+    return text if lowered == text else lowered
+
+
+class ToolSearchIndex:
+    """Read-only search index over a sequence of Tool records.
+
+    Tool ids are positions in the original list, so every lookup returns
+    tools in file order, exactly like a linear scan would. Names and links
+    are indexed per tool; categories are few, so they are matched per
+    distinct purpose and expanded to that purpose's tools. An index derived
+    with with_changes has None in place of removed tools.
+    """
+
+    def __init__(self, tools, state=None):
+        self.tools = tools
+        # Pre-lowercased (name, purpose, link) per tool id
+        self.fields = []
+        # Lowercased purpose -> array of tool ids in that category
+        self.purpose_ids = {}
+        # gram -> array of tool ids whose name or link contains it
+        self.gram_index = {}
+        # purpose word -> array of tool ids whose purpose contains that word
+        self.purpose_word_index = {}
+        # Tool ids that are equal to an earlier tool (dropped by the fallback search)
+        self.duplicate_ids = set()
+        self._build_fields()
+        if state is None:
+            self._build()
+        else:
+            self._load_state(state)
+
+    def _build_fields(self):
+        """Populate the lowercased fields and the per-purpose tool ids"""
+        lowered_purposes = {}
+        purpose_ids = defaultdict(lambda: array('I'))
+        for tool in self.tools:
+            purpose = lowered_purposes.get(tool.purpose)
+            if purpose is None:
+                purpose = lowered_purposes[tool.purpose] = _lower(tool.purpose)
+            self.fields.append((_lower(tool.name), purpose, _lower(tool.link)))
+            purpose_ids[purpose].append(tool.id)
+        self.purpose_ids = dict(purpose_ids)
+
+    def _build(self):
+        """Populate the inverted indexes"""
+        gram_index = defaultdict(list)
+        seen = set()
+        for tool_id, (name, purpose, link) in enumerate(self.fields):
+            for gram in _grams(name, NGRAM_SIZE) | _grams(link, NGRAM_SIZE):
+                gram_index[gram].append(tool_id)
+
+            tool = self.tools[tool_id]
+            key = (tool.name, tool.purpose, tool.link)
+            if key in seen:
+                self.duplicate_ids.add(tool_id)
+            seen.add(key)
+        self.gram_index = {gram: array('I', posting) for gram, posting in gram_index.items()}
+
+        purpose_word_index = defaultdict(list)
+        for purpose, tool_ids in self.purpose_ids.items():
+            for word in set(purpose.split()):
+                purpose_word_index[word].append(tool_ids)
+        self.purpose_word_index = {
+            word: array('I', merge(*postings)) for word, postings in purpose_word_index.items()
+        }
+
+    def with_changes(self, tools, removed, added):
+        """A new index over `tools` (indexed by id) without the removed Tools and with the added ones.
+
+        Unchanged posting lists are shared with this index, which stays valid
+        for the catalog snapshot that owns it.
+        """
+        index = ToolSearchIndex.__new__(ToolSearchIndex)
+        index.tools = tools
+        index.fields = list(self.fields)
+        removed_purposes = defaultdict(list)
+        removed_grams = defaultdict(list)
+        removed_words = defaultdict(list)
+        for tool in removed:
+            name, purpose, link = self.fields[tool.id]
+            index.fields[tool.id] = None
+            removed_purposes[purpose].append(tool.id)
+            for gram in _grams(name, NGRAM_SIZE) | _grams(link, NGRAM_SIZE):
+                removed_grams[gram].append(tool.id)
+            for word in set(purpose.split()):
+                removed_words[word].append(tool.id)
+
+        added_purposes = defaultdict(list)
+        added_grams = defaultdict(list)
+        added_words = defaultdict(list)
+        for tool in added:
+            name, purpose, link = _lower(tool.name), _lower(tool.purpose), _lower(tool.link)
+            index.fields.append((name, purpose, link))
+            added_purposes[purpose].append(tool.id)
+            for gram in _grams(name, NGRAM_SIZE) | _grams(link, NGRAM_SIZE):
+                added_grams[gram].append(tool.id)
+            for word in set(purpose.split()):
+                added_words[word].append(tool.id)
+
+        index.purpose_ids = _changed_postings(self.purpose_ids, removed_purposes, added_purposes)
+        index.gram_index = _changed_postings(self.gram_index, removed_grams, added_grams)
+        index.purpose_word_index = _changed_postings(self.purpose_word_index, removed_words, added_words)
+        index.duplicate_ids = self.duplicate_ids - {tool.id for tool in removed}
+        return index
+
+    def to_state(self):
+        """The built indexes as plain values, for a catalog snapshot file"""
+        return {
+            'gram_index': {gram: posting.tobytes() for gram, posting in self.gram_index.items()},
+            'purpose_word_index': {word: posting.tobytes() for word, posting in self.purpose_word_index.items()},
+            'duplicate_ids': sorted(self.duplicate_ids),
+        }
+
+    def _load_state(self, state):
+        """Restore the indexes saved by to_state"""
+        for name in ('gram_index', 'purpose_word_index'):
+            postings = {}
+            for key, data in state[name].items():
+                posting = postings[key] = array('I')
+                posting.frombytes(data)
+            setattr(self, name, postings)
+        self.duplicate_ids = set(state['duplicate_ids'])
+
+    def _candidate_ids(self, query):
+        """Return sorted tool ids whose name or link may contain query as a substring"""
+        if len(query) <= NGRAM_SIZE:
+            return self.gram_index.get(query, ())
+
+        # Every query gram must be present, so the rarest one bounds the candidates;
+        # substring_ids verifies each candidate against the real fields
+        smallest = None
+        for start in range(len(query) - NGRAM_SIZE + 1):
+            posting = self.gram_index.get(query[start:start + NGRAM_SIZE])
+            if not posting:
+                return ()
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        return smallest
+
+    def substring_ids(self, query):
+        """Ids of tools whose name, purpose or link contains the lowercased query"""
+        if not query:
+            return [tool_id for tool_id, fields in enumerate(self.fields) if fields is not None]
+
+        fields = self.fields
+        matches = [tool_id for tool_id in self._candidate_ids(query)
+                   if query in fields[tool_id][0] or query in fields[tool_id][2]]
+        purpose_matches = [tool_ids for purpose, tool_ids in self.purpose_ids.items() if query in purpose]
+        if not purpose_matches:
+            return matches
+        # A tool can match on both its name and its category
+        merged = []
+        for tool_id in merge(matches, *purpose_matches):
+            if not merged or merged[-1] != tool_id:
+                merged.append(tool_id)
+        return merged
+
+    def purpose_word_ids(self, query):
+        """Ids of tools with a purpose word overlapping any query word"""
+        matched = set()
+        for query_word in query.split():
+            for purpose_word, posting in self.purpose_word_index.items():
+                if query_word in purpose_word or purpose_word in query_word:
+                    matched.update(posting)
+        return [tool_id for tool_id in sorted(matched) if tool_id not in self.duplicate_ids]
+
+    def substring_search(self, query):
+        """Tools whose name, purpose or link contains the lowercased query"""
+        return [self.tools[tool_id] for tool_id in self.substring_ids(query)]
+
+    def purpose_word_search(self, query):
+        """Tools whose purpose words overlap the words of the lowercased query"""
+        return [self.tools[tool_id] for tool_id in self.purpose_word_ids(query)]
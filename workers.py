@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from config import (
+    BOT_TOKEN, JSON_FILE_PATH, CATALOG_RELOAD_INTERVAL, CATALOG_SNAPSHOT_PATH, SEND_GLOBAL_RATE, SEND_GLOBAL_BURST,
+    SESSION_DB_PATH, WORKER_QUEUE_SIZE, METRICS_PORT
+)
+from bot_enhanced import AIToolsBotEnhanced, build_application
+from catalog import file_stamp, load_catalog
+from flood_control import SendScheduler
+from session_store import SQLiteSessionStore
+
+logger = logging.getLogger(__name__)
+
+# Put on a worker's queue to make it finish its pending updates and exit
+STOP = None
+
+# Most updates a worker takes off its queue per thread hop
+BATCH_SIZE = 100
+
+
+def shard_for(update, workers):
+    """Return the worker that handles an update; all of one user's updates go to the same worker"""
+    if update.effective_user is not None:
+        key = update.effective_user.id
+    elif update.effective_chat is not None:
+        key = update.effective_chat.id
+    else:
+        key = 0
+    return key % workers
+
+
+def _next_batch(updates, timeout):
+    """Block until an update arrives, then take whatever else is already queued"""
+    batch = [updates.get(timeout=timeout)]
+    try:
+        while len(batch) < BATCH_SIZE and batch[-1] is not STOP:
+            batch.append(updates.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def default_snapshot_path(json_file_path):
+    return CATALOG_SNAPSHOT_PATH or f"{os.path.splitext(json_file_path)[0]}.snapshot"
+
+
+def run_worker(index, workers, updates, ready, token, json_file_path, snapshot_path, session_db_path, metrics_port,
+               request_factory=None):
+    """Entry point of a worker process: handle the updates sent to it until STOP arrives"""
+    # Ctrl+C reaches the whole process group; the receiver decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(index, workers, updates, ready, token, json_file_path, snapshot_path, session_db_path,
+                       metrics_port, request_factory))
+
+
+async def _serve(index, workers, updates, ready, token, json_file_path, snapshot_path, session_db_path,
+                 metrics_port, request_factory):
+    bot = AIToolsBotEnhanced(
+        json_file_path,
+        user_states=SQLiteSessionStore(session_db_path),
+        # Workers send through the same bot, so they split Telegram's global limit between them
+        sender=SendScheduler(global_rate=SEND_GLOBAL_RATE / workers, global_burst=max(SEND_GLOBAL_BURST // workers, 1)),
+        snapshot_path=snapshot_path,
+        snapshot_readonly=True,
+    )
+    request = request_factory() if request_factory is not None else None
+    # Any worker queues broadcasts; the first one delivers them
+    application = build_application(bot, token, request=request, metrics_port=metrics_port,
+                                    deliver_broadcasts=index == 0)
+    # Not run_polling, so the lifecycle hooks are called here
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    ready.set()
+    logger.info(f"Worker {index} ready: catalog v{bot.catalog.version} with {len(bot.tools_data)} tools")
+
+    parent = multiprocessing.parent_process()
+    try:
+        stopping = False
+        while not stopping:
+            try:
+                batch = await asyncio.to_thread(_next_batch, updates, 1)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.warning(f"Worker {index}: receiver exited, stopping")
+                    break
+                continue
+            for data in batch:
+                if data is STOP:
+                    stopping = True
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        # Handles the updates still in the application's queue before returning
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+
+class WorkerPool:
+    """Worker processes, each with its own bot instance, fed through one bounded queue apiece.
+
+    Updates are sharded by user id, so each user's updates are handled in
+    order by a single worker, whose session cache and per-chat send queue
+    are then the only ones touching that user.
+    """
+
+    def __init__(self, workers, token=BOT_TOKEN, json_file_path=JSON_FILE_PATH, snapshot_path=None,
+                 session_db_path=SESSION_DB_PATH, metrics_port=METRICS_PORT, queue_size=WORKER_QUEUE_SIZE,
+                 request_factory=None):
+        self.workers = workers
+        self.token = token
+        self.json_file_path = json_file_path
+        self.snapshot_path = snapshot_path or default_snapshot_path(json_file_path)
+        self.session_db_path = session_db_path
+        self.metrics_port = metrics_port
+        self.queue_size = queue_size
+        # Called in each worker to build its Bot API request, e.g. a fake one for tests
+        self.request_factory = request_factory
+        self.catalog_stamp = None
+        self._queues = []
+        self._ready = []  # One event per worker, set once it handles updates
+        self._processes = []
+        self.dispatched = [0] * workers
+        self.backlogged = [False] * workers  # Whether the worker's queue was last found full
+
+    def prepare_catalog(self):
+        """Write the snapshot the workers load read-only; return (tools, categories) in it"""
+        self.catalog_stamp = file_stamp(self.json_file_path)
+        catalog = load_catalog(self.json_file_path, self.snapshot_path)
+        return len(catalog.tools), len(catalog.purposes)
+
+    def start(self):
+        # spawn, not fork: workers must not inherit the receiver's event loop and sockets
+        context = multiprocessing.get_context('spawn')
+        for index in range(self.workers):
+            updates = context.Queue(self.queue_size)
+            ready = context.Event()
+            # Each worker serves metrics on its own port, counting up from metrics_port
+            metrics_port = self.metrics_port + index if self.metrics_port else 0
+            process = context.Process(
+                target=run_worker, name=f'bot-worker-{index}', daemon=True,
+                args=(index, self.workers, updates, ready, self.token, self.json_file_path, self.snapshot_path,
+                      self.session_db_path, metrics_port, self.request_factory),
+            )
+            process.start()
+            self._queues.append(updates)
+            self._ready.append(ready)
+            self._processes.append(process)
+        logger.info(f"Started {self.workers} workers")
+
+    async def wait_ready(self, timeout=None):
+        """Wait until every worker has loaded the catalog; return False on timeout"""
+        for ready in self._ready:
+            if not await asyncio.to_thread(ready.wait, timeout):
+                return False
+        return True
+
+    async def dispatch(self, update):
+        """Hand an update to its worker, waiting for room if that worker is backed up"""
+        index = shard_for(update, self.workers)
+        data = update.to_dict()
+        try:
+            self._queues[index].put_nowait(data)
+            self.backlogged[index] = False
+        except queue.Full:
+            if not self.backlogged[index]:
+                self.backlogged[index] = True
+                logger.warning(f"Worker {index} is backed up; holding further updates until it catches up")
+            await asyncio.to_thread(self._queues[index].put, data)
+        self.dispatched[index] += 1
+
+    async def watch_catalog(self, interval=CATALOG_RELOAD_INTERVAL):
+        """Rewrite the snapshot when the catalog file changes, so restarted workers load it quickly"""
+        while True:
+            await asyncio.sleep(interval)
+            stamp = file_stamp(self.json_file_path)
+            if stamp is None or stamp == self.catalog_stamp:
+                continue
+            try:
+                await asyncio.to_thread(self.prepare_catalog)
+            except Exception as e:
+                logger.error(f"Failed to rebuild catalog snapshot {self.snapshot_path}: {e}")
+
+    async def stop(self, timeout=30):
+        """Let every worker finish its queued updates, then terminate any that do not exit in time"""
+        for updates in self._queues:
+            updates.put(STOP)
+        for process in self._processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Terminating {process.name}: still busy after {timeout}s")
+                process.terminate()
+        for updates in self._queues:
+            updates.close()
+        self._queues.clear()
+        self._ready.clear()
+        self._processes.clear()
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {
+            'workers': self.workers,
+            'alive': sum(process.is_alive() for process in self._processes),
+            'ready': sum(ready.is_set() for ready in self._ready),
+            'dispatched': list(self.dispatched),
+        }
+
+
+def build_receiver(pool, token=BOT_TOKEN, request=None):
+    """Create an Application that only receives updates and hands them to the pool's workers"""
+    background_tasks = []
+
+    async def forward(update, context):
+        await pool.dispatch(update)
+
+    async def post_init(application):
+        pool.start()
+        if CATALOG_RELOAD_INTERVAL > 0:
+            background_tasks.append(asyncio.create_task(pool.watch_catalog(CATALOG_RELOAD_INTERVAL)))
+
+    async def post_shutdown(application):
+        for task in background_tasks:
+            task.cancel()
+        background_tasks.clear()
+        await pool.stop()
+
+    builder = Application.builder().token(token).post_init(post_init).post_shutdown(post_shutdown)
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    # Updates are forwarded one at a time, keeping their order within each worker's queue
+    application.add_handler(TypeHandler(Update, forward))
+    return application